@@ -2,7 +2,7 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from app.config import Config
-from app.models import db
+from app.models import db, register_sqlite_pragmas
 
 
 def create_app(config_class=Config):
@@ -14,6 +14,26 @@ def create_app(config_class=Config):
     db.init_app(app)
     migrate = Migrate(app, db)
 
+    with app.app_context():
+        register_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    # Request, query and background-work metrics for /metrics
+    from app.services.metrics_service import metrics_service
+    metrics_service.init_app(app)
+
+    from app.services.query_profiler import query_profiler
+    query_profiler.init_app(app)
+
+    from app.services.fragment_cache import fragment_cache
+    fragment_cache.init_app(app)
+
+    from app.services.latex_service import latex_service
+    latex_service.init_app(app)
+
+    # Periodic cleanup of tests left running by killed workers
+    from app.services.testing_service import testing_service
+    testing_service.init_app(app)
+
     # Initialize Flask-Login
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -22,27 +42,20 @@ def create_app(config_class=Config):
 
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))
+        from app.services.user_cache import user_cache
+        return user_cache.get(int(user_id))
 
     # Register blueprints
-    from app.routes import question_routes, testing_routes, auth_routes
+    from app.routes import question_routes, testing_routes, auth_routes, monitoring_routes, analytics_routes
     app.register_blueprint(question_routes.bp)
     app.register_blueprint(testing_routes.bp)
     app.register_blueprint(auth_routes.bp)
+    app.register_blueprint(monitoring_routes.bp)
+    app.register_blueprint(analytics_routes.bp)
 
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-
-        # Clean up incomplete tests on startup
-        from app.services.testing_service import testing_service
-        try:
-            cleaned = testing_service.cleanup_incomplete_tests(max_age_minutes=30)
-            if cleaned > 0:
-                app.logger.info(f"Cleaned up {cleaned} incomplete test results on startup")
-        except Exception as e:
-            app.logger.error(f"Error cleaning up incomplete tests: {str(e)}")
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
 
     # Error handlers
     @app.errorhandler(404)
@@ -55,3 +68,34 @@ def create_app(config_class=Config):
         return "Internal server error", 500
 
     return app
+
+
+def initialize_database(app, cleanup=True):
+    """
+    One-time startup step: create tables and the search index, then clean up
+    tests left running by a previous process. Run it once per deployment
+    (`flask init-db`) before starting workers, never per request or per thread.
+    """
+    with app.app_context():
+        db.create_all()
+
+        # Make sure the full-text search index exists
+        from app.services.search_service import search_service
+        try:
+            if search_service.ensure_index():
+                app.logger.info("Created full-text search index")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error creating full-text search index: {str(e)}")
+
+        if not cleanup:
+            return
+
+        # Clean up incomplete tests on startup
+        from app.services.testing_service import testing_service
+        try:
+            cleaned = testing_service.cleanup_incomplete_tests(max_age_minutes=app.config['STALE_TEST_MINUTES'])
+            if cleaned > 0:
+                app.logger.info(f"Cleaned up {cleaned} incomplete test results on startup")
+        except Exception as e:
+            app.logger.error(f"Error cleaning up incomplete tests: {str(e)}")
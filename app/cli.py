@@ -0,0 +1,218 @@
+import click
+
+
+def register_commands(app):
+    """Register maintenance commands on the Flask CLI"""
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Create tables and the search index and clean up stale tests (run once at startup)"""
+        from app import initialize_database
+        initialize_database(app)
+        click.echo('数据库初始化完成')
+
+    @app.cli.command('backfill-tags')
+    @click.option('--batch-size', default=500, show_default=True, help='Questions per commit')
+    def backfill_tags(batch_size):
+        """Rebuild the knowledge-point tag index from Question.knowledge_points"""
+        from app.services.tag_service import tag_service
+        processed = tag_service.backfill(batch_size=batch_size)
+        click.echo(f'已处理 {processed} 个问题的知识点标签')
+
+    @app.cli.command('import-questions')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--username', required=True, help='Author of the imported questions')
+    @click.option('--batch-size', default=None, type=int, help='Questions per commit')
+    @click.option('--auto-test', is_flag=True, help='Test every imported question and wait for the results')
+    def import_questions(path, username, batch_size, auto_test):
+        """Bulk import questions from the 10-column Excel template or a JSONL file"""
+        from app.models import User
+        from app.services.import_service import import_service
+        from app.services.test_queue import test_queue
+
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.ClickException(f"用户 '{username}' 不存在")
+
+        with open(path, 'rb') as f:
+            records = import_service.iter_records(f, path)
+            # The CLI waits for queue space instead of skipping questions
+            report = import_service.import_records(records, user.id, batch_size=batch_size,
+                                                   auto_test=auto_test, wait_for_queue=True)
+
+        click.echo(f"导入成功 {report['imported']} 个问题，失败 {report['failed']} 行")
+        for error in report['errors']:
+            click.echo(f"  第 {error['row']} 行: {'; '.join(error['errors'])}")
+        if report['duplicates']:
+            action = '已跳过' if report['skipped'] else '已导入'
+            click.echo(f"疑似重复 {report['duplicates']} 行（{action}）")
+            for duplicate in report['duplicate_rows']:
+                match = duplicate['match']
+                target = f"问题 #{match['question_id']}" if 'question_id' in match else f"第 {match['row']} 行"
+                click.echo(f"  第 {duplicate['row']} 行: 与{target}相似度 {match['similarity']:.0%}")
+
+        if auto_test and report['queued']:
+            click.echo(f"正在测试 {report['queued']} 个问题...")
+            test_queue.join()
+            click.echo('测试完成')
+
+    @app.cli.command('dedup-questions')
+    @click.option('--threshold', default=None, type=float, help='Minimum similarity (default DEDUP_THRESHOLD)')
+    @click.option('--delete', is_flag=True, help='Delete all but the oldest question of each group')
+    @click.option('--yes', is_flag=True, help='Do not ask for confirmation before deleting')
+    def dedup_questions(threshold, delete, yes):
+        """Rebuild the similarity index and report (or delete) near-duplicate questions"""
+        from app.models import db, Question
+        from app.services.dedup_service import dedup_service
+        from app.services.testing_service import testing_service
+
+        processed = dedup_service.backfill()
+        click.echo(f'已为 {processed} 个问题建立相似度索引')
+
+        groups = dedup_service.find_duplicate_groups(threshold=threshold)
+        if not groups:
+            click.echo('未发现相似问题')
+            return
+
+        titles = dict(db.session.query(Question.id, Question.title)
+                      .filter(Question.id.in_([question_id for group in groups for question_id in group])))
+        for group in groups:
+            click.echo(f'保留 #{group[0]} {titles.get(group[0], "")}')
+            for question_id in group[1:]:
+                click.echo(f'    重复 #{question_id} {titles.get(question_id, "")}')
+
+        duplicate_ids = [question_id for group in groups for question_id in group[1:]]
+        click.echo(f'共 {len(groups)} 组，{len(duplicate_ids)} 个重复问题')
+        if not delete:
+            return
+        if not yes:
+            click.confirm(f'删除这 {len(duplicate_ids)} 个重复问题及其测试结果？', abort=True)
+        for start in range(0, len(duplicate_ids), 500):
+            testing_service.delete_questions(duplicate_ids[start:start + 500])
+            db.session.commit()
+        click.echo(f'已删除 {len(duplicate_ids)} 个重复问题')
+
+    @app.cli.command('export-attempts')
+    @click.argument('output', type=click.Path(dir_okay=False))
+    @click.option('--start', default=None, help='Only attempts at or after this ISO date/time')
+    @click.option('--end', default=None, help='Only attempts before this ISO date/time')
+    @click.option('--subject', default=None, help='Only questions of this subject')
+    @click.option('--model', default=None, help='Only attempts answered by this model')
+    def export_attempts(output, start, end, subject, model):
+        """Export attempt-level API call logs to a JSONL file (.gz to compress)"""
+        from datetime import datetime
+        from app.services.export_service import export_service
+
+        rows = export_service.iter_attempt_rows(
+            start=datetime.fromisoformat(start) if start else None,
+            end=datetime.fromisoformat(end) if end else None,
+            subject=subject,
+            model=model
+        )
+        chunks = export_service.iter_attempts_jsonl(rows)
+        if output.endswith('.gz'):
+            chunks = export_service.gzip_stream(chunks)
+
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        click.echo(f'已导出到 {output}')
+
+    @app.cli.command('archive-logs')
+    @click.option('--days', default=None, type=float,
+                  help='Archive results tested more than this many days ago (default ARCHIVE_LOGS_AFTER_DAYS)')
+    @click.option('--reviewed', is_flag=True, help='Also archive manually reviewed results of any age')
+    @click.option('--batch-size', default=None, type=int, help='Test results per commit')
+    def archive_logs(days, reviewed, batch_size):
+        """Move attempt logs of old completed test results into the compressed archive"""
+        from app.services.archive_service import archive_service
+
+        archived = archive_service.archive_logs(older_than_days=days, reviewed=reviewed,
+                                                batch_size=batch_size, log=click.echo)
+        click.echo(f"归档完成：{archived['test_results']} 个测试结果，{archived['logs']} 条尝试记录")
+
+    @app.cli.command('rebuild-analytics')
+    @click.option('--check', is_flag=True, help='Only compare the rollups with the source rows')
+    def rebuild_analytics(check):
+        """Recompute the analytics rollups from test results, or check them for drift"""
+        from app.services.analytics_service import analytics_service
+
+        differences = analytics_service.rebuild(check=check)
+        for key, stored, expected in differences[:20]:
+            click.echo(f'{key[0]} {key[1]}/{key[2]}/用户 {key[3]}: 统计 {stored}，实际 {expected}')
+        if len(differences) > 20:
+            click.echo(f'... 另有 {len(differences) - 20} 行不一致')
+
+        if check:
+            if differences:
+                raise click.ClickException(f'{len(differences)} 行统计与测试结果不一致，请运行 flask rebuild-analytics')
+            click.echo('统计数据与测试结果一致')
+        else:
+            click.echo(f'统计数据已重建，修正 {len(differences)} 行')
+
+    @app.cli.command('generate-data')
+    @click.option('--questions', default=1000, show_default=True, help='Questions to create')
+    @click.option('--users', default=None, type=int, help='Question authors (default: one per 200 questions)')
+    @click.option('--attempts', default=8, show_default=True, help='Attempt logs per test result')
+    @click.option('--seed', default=42, show_default=True, help='Random seed')
+    @click.option('--yes', is_flag=True, help='Do not ask for confirmation')
+    def generate_data(questions, users, attempts, seed, yes):
+        """Fill the configured database with synthetic questions, test results and attempt logs"""
+        from app.services.synthetic_data_service import synthetic_data_service, SYNTHETIC_PASSWORD
+
+        if not yes:
+            click.confirm(f"向 {app.config['SQLALCHEMY_DATABASE_URI']} 写入 {questions} 个合成问题？", abort=True)
+
+        created = synthetic_data_service.generate(questions, users=users, attempts=attempts, seed=seed)
+        click.echo(f"已创建 {created['users']} 个用户（密码 {SYNTHETIC_PASSWORD}）、{created['questions']} 个问题、"
+                   f"{created['test_results']} 个测试结果和 {created['api_call_logs']} 条尝试记录")
+
+    @app.cli.command('benchmark')
+    @click.option('--scales', default='1k,10k,100k', show_default=True,
+                  help='Comma-separated question counts, e.g. 1k,10k')
+    @click.option('--repeat', default=5, show_default=True, help='Timed runs per benchmark')
+    @click.option('--baseline', 'baseline_path', default='benchmarks/baseline.json', show_default=True,
+                  help='Baseline file to compare against')
+    @click.option('--save-baseline', is_flag=True, help='Store these results as the new baseline')
+    @click.option('--tolerance', default=0.2, show_default=True, help='Allowed median latency increase')
+    def benchmark(scales, repeat, baseline_path, save_baseline, tolerance):
+        """Benchmark pages, progress API, export and batch delete on synthetic data"""
+        from app.services.benchmark_service import benchmark_service, parse_scale
+
+        try:
+            results = benchmark_service.run([parse_scale(scale) for scale in scales.split(',')],
+                                            repeat=repeat, log=click.echo)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        comparison = benchmark_service.compare(results, benchmark_service.load_baseline(baseline_path),
+                                               tolerance=tolerance)
+        if comparison:
+            click.echo(f"\n与基线 {baseline_path} 对比:")
+            for row in comparison:
+                marker = '退化' if row['regression'] else '正常'
+                click.echo(f"  [{marker}] {row['scale']:>7} {row['benchmark']:<22} "
+                           f"{row['baseline_ms']:>9.1f}ms -> {row['current_ms']:>9.1f}ms ({row['change']:+.0%}), "
+                           f"SQL {row['baseline_queries']} -> {row['current_queries']}")
+
+        if save_baseline:
+            benchmark_service.save_baseline(results, baseline_path)
+            click.echo(f'基线已保存到 {baseline_path}')
+        elif any(row['regression'] for row in comparison):
+            raise click.ClickException('性能退化超出容差')
+
+    @app.cli.command('benchmark-login')
+    @click.option('--concurrency', default=16, show_default=True, help='Threads logging in at the same time')
+    @click.option('--logins', default=200, show_default=True, help='Total number of logins')
+    def benchmark_login(concurrency, logins):
+        """Benchmark login throughput and progress API latency during a login burst"""
+        from app.services.benchmark_service import benchmark_service
+
+        result = benchmark_service.run_login(concurrency=concurrency, logins=logins, log=click.echo)
+        click.echo(f"哈希方法 {result['hash_method']}，哈希线程 {result['hash_workers']}")
+        click.echo(f"登录: {result['logins_per_second']} 次/秒，中位 {result['login']['median_ms']:.1f}ms，"
+                   f"p95 {result['login']['p95_ms']:.1f}ms，失败 {result['failures']} 次")
+        click.echo(f"进度接口（空闲）: 中位 {result['progress_idle']['median_ms']:.1f}ms，"
+                   f"p95 {result['progress_idle']['p95_ms']:.1f}ms")
+        click.echo(f"进度接口（登录中）: 中位 {result['progress_during_logins']['median_ms']:.1f}ms，"
+                   f"p95 {result['progress_during_logins']['p95_ms']:.1f}ms")
@@ -1,9 +1,25 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def build_engine_options(database_uri, pool_size, max_overflow, pool_recycle, pool_timeout, sqlite_busy_timeout_ms):
+    """Build SQLAlchemy engine options for the database selected by database_uri"""
+    if database_uri.startswith('sqlite'):
+        # The driver-level timeout makes sqlite3 wait for locks instead of failing immediately
+        return {'connect_args': {'timeout': sqlite_busy_timeout_ms / 1000}}
+
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_pre_ping': True,
+        'pool_recycle': pool_recycle,
+        'pool_timeout': pool_timeout,
+    }
+
+
 class Config:
     """Application configuration"""
 
@@ -11,10 +27,37 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
 
+    # Logged-in user cache: TTL in seconds and the stamp file touched on invalidation
+    # (defaults to <instance>/user_cache.stamp, must be shared by all workers)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    USER_CACHE_STAMP_FILE = os.getenv('USER_CACHE_STAMP_FILE')
+
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///questions.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite connection settings (applied as PRAGMAs on every new connection)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',
+        'journal_mode': SQLITE_JOURNAL_MODE,
+        'synchronous': SQLITE_SYNCHRONOUS,
+        'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+    # Connection pool settings for server databases (Postgres)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(
+        SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+        DB_POOL_RECYCLE, DB_POOL_TIMEOUT, SQLITE_BUSY_TIMEOUT_MS
+    )
+
     # Anthropic Claude API
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
     ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL', 'https://deeprouter.top/v1')
@@ -24,5 +67,97 @@ class Config:
     TEST_ATTEMPTS = int(os.getenv('TEST_ATTEMPTS', 8))
     QUALIFICATION_THRESHOLD = float(os.getenv('QUALIFICATION_THRESHOLD', 50))
 
+    # Password hashing (werkzeug method string, e.g. scrypt:32768:8:1 or
+    # pbkdf2:sha256:600000); older hashes are upgraded on the next login.
+    # Hashes run on PASSWORD_HASH_WORKERS threads per process with at most
+    # PASSWORD_HASH_QUEUE waiting, so a burst of logins cannot take every core.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_WAIT_SECONDS = float(os.getenv('PASSWORD_HASH_WAIT_SECONDS', 10))
+
+    # Login attempts allowed per username and per client address in each
+    # window, counted per worker process (0 disables a limit)
+    LOGIN_RATE_LIMIT = int(os.getenv('LOGIN_RATE_LIMIT', 10))
+    LOGIN_RATE_LIMIT_PER_IP = int(os.getenv('LOGIN_RATE_LIMIT_PER_IP', 100))
+    LOGIN_RATE_WINDOW = int(os.getenv('LOGIN_RATE_WINDOW', 60))
+
+    # Near-duplicate check of new questions (MinHash similarity of question_text).
+    # DEDUP_ACTION 'warn' lets the author confirm and submit anyway, 'block' refuses.
+    DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+    DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.8))
+    DEDUP_ACTION = os.getenv('DEDUP_ACTION', 'warn')
+
+    # Tests left 'running' by a killed worker are deleted once they made no
+    # progress for STALE_TEST_MINUTES. Each worker checks every STALE_TEST_CLEANUP_SECONDS;
+    # the lock file (shared by the workers of one host) lets only one run it.
+    STALE_TEST_MINUTES = int(os.getenv('STALE_TEST_MINUTES', 30))
+    STALE_TEST_CLEANUP_SECONDS = int(os.getenv('STALE_TEST_CLEANUP_SECONDS', 300))
+    STALE_TEST_LOCK_FILE = os.getenv('STALE_TEST_LOCK_FILE',
+                                     os.path.join(tempfile.gettempdir(), 'question-testing-cleanup.lock'))
+
+    # Background test queue used by bulk operations
+    TEST_QUEUE_WORKERS = int(os.getenv('TEST_QUEUE_WORKERS', 2))
+    TEST_QUEUE_MAX_SIZE = int(os.getenv('TEST_QUEUE_MAX_SIZE', 1000))
+
+    # Bulk import
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_UPLOAD_MB', 50)) * 1024 * 1024
+
+    # zlib compression of long answer texts (CompressedText columns); values
+    # shorter than TEXT_COMPRESSION_MIN_BYTES are stored as plain text
+    TEXT_COMPRESSION_ENABLED = os.getenv('TEXT_COMPRESSION_ENABLED', 'true').lower() == 'true'
+    TEXT_COMPRESSION_MIN_BYTES = int(os.getenv('TEXT_COMPRESSION_MIN_BYTES', 512))
+    TEXT_COMPRESSION_LEVEL = int(os.getenv('TEXT_COMPRESSION_LEVEL', 6))
+
+    # Attempt logs of completed results older than this are moved to the
+    # compressed archive table by `flask archive-logs`
+    ARCHIVE_LOGS_AFTER_DAYS = float(os.getenv('ARCHIVE_LOGS_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500))
+
     # Export directory
     EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'exports')
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 1000))
+    EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_MB', 500)) * 1024 * 1024
+    EXPORT_CACHE_MAX_AGE_HOURS = float(os.getenv('EXPORT_CACHE_MAX_AGE_HOURS', 24))
+    EXPORT_JOB_STALE_MINUTES = int(os.getenv('EXPORT_JOB_STALE_MINUTES', 30))
+    # Export files used this recently may still be downloading and are never evicted
+    EXPORT_DOWNLOAD_WINDOW_SECONDS = int(os.getenv('EXPORT_DOWNLOAD_WINDOW_SECONDS', 600))
+    # Incremental exports re-send rows changed this long before the watermark
+    EXPORT_INCREMENTAL_OVERLAP_SECONDS = int(os.getenv('EXPORT_INCREMENTAL_OVERLAP_SECONDS', 300))
+
+    # Prometheus metrics; every worker writes its snapshot to METRICS_DIR, which
+    # must be shared by all gunicorn workers. METRICS_TOKEN lets scrapers
+    # authenticate with "Authorization: Bearer <token>" instead of an admin login.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'metrics'))
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Opt-in per-request SQL profiler and slow-query log
+    SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+    SQL_PROFILER_WARN_QUERIES = int(os.getenv('SQL_PROFILER_WARN_QUERIES', 50))
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs', 'slow_queries.jsonl'))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_MB', 10)) * 1024 * 1024
+
+    # Span tracing of test runs, stored as OTLP/JSON per test result; set
+    # TRACE_EXPORT_URL (e.g. http://collector:4318/v1/traces) to also send them
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+    TRACE_DIR = os.getenv('TRACE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'traces'))
+    TRACE_EXPORT_URL = os.getenv('TRACE_EXPORT_URL')
+
+    # Per-process cache of rendered result and question detail fragments
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 500))
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv('FRAGMENT_CACHE_MAX_MB', 64)) * 1024 * 1024
+
+    # LaTeX pre-rendered to MathML, keyed by a hash of the source text
+    LATEX_CACHE_DIR = os.getenv('LATEX_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'latex_cache'))
+    LATEX_CACHE_MAX_ENTRIES = int(os.getenv('LATEX_CACHE_MAX_ENTRIES', 2000))
+    # Files unread for LATEX_CACHE_MAX_AGE_DAYS are evicted, then the least recently
+    # read ones until the directory fits in LATEX_CACHE_MAX_BYTES. Each worker checks
+    # at most every LATEX_CACHE_EVICT_SECONDS, after storing a newly rendered text.
+    LATEX_CACHE_MAX_BYTES = int(os.getenv('LATEX_CACHE_MAX_MB', 200)) * 1024 * 1024
+    LATEX_CACHE_MAX_AGE_DAYS = float(os.getenv('LATEX_CACHE_MAX_AGE_DAYS', 30))
+    LATEX_CACHE_EVICT_SECONDS = int(os.getenv('LATEX_CACHE_EVICT_SECONDS', 3600))
@@ -1,12 +1,101 @@
+import zlib
+import base64
 from datetime import datetime
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 
 db = SQLAlchemy()
 
 
-class User(UserMixin, db.Model):
+def register_sqlite_pragmas(engine, pragmas: dict):
+    """
+    Apply PRAGMA settings to every new connection of a SQLite engine.
+    SQLite ignores foreign keys (and ON DELETE CASCADE) unless enabled per connection.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+# Marks a CompressedText value; U+0001 never starts real text (and Postgres text cannot hold NUL)
+COMPRESSED_PREFIX = '\x01zlib:'
+
+
+class CompressedText(db.TypeDecorator):
+    """
+    Text column that stores long values zlib-compressed.
+
+    Values of at least TEXT_COMPRESSION_MIN_BYTES are written as
+    COMPRESSED_PREFIX + base64(zlib data) when that is smaller; shorter values
+    stay plain, so the column remains an ordinary TEXT column and plain and
+    compressed rows can be mixed. Reads decompress transparently. Set
+    TEXT_COMPRESSION_ENABLED=false to write plain text again.
+    """
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if has_app_context():
+            enabled = current_app.config['TEXT_COMPRESSION_ENABLED']
+            min_bytes = current_app.config['TEXT_COMPRESSION_MIN_BYTES']
+            level = current_app.config['TEXT_COMPRESSION_LEVEL']
+        else:
+            enabled, min_bytes, level = True, 512, 6
+        # A plain value that looks compressed is always compressed, so reads stay unambiguous
+        if value.startswith(COMPRESSED_PREFIX):
+            return compress_text(value, level)
+        if enabled:
+            raw = value.encode('utf-8')
+            if len(raw) >= min_bytes:
+                compressed = compress_text(value, level)
+                if len(compressed) < len(raw):
+                    return compressed
+        return value
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+def compress_text(value: str, level: int = 6) -> str:
+    """Encode text in the CompressedText storage format"""
+    return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(value.encode('utf-8'), level)).decode('ascii')
+
+
+def decompress_text(value):
+    """Decode a CompressedText value; plain values are returned unchanged"""
+    if value is None or not value.startswith(COMPRESSED_PREFIX):
+        return value
+    return zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX):])).decode('utf-8')
+
+
+class RoleMixin:
+    """Role checks shared by User and the cached UserPrincipal"""
+
+    def is_admin(self):
+        """Check if user is admin"""
+        return self.role == 'admin'
+
+    def is_reviewer(self):
+        """Check if user is reviewer"""
+        return self.role == 'reviewer'
+
+    def is_user(self):
+        """Check if user is regular user"""
+        return self.role == 'user'
+
+
+class User(RoleMixin, UserMixin, db.Model):
     """User model for authentication and authorization"""
     __tablename__ = 'users'
 
@@ -23,25 +112,14 @@ class User(UserMixin, db.Model):
     reviewer_applications = db.relationship('ReviewerApplication', foreign_keys='ReviewerApplication.user_id', backref='applicant', lazy=True)
 
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password with the configured PASSWORD_HASH_METHOD"""
+        from app.services.password_service import password_service
+        self.password_hash = password_service.hash_password(password)
 
     def check_password(self, password):
         """Check if password matches"""
         return check_password_hash(self.password_hash, password)
 
-    def is_admin(self):
-        """Check if user is admin"""
-        return self.role == 'admin'
-
-    def is_reviewer(self):
-        """Check if user is reviewer"""
-        return self.role == 'reviewer'
-
-    def is_user(self):
-        """Check if user is regular user"""
-        return self.role == 'user'
-
     def __repr__(self):
         return f'<User {self.username} ({self.role})>'
 
@@ -65,6 +143,26 @@ class ReviewerApplication(db.Model):
         return f'<ReviewerApplication {self.id}: User {self.user_id} - {self.status}>'
 
 
+# Association table between questions and their knowledge-point tags
+question_tags = db.Table(
+    'question_tags',
+    db.Column('question_id', db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True, index=True)
+)
+
+
+class Tag(db.Model):
+    """Normalized knowledge-point tag parsed from Question.knowledge_points"""
+    __tablename__ = 'tags'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Tag {self.id}: {self.name}>'
+
+
 class Question(db.Model):
     """Question model for storing professional domain questions"""
     __tablename__ = 'questions'
@@ -80,28 +178,54 @@ class Question(db.Model):
     standard_answer = db.Column(db.Text, nullable=False)
     solution_approach = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
-    test_results = db.relationship('TestResult', backref='question', lazy=True, cascade='all, delete-orphan')
+    test_results = db.relationship('TestResult', backref='question', lazy=True, cascade='all, delete-orphan',
+                                   passive_deletes=True)
+    tags = db.relationship('Tag', secondary=question_tags, backref=db.backref('questions', lazy='dynamic'), lazy=True,
+                           passive_deletes=True)
 
     def __repr__(self):
         return f'<Question {self.id}: {self.title}>'
 
 
+class QuestionSignature(db.Model):
+    """MinHash signature of a question's text, used for near-duplicate detection"""
+    __tablename__ = 'question_signatures'
+
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # packed little-endian uint32 values
+
+    def __repr__(self):
+        return f'<QuestionSignature {self.question_id}>'
+
+
+# LSH buckets: one row per (band hash, question); questions sharing a band are duplicate candidates
+question_lsh_bands = db.Table(
+    'question_lsh_bands',
+    db.Column('band_key', db.BigInteger, primary_key=True),
+    db.Column('question_id', db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True,
+              index=True)
+)
+
+
 class TestResult(db.Model):
     """Test result model for storing AI testing outcomes"""
     __tablename__ = 'test_results'
 
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False,
+                            index=True)
     test_date = db.Column(db.DateTime, default=datetime.utcnow)
     total_attempts = db.Column(db.Integer, default=8)
-    correct_count = db.Column(db.Integer, nullable=False)
+    correct_count = db.Column(db.Integer, nullable=False)  # running count while the test is in progress
+    completed_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     success_rate = db.Column(db.Float, nullable=False)  # percentage
     qualified = db.Column(db.Boolean, nullable=False)  # true if success_rate < 50%
     difficulty_status = db.Column(db.String(20), nullable=False)  # format "X/8"
     status = db.Column(db.String(20), default='running')  # 'running' or 'completed'
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Manual review fields
     manual_review_status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
@@ -110,7 +234,10 @@ class TestResult(db.Model):
     manual_review_comment = db.Column(db.Text)  # optional review comment
 
     # Relationships
-    api_call_logs = db.relationship('ApiCallLog', backref='test_result', lazy=True, cascade='all, delete-orphan')
+    api_call_logs = db.relationship('ApiCallLog', backref='test_result', lazy=True, cascade='all, delete-orphan',
+                                    passive_deletes=True)
+    log_archive = db.relationship('ApiCallLogArchive', lazy=True, uselist=False, cascade='all, delete-orphan',
+                                  passive_deletes=True)
 
     def __repr__(self):
         return f'<TestResult {self.id}: Q{self.question_id} - {self.correct_count}/{self.total_attempts}>'
@@ -121,13 +248,50 @@ class ApiCallLog(db.Model):
     __tablename__ = 'api_call_logs'
 
     id = db.Column(db.Integer, primary_key=True)
-    test_result_id = db.Column(db.Integer, db.ForeignKey('test_results.id'), nullable=False)
+    test_result_id = db.Column(db.Integer, db.ForeignKey('test_results.id', ondelete='CASCADE'), nullable=False,
+                               index=True)
     attempt_number = db.Column(db.Integer, nullable=False)  # 1-8
-    ai_answer = db.Column(db.Text, nullable=False)
+    # Answer texts are compressed and only loaded where they are displayed
+    ai_answer = db.deferred(db.Column(CompressedText, nullable=False), group='texts')
     is_correct = db.Column(db.Boolean, nullable=False)
-    verification_response = db.Column(db.Text)
-    call_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    verification_response = db.deferred(db.Column(CompressedText), group='texts')
+    call_timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     error_message = db.Column(db.Text)
+    model = db.Column(db.String(100))  # model that produced ai_answer
+    latency_ms = db.Column(db.Integer)  # duration of the answer call
 
     def __repr__(self):
         return f'<ApiCallLog {self.id}: Attempt {self.attempt_number}>'
+
+
+class ApiCallLogArchive(db.Model):
+    """Archived API call logs of one test result, stored as compressed JSON"""
+    __tablename__ = 'api_call_log_archive'
+
+    test_result_id = db.Column(db.Integer, db.ForeignKey('test_results.id', ondelete='CASCADE'), primary_key=True)
+    log_count = db.Column(db.Integer, nullable=False)
+    first_call = db.Column(db.DateTime, index=True)  # call_timestamp range of the archived logs
+    last_call = db.Column(db.DateTime, index=True)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON list of log rows
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ApiCallLogArchive {self.test_result_id}: {self.log_count} logs>'
+
+
+class TestResultRollup(db.Model):
+    """Completed test results aggregated per week, subject, difficulty and question author"""
+    __tablename__ = 'test_result_rollups'
+
+    week_start = db.Column(db.Date, primary_key=True)  # Monday of the test's week
+    subject = db.Column(db.String(50), primary_key=True)
+    difficulty = db.Column(db.String(20), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)  # question author
+    tests = db.Column(db.Integer, nullable=False, default=0)
+    qualified = db.Column(db.Integer, nullable=False, default=0)
+    success_rate_sum = db.Column(db.Float, nullable=False, default=0.0)
+    reviewed = db.Column(db.Integer, nullable=False, default=0)  # approved or rejected
+    approved = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TestResultRollup {self.week_start} {self.subject}/{self.difficulty}/{self.user_id}: {self.tests}>'
@@ -0,0 +1,46 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask_login import login_required, current_user
+from app.services.analytics_service import analytics_service, GROUP_COLUMNS
+
+bp = Blueprint('analytics', __name__)
+
+
+def _summary_args():
+    """Read the grouping and filters shared by the page and the API"""
+    group_by = request.args.get('group_by', 'subject')
+    if group_by not in GROUP_COLUMNS:
+        group_by = 'subject'
+    return {
+        'group_by': group_by,
+        'subject': request.args.get('subject', '').strip() or None,
+        'difficulty': request.args.get('difficulty', '').strip() or None,
+        'weeks': request.args.get('weeks', type=int),
+    }
+
+
+@bp.route('/admin/analytics')
+@login_required
+def analytics():
+    """Admin view of qualification, success and approval rates from the rollups"""
+    if not current_user.is_admin():
+        flash('您没有权限访问此页面', 'error')
+        return redirect(url_for('questions.index'))
+
+    args = _summary_args()
+    return render_template('analytics.html',
+                           rows=analytics_service.summary(**args),
+                           weekly=analytics_service.summary('week', subject=args['subject'],
+                                                            difficulty=args['difficulty'],
+                                                            weeks=args['weeks'] or 12),
+                           **args)
+
+
+@bp.route('/api/analytics')
+@login_required
+def api_analytics():
+    """Analytics rollups as JSON, grouped by subject, difficulty, user or week"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Permission denied'}), 403
+
+    args = _summary_args()
+    return jsonify({**args, 'rows': analytics_service.summary(**args)})
@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models import db, User, ReviewerApplication
+from app.services.user_cache import user_cache
+from app.services.password_service import password_service, PasswordServiceBusy
 from datetime import datetime
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -80,9 +82,22 @@ def login():
             flash('请输入用户名和密码', 'error')
             return redirect(url_for('auth.login'))
 
+        if password_service.is_rate_limited(username, request.remote_addr):
+            flash('登录尝试过于频繁，请稍后再试', 'error')
+            return render_template('auth/login.html'), 429
+
         user = User.query.filter_by(username=username).first()
 
-        if user and user.check_password(password):
+        try:
+            password_ok = user is not None and password_service.verify(user, password)
+        except PasswordServiceBusy:
+            flash('当前登录人数较多，请稍后再试', 'error')
+            return render_template('auth/login.html'), 503
+
+        if password_ok:
+            if db.session.is_modified(user):
+                # The password hash was upgraded to the configured method
+                db.session.commit()
             login_user(user)
             flash(f'欢迎回来，{user.username}！', 'success')
 
@@ -212,6 +227,8 @@ def review_application(app_id):
 
     try:
         db.session.commit()
+        if decision == 'approved':
+            user_cache.invalidate(application.user_id)
         result_text = '通过' if decision == 'approved' else '拒绝'
         flash(f'申请已{result_text}', 'success')
     except Exception as e:
@@ -0,0 +1,43 @@
+import hmac
+from flask import Blueprint, Response, request, current_app, abort, render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from app.services.metrics_service import metrics_service
+from app.services.query_profiler import query_profiler
+
+bp = Blueprint('monitoring', __name__)
+
+
+def _metrics_authorized():
+    """Admins may view metrics in the browser; scrapers use METRICS_TOKEN"""
+    token = current_app.config['METRICS_TOKEN']
+    auth_header = request.headers.get('Authorization', '')
+    if token and auth_header.startswith('Bearer '):
+        return hmac.compare_digest(auth_header[len('Bearer '):], token)
+    return current_user.is_authenticated and current_user.is_admin()
+
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus metrics aggregated over all worker processes"""
+    if not metrics_service.enabled:
+        abort(404)
+    if not _metrics_authorized():
+        abort(403)
+
+    return Response(metrics_service.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/admin/sql-profile')
+@login_required
+def sql_profile():
+    """Admin view of the endpoints issuing the most SQL and the slow-query log"""
+    if not current_user.is_admin():
+        flash('您没有权限访问此页面', 'error')
+        return redirect(url_for('questions.index'))
+
+    return render_template('sql_profile.html',
+                           profiler_enabled=query_profiler.enabled,
+                           metrics_enabled=metrics_service.enabled,
+                           endpoints=query_profiler.worst_endpoints(),
+                           slow_queries=query_profiler.recent_slow_queries(),
+                           slow_query_ms=current_app.config['SLOW_QUERY_MS'])
@@ -1,6 +1,16 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, make_response,
+                   current_app)
 from flask_login import login_required, current_user
-from app.models import db, Question, User
+from sqlalchemy import func
+from app.models import db, Question, User, TestResult
+from app.services.search_service import search_service
+from app.services.tag_service import tag_service
+from app.services.testing_service import testing_service
+from app.services.import_service import import_service
+from app.services.fragment_cache import fragment_cache
+from app.services.latex_service import latex_service
+from app.services.dedup_service import dedup_service
+from app.services.analytics_service import analytics_service
 
 bp = Blueprint('questions', __name__)
 
@@ -13,6 +23,8 @@ def index():
     subject = request.args.get('subject', '')
     difficulty = request.args.get('difficulty', '')
     submitter = request.args.get('submitter', '')
+    search_query = request.args.get('q', '').strip()
+    tag = request.args.get('tag', '').strip()
 
     # Build query based on user role
     if current_user.is_user():
@@ -28,6 +40,10 @@ def index():
         query = query.filter_by(difficulty=difficulty)
     if submitter:
         query = query.join(User).filter(User.real_name == submitter)
+    if search_query:
+        query = search_service.search(query, search_query)
+    if tag:
+        query = tag_service.filter_by_tag(query, tag)
 
     questions = query.order_by(Question.created_at.desc()).all()
 
@@ -49,7 +65,41 @@ def index():
                          submitters=submitters,
                          current_subject=subject,
                          current_difficulty=difficulty,
-                         current_submitter=submitter)
+                         current_submitter=submitter,
+                         current_query=search_query,
+                         current_tag=tag)
+
+
+@bp.route('/api/search')
+@login_required
+def search_api():
+    """Full-text search over questions (AJAX endpoint)"""
+    search_query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+
+    if not search_query:
+        return jsonify({'query': search_query, 'results': []})
+
+    query = Question.query
+    if current_user.is_user():
+        # Regular users can only search their own questions
+        query = query.filter_by(user_id=current_user.id)
+    results = search_service.search(query, search_query, ranked=True).limit(limit).all()
+
+    return jsonify({
+        'query': search_query,
+        'results': [
+            {
+                'id': question.id,
+                'title': question.title,
+                'subject': question.subject,
+                'difficulty': question.difficulty,
+                'knowledge_points': question.knowledge_points,
+                'url': url_for('questions.view_question', question_id=question.id)
+            }
+            for question in results
+        ]
+    })
 
 
 @bp.route('/new', methods=['GET', 'POST'])
@@ -75,6 +125,19 @@ def new_question():
             flash('所有字段都是必填的', 'error')
             return render_template('question_form.html', form_data=request.form)
 
+        # Every new question starts an 8-attempt test, so catch near-duplicates first
+        if current_app.config['DEDUP_ENABLED']:
+            duplicates = dedup_service.find_similar(question_text)
+            fingerprint = dedup_service.text_fingerprint(question_text)
+            blocked = current_app.config['DEDUP_ACTION'] == 'block'
+            if duplicates and (blocked or request.form.get('confirm_duplicate') != fingerprint):
+                if blocked:
+                    flash('已存在高度相似的问题，不能重复提交', 'error')
+                else:
+                    flash('发现高度相似的问题，请确认后再提交', 'warning')
+                return render_template('question_form.html', form_data=request.form, duplicates=duplicates,
+                                       duplicate_fingerprint=fingerprint, duplicate_blocked=blocked)
+
         # Create question with current user as author
         question = Question(
             user_id=current_user.id,
@@ -87,10 +150,14 @@ def new_question():
             standard_answer=standard_answer,
             solution_approach=solution_approach
         )
+        tag_service.sync_question_tags(question)
 
         try:
             db.session.add(question)
+            db.session.flush()
+            dedup_service.index_questions([(question.id, question_text)])
             db.session.commit()
+            latex_service.prerender(question_text, standard_answer, solution_approach)
             flash('问题创建成功！正在自动运行测试...', 'success')
             # 自动运行测试
             return redirect(url_for('testing.run_test_sync', question_id=question.id))
@@ -102,6 +169,42 @@ def new_question():
     return render_template('question_form.html', form_data=None)
 
 
+@bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_questions():
+    """Bulk import questions from an Excel template or JSONL file"""
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        auto_test = request.form.get('auto_test') == '1'
+
+        if not upload or not upload.filename:
+            flash('请选择要导入的文件', 'error')
+            return redirect(url_for('questions.import_questions'))
+
+        try:
+            records = import_service.iter_records(upload.stream, upload.filename)
+            report = import_service.import_records(records, current_user.id, auto_test=auto_test)
+        except Exception as e:
+            db.session.rollback()
+            flash(f'导入失败: {str(e)}', 'error')
+            return redirect(url_for('questions.import_questions'))
+
+        if report['imported']:
+            flash(f"成功导入 {report['imported']} 个问题", 'success')
+        if report['failed']:
+            flash(f"{report['failed']} 行数据未通过校验", 'warning')
+        if report['skipped']:
+            flash(f"{report['skipped']} 行与已有问题高度相似，已跳过", 'warning')
+        elif report['duplicates']:
+            flash(f"{report['duplicates']} 行与已有问题高度相似，已导入，请检查", 'warning')
+        if report['not_queued']:
+            flash(f"测试队列已满，{report['not_queued']} 个问题未加入自动测试", 'warning')
+
+        return render_template('question_import.html', report=report)
+
+    return render_template('question_import.html', report=None)
+
+
 @bp.route('/edit/<int:question_id>', methods=['GET', 'POST'])
 @login_required
 def edit_question(question_id):
@@ -114,6 +217,8 @@ def edit_question(question_id):
         return redirect(url_for('questions.index'))
 
     if request.method == 'POST':
+        old_subject, old_difficulty, old_text = question.subject, question.difficulty, question.question_text
+
         # Get form data
         question.title = request.form.get('title', '').strip()
         question.question_type = request.form.get('question_type', '').strip()
@@ -133,8 +238,30 @@ def edit_question(question_id):
             flash('所有字段都是必填的', 'error')
             return render_template('question_form.html', question=question, form_data=request.form)
 
+        # Same near-duplicate check as new_question whenever the text changed
+        if current_app.config['DEDUP_ENABLED'] and question.question_text != old_text:
+            with db.session.no_autoflush:
+                duplicates = dedup_service.find_similar(question.question_text, exclude_id=question_id)
+            fingerprint = dedup_service.text_fingerprint(question.question_text)
+            blocked = current_app.config['DEDUP_ACTION'] == 'block'
+            if duplicates and (blocked or request.form.get('confirm_duplicate') != fingerprint):
+                if blocked:
+                    flash('已存在高度相似的问题，不能保存修改', 'error')
+                else:
+                    flash('发现高度相似的问题，请确认后再提交', 'warning')
+                return render_template('question_form.html', question=question, form_data=request.form,
+                                       duplicates=duplicates, duplicate_fingerprint=fingerprint,
+                                       duplicate_blocked=blocked)
+
+        tag_service.sync_question_tags(question)
+
         try:
+            dedup_service.index_questions([(question_id, question.question_text)])
+            analytics_service.move_question(question_id, old_subject, old_difficulty,
+                                            question.subject, question.difficulty)
             db.session.commit()
+            fragment_cache.invalidate('question', [question_id])
+            latex_service.prerender(question.question_text, question.standard_answer, question.solution_approach)
             flash('问题更新成功！', 'success')
             return redirect(url_for('questions.index'))
         except Exception as e:
@@ -157,7 +284,7 @@ def delete_question(question_id):
         return redirect(url_for('questions.index'))
 
     try:
-        db.session.delete(question)
+        testing_service.delete_questions([question_id])
         db.session.commit()
         flash('问题删除成功！', 'success')
     except Exception as e:
@@ -171,11 +298,57 @@ def delete_question(question_id):
 @login_required
 def view_question(question_id):
     """View question details"""
-    question = Question.query.get_or_404(question_id)
+    row = db.session.query(Question.user_id, Question.updated_at).filter(Question.id == question_id).first()
+    if row is None:
+        abort(404)
+    author_id, question_updated = row
 
     # Check permission: users can only view their own questions
-    if current_user.is_user() and question.user_id != current_user.id:
+    if current_user.is_user() and author_id != current_user.id:
         flash('您没有权限查看此问题', 'error')
         return redirect(url_for('questions.index'))
 
-    return render_template('question_detail.html', question=question)
+    # The page lists the question's test results, so they are part of its version
+    result_count, results_updated = db.session.query(func.count(TestResult.id), func.max(TestResult.updated_at)) \
+        .filter(TestResult.question_id == question_id).one()
+    version = f'{question_updated}|{result_count}|{results_updated}'
+    last_modified = max(filter(None, (question_updated, results_updated)), default=None)
+    etag = fragment_cache.etag('question', question_id, version, current_user.id)
+    if fragment_cache.is_not_modified(etag, last_modified):
+        return fragment_cache.set_validators(make_response('', 304), etag, last_modified)
+
+    body = fragment_cache.get_or_render(
+        'question', question_id, version,
+        lambda: render_template('fragments/question_detail_body.html', question=db.session.get(Question, question_id))
+    )
+    response = make_response(render_template('question_detail.html', body=body))
+    return fragment_cache.set_validators(response, etag, last_modified)
+
+
+@bp.route('/api/tags')
+@login_required
+def tag_counts_api():
+    """Question counts per knowledge-point tag (AJAX endpoint)"""
+    prefix = request.args.get('prefix', '').strip()
+    limit = request.args.get('limit', type=int)
+
+    base_query = None
+    if current_user.is_user():
+        # Regular users only see coverage of their own questions
+        base_query = Question.query.filter_by(user_id=current_user.id)
+
+    counts = tag_service.tag_counts(prefix=prefix, limit=limit, base_query=base_query)
+
+    return jsonify({
+        'tags': [{'name': name, 'question_count': question_count} for name, question_count in counts]
+    })
+
+
+@bp.route('/api/tags/autocomplete')
+@login_required
+def tag_autocomplete_api():
+    """Tag name suggestions for a prefix (AJAX endpoint)"""
+    prefix = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+
+    return jsonify({'suggestions': tag_service.autocomplete(prefix, limit)})
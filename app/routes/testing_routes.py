@@ -1,14 +1,40 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file,
+                   Response, stream_with_context, current_app, abort, make_response)
 from flask_login import login_required, current_user
-from app.models import db, Question, TestResult, ApiCallLog, User
+from markupsafe import Markup
+from app.models import db, Question, TestResult, User
 from app.services.testing_service import testing_service
 from app.services.export_service import export_service
+from app.services.export_job_service import export_job_service
+from app.services.metrics_service import metrics_service
+from app.services.tracing_service import tracing_service
+from app.services.fragment_cache import fragment_cache
+from app.services.archive_service import archive_service
+from app.services.analytics_service import analytics_service
 from datetime import datetime
 import threading
 
 bp = Blueprint('testing', __name__, url_prefix='/testing')
 
 
+def _start_test_thread(question_id, test_result_id=None):
+    """Run a test in a background thread that reuses this application and its engine"""
+    app = current_app._get_current_object()
+
+    def run_test_async():
+        with app.app_context():
+            try:
+                testing_service.run_question_test(question_id, test_result_id)
+            except Exception as e:
+                app.logger.error(f"Background test for question {question_id} failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=run_test_async, name=f'test-run-{question_id}')
+    thread.daemon = True
+    thread.start()
+
+
 @bp.route('/run/<int:question_id>', methods=['POST'])
 @login_required
 def run_test(question_id):
@@ -22,14 +48,7 @@ def run_test(question_id):
 
     try:
         # Run test in background thread to avoid blocking
-        def run_test_async():
-            from app import create_app
-            app = create_app()
-            with app.app_context():
-                testing_service.run_question_test(question_id)
-
-        thread = threading.Thread(target=run_test_async)
-        thread.start()
+        _start_test_thread(question_id)
 
         flash(f'测试已启动: {question.title}', 'info')
         return redirect(url_for('testing.test_list'))
@@ -52,7 +71,6 @@ def run_test_sync(question_id):
 
     try:
         # Create test result record first
-        from flask import current_app
         test_result = TestResult(
             question_id=question_id,
             total_attempts=current_app.config['TEST_ATTEMPTS'],
@@ -65,16 +83,7 @@ def run_test_sync(question_id):
         db.session.commit()
 
         # Start test in background thread
-        def run_test_async():
-            from app import create_app
-            app = create_app()
-            with app.app_context():
-                testing_service.run_question_test(question_id, test_result.id)
-
-        import threading
-        thread = threading.Thread(target=run_test_async)
-        thread.daemon = True
-        thread.start()
+        _start_test_thread(question_id, test_result.id)
 
         # Show progress page
         return render_template('test_progress.html',
@@ -114,49 +123,57 @@ def test_list():
 @login_required
 def view_result(test_result_id):
     """View detailed test result"""
-    test_result = TestResult.query.get_or_404(test_result_id)
+    # Validators first: a completed result only changes through manual review or question edits
+    row = db.session.query(TestResult.status, TestResult.updated_at, Question.updated_at, Question.user_id) \
+        .join(Question, TestResult.question_id == Question.id) \
+        .filter(TestResult.id == test_result_id).first()
+    if row is None:
+        abort(404)
+    status, result_updated, question_updated, author_id = row
 
     # Check permission: users can only view their own question results
-    if current_user.is_user() and test_result.question.user_id != current_user.id:
+    if current_user.is_user() and author_id != current_user.id:
         flash('您没有权限查看此测试结果', 'error')
         return redirect(url_for('testing.test_list'))
 
-    api_logs = ApiCallLog.query.filter_by(test_result_id=test_result_id).order_by(ApiCallLog.attempt_number).all()
+    def render_body():
+        test_result = db.session.get(TestResult, test_result_id)
+        api_logs = archive_service.get_logs(test_result_id)
+        waterfall = tracing_service.get_waterfall(test_result_id)
+        return render_template('fragments/test_detail_body.html', test_result=test_result,
+                               api_logs=api_logs, waterfall=waterfall)
+
+    if status != 'completed':
+        return render_template('test_detail.html', body=Markup(render_body()))
 
-    return render_template('test_detail.html', test_result=test_result, api_logs=api_logs)
+    version = f'{result_updated}|{question_updated}|{tracing_service.trace_version(test_result_id)}'
+    last_modified = max(filter(None, (result_updated, question_updated)), default=None)
+    etag = fragment_cache.etag('test_result', test_result_id, version, current_user.id)
+    if fragment_cache.is_not_modified(etag, last_modified):
+        return fragment_cache.set_validators(make_response('', 304), etag, last_modified)
+
+    body = fragment_cache.get_or_render('test_result', test_result_id, version, render_body)
+    response = make_response(render_template('test_detail.html', body=body))
+    return fragment_cache.set_validators(response, etag, last_modified)
 
 
 @bp.route('/progress/<int:test_result_id>')
 @login_required
 def get_progress(test_result_id):
     """Get test progress (AJAX endpoint)"""
-    test_result = TestResult.query.get(test_result_id)
-
-    if not test_result:
-        return jsonify({'error': 'Test result not found'}), 404
-
-    # Check permission
-    if current_user.is_user() and test_result.question.user_id != current_user.id:
-        return jsonify({'error': 'Permission denied'}), 403
+    # Logs of attempts after this attempt number are included; 0 returns all logs
+    since = request.args.get('since', 0, type=int)
 
-    progress = testing_service.get_test_progress(test_result_id)
+    progress = testing_service.get_test_progress(test_result_id, since_attempt=since)
 
     if not progress:
         return jsonify({'error': 'Test result not found'}), 404
 
-    # Get API call logs for detailed progress
-    api_logs = ApiCallLog.query.filter_by(test_result_id=test_result_id).order_by(ApiCallLog.attempt_number).all()
-
-    # Add log details to progress
-    progress['logs'] = [
-        {
-            'attempt_number': log.attempt_number,
-            'is_correct': log.is_correct,
-            'ai_answer': log.ai_answer[:100] if log.ai_answer else '',
-            'error_message': log.error_message
-        }
-        for log in api_logs
-    ]
+    # Check permission (the test result is already in the session identity map)
+    if current_user.is_user():
+        test_result = db.session.get(TestResult, test_result_id)
+        if test_result.question.user_id != current_user.id:
+            return jsonify({'error': 'Permission denied'}), 403
 
     return jsonify(progress)
 
@@ -177,9 +194,8 @@ def export_results():
         return redirect(url_for('testing.test_list'))
 
     try:
-        output_path = export_service.export_to_excel(test_result_ids)
-        flash(f'导出成功！文件已保存到: {output_path}', 'success')
-        return send_file(output_path, as_attachment=True)
+        key = export_job_service.cache_key_for_ids(test_result_ids)
+        return _start_export_job(key, test_result_ids)
 
     except Exception as e:
         flash(f'导出失败: {str(e)}', 'error')
@@ -196,20 +212,200 @@ def export_qualified():
         return redirect(url_for('testing.test_list'))
 
     try:
-        output_path = export_service.export_qualified_questions()
-
-        if not output_path:
+        if not TestResult.query.filter_by(qualified=True).first():
             flash('没有找到合格的测试结果', 'warning')
             return redirect(url_for('testing.test_list'))
 
-        flash(f'导出成功！文件已保存到: {output_path}', 'success')
-        return send_file(output_path, as_attachment=True)
+        key = export_job_service.cache_key_for_qualified()
+        return _start_export_job(key)
 
     except Exception as e:
         flash(f'导出失败: {str(e)}', 'error')
         return redirect(url_for('testing.test_list'))
 
 
+def _start_export_job(key, test_result_ids=None):
+    """Serve a cached export directly, otherwise start it and show the status page"""
+    status = export_job_service.start_export(key, test_result_ids)
+
+    if status == 'ready':
+        return redirect(url_for('testing.export_download', key=key))
+
+    return render_template('export_status.html', key=key)
+
+
+@bp.route('/export/status/<key>')
+@login_required
+def export_status(key):
+    """Get export job status (AJAX endpoint)"""
+    if not (current_user.is_reviewer() or current_user.is_admin()):
+        return jsonify({'error': 'Permission denied'}), 403
+
+    status = export_job_service.get_status(key)
+    if not status:
+        return jsonify({'error': 'Export not found'}), 404
+
+    response = {'key': key, 'status': status}
+    if status == 'ready':
+        response['download_url'] = url_for('testing.export_download', key=key)
+    elif status == 'failed':
+        response['error'] = export_job_service.get_error(key)
+
+    return jsonify(response)
+
+
+@bp.route('/export/download/<key>')
+@login_required
+def export_download(key):
+    """Download a finished export"""
+    if not (current_user.is_reviewer() or current_user.is_admin()):
+        flash('您没有权限导出测试结果', 'error')
+        return redirect(url_for('testing.test_list'))
+
+    output_path = export_job_service.get_result_path(key)
+    if not output_path:
+        flash('导出文件不存在或已过期，请重新导出', 'error')
+        return redirect(url_for('testing.test_list'))
+
+    download_name = f"test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return send_file(output_path, as_attachment=True, download_name=download_name)
+
+
+# Streamed export formats: format -> (file extension, mimetype)
+STREAM_FORMATS = {
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'jsonl': ('jsonl', 'application/x-ndjson; charset=utf-8'),
+}
+
+
+@bp.route('/export-stream', methods=['GET', 'POST'])
+@login_required
+def export_stream():
+    """Stream test results as CSV or JSON Lines straight from the database cursor"""
+    # Only reviewers and admins can export
+    if not (current_user.is_reviewer() or current_user.is_admin()):
+        return jsonify({'error': 'Permission denied'}), 403
+
+    export_format = request.values.get('format', 'csv')
+    if export_format not in STREAM_FORMATS:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    use_gzip = request.values.get('gzip', '') in ('1', 'true')
+
+    # POST exports the selected results, GET exports all qualified results
+    if request.method == 'POST':
+        test_result_ids = request.form.getlist('test_result_ids', type=int)
+        if not test_result_ids:
+            return jsonify({'error': 'No test results selected'}), 400
+        rows = export_service.iter_rows_for_ids(test_result_ids)
+    else:
+        rows = export_service.iter_qualified_rows()
+
+    return _stream_export_response(rows, export_format, use_gzip)
+
+
+@bp.route('/export-incremental')
+@login_required
+def export_incremental():
+    """
+    Stream only the results changed since a watermark (ISO timestamp).
+    Rows are keyed by test_result_id and may repeat across runs; deletions are not reported.
+    """
+    # Only reviewers and admins can export
+    if not (current_user.is_reviewer() or current_user.is_admin()):
+        return jsonify({'error': 'Permission denied'}), 403
+
+    export_format = request.args.get('format', 'jsonl')
+    if export_format not in STREAM_FORMATS:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    use_gzip = request.args.get('gzip', '') in ('1', 'true')
+    qualified_only = request.args.get('qualified_only', '') in ('1', 'true')
+
+    since = None
+    since_param = request.args.get('since', '').strip()
+    if since_param:
+        try:
+            since = datetime.fromisoformat(since_param)
+        except ValueError:
+            return jsonify({'error': f'Invalid watermark: {since_param}'}), 400
+
+    watermark = export_service.changed_watermark(since, qualified_only)
+    if watermark is None:
+        rows = []
+    else:
+        rows = export_service.iter_changed_rows(since, watermark, qualified_only)
+
+    response = _stream_export_response(rows, export_format, use_gzip, keyed=True)
+    # Pass this value as `since` on the next run
+    response.headers['X-Export-Watermark'] = watermark.isoformat() if watermark else ''
+    return response
+
+
+@bp.route('/export-attempts')
+@login_required
+def export_attempts():
+    """Stream attempt-level API call logs as JSON Lines for offline analysis"""
+    # Only reviewers and admins can export
+    if not (current_user.is_reviewer() or current_user.is_admin()):
+        return jsonify({'error': 'Permission denied'}), 403
+
+    try:
+        start = _parse_datetime_arg('start')
+        end = _parse_datetime_arg('end')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = export_service.iter_attempt_rows(
+        start=start,
+        end=end,
+        subject=request.args.get('subject', '').strip() or None,
+        model=request.args.get('model', '').strip() or None
+    )
+    chunks = metrics_service.observe_iter('export_duration_seconds',
+                                          export_service.iter_attempts_jsonl(rows), kind='attempts')
+
+    filename = f"attempts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    mimetype = STREAM_FORMATS['jsonl'][1]
+    if request.args.get('gzip', '') in ('1', 'true'):
+        chunks = export_service.gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def _parse_datetime_arg(name):
+    """Parse an optional ISO date/datetime query argument"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}: {value}')
+
+
+def _stream_export_response(rows, export_format, use_gzip, keyed=False):
+    """Build a chunked download response for rows in a streamed format"""
+    if export_format == 'csv':
+        chunks = export_service.iter_csv(rows, keyed=keyed)
+    else:
+        chunks = export_service.iter_jsonl(rows)
+    chunks = metrics_service.observe_iter('export_duration_seconds', chunks, kind=export_format)
+
+    extension, mimetype = STREAM_FORMATS[export_format]
+    filename = f"test_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    if use_gzip:
+        chunks = export_service.gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
 @bp.route('/delete/<int:test_result_id>', methods=['POST'])
 @login_required
 def delete_result(test_result_id):
@@ -226,7 +422,7 @@ def delete_result(test_result_id):
     return_url = request.form.get('return_url', '')
 
     try:
-        db.session.delete(test_result)
+        testing_service.delete_test_results([test_result_id])
         db.session.commit()
         flash('测试结果删除成功！', 'success')
     except Exception as e:
@@ -261,13 +457,7 @@ def delete_batch():
         return redirect(url_for('testing.test_list'))
 
     try:
-        deleted_count = 0
-        for test_result_id in test_result_ids:
-            test_result = TestResult.query.get(test_result_id)
-            if test_result:
-                db.session.delete(test_result)
-                deleted_count += 1
-
+        deleted_count = testing_service.delete_test_results(test_result_ids)
         db.session.commit()
         flash(f'成功删除 {deleted_count} 个测试结果！', 'success')
     except Exception as e:
@@ -369,13 +559,16 @@ def review_test(test_result_id):
             return redirect(url_for('testing.review_test', test_result_id=test_result_id))
 
         # Update test result with manual review
+        old_status = test_result.manual_review_status
         test_result.manual_review_status = decision
         test_result.manual_reviewed_by = current_user.username
         test_result.manual_review_time = datetime.utcnow()
         test_result.manual_review_comment = comment if comment else None
+        analytics_service.record_review(test_result, test_result.question, old_status)
 
         try:
             db.session.commit()
+            fragment_cache.invalidate('test_result', [test_result_id])
             result_text = '通过' if decision == 'approved' else '不通过'
             flash(f'审核完成！结果：{result_text}', 'success')
             return redirect(url_for('testing.review_list'))
@@ -385,7 +578,7 @@ def review_test(test_result_id):
             return redirect(url_for('testing.review_test', test_result_id=test_result_id))
 
     # GET request - show review form
-    api_logs = ApiCallLog.query.filter_by(test_result_id=test_result_id).order_by(ApiCallLog.attempt_number).all()
+    api_logs = archive_service.get_logs(test_result_id)
 
     return render_template('review_form.html',
                          test_result=test_result,
@@ -0,0 +1,252 @@
+from datetime import timedelta
+from sqlalchemy import func
+from app.models import db, Question, TestResult, TestResultRollup, User
+
+
+# Additive counters of a rollup row
+COUNTERS = ('tests', 'qualified', 'success_rate_sum', 'reviewed', 'approved')
+
+# Dimensions the analytics can be grouped by
+GROUP_COLUMNS = {
+    'subject': TestResultRollup.subject,
+    'difficulty': TestResultRollup.difficulty,
+    'user': TestResultRollup.user_id,
+    'week': TestResultRollup.week_start,
+}
+
+
+def week_start(moment):
+    """Monday of the week of a datetime"""
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+class AnalyticsService:
+    """
+    Pass-rate, review and throughput analytics from precomputed rollups.
+
+    test_result_rollups holds additive counters per (week, subject,
+    difficulty, question author) for completed test results. The counters
+    are adjusted in the same transaction as every change that affects them:
+    a test completing, a review being saved, a question's subject or
+    difficulty being edited and results being deleted. Queries then only sum
+    a few rows instead of scanning test_results joined to questions.
+    `flask rebuild-analytics` recomputes the table from the source rows and
+    can check it for drift.
+    """
+
+    def _source_rows(self, *conditions):
+        return db.session.query(
+            TestResult.test_date, Question.subject, Question.difficulty, Question.user_id,
+            TestResult.qualified, TestResult.success_rate, TestResult.manual_review_status
+        ).join(Question, TestResult.question_id == Question.id) \
+            .filter(TestResult.status == 'completed', *conditions)
+
+    def _accumulate(self, deltas: dict, rows, sign: int = 1):
+        for test_date, subject, difficulty, user_id, qualified, success_rate, review_status in rows:
+            if test_date is None:
+                continue
+            key = (week_start(test_date), subject, difficulty, user_id)
+            counters = deltas.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            counters['tests'] += sign
+            counters['qualified'] += sign if qualified else 0
+            counters['success_rate_sum'] += sign * (success_rate or 0.0)
+            counters['reviewed'] += sign if review_status in ('approved', 'rejected') else 0
+            counters['approved'] += sign if review_status == 'approved' else 0
+        return deltas
+
+    def _apply(self, deltas: dict):
+        """Add counter deltas to the rollup rows, creating missing rows atomically"""
+        rows = [
+            {'week_start': key[0], 'subject': key[1], 'difficulty': key[2], 'user_id': key[3], **counters}
+            for key, counters in deltas.items() if any(counters.values())
+        ]
+        if not rows:
+            return
+
+        table = TestResultRollup.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            insert = None
+
+        if insert is not None:
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['week_start', 'subject', 'difficulty', 'user_id'],
+                set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS}
+            )
+            db.session.execute(statement, rows)
+            return
+
+        for row in rows:
+            key = [table.c[name] == row[name] for name in ('week_start', 'subject', 'difficulty', 'user_id')]
+            updated = db.session.execute(
+                table.update().where(*key).values({name: table.c[name] + row[name] for name in COUNTERS})
+            )
+            if not updated.rowcount:
+                db.session.execute(table.insert(), [row])
+
+    def record_rows(self, rows, sign: int = 1):
+        """
+        Add (or with sign=-1 remove) completed test results given as plain rows.
+        The caller is responsible for committing the session.
+
+        Args:
+            rows: Iterable of (test_date, subject, difficulty, question author ID,
+                qualified, success_rate, manual_review_status) tuples
+            sign: 1 to add the results, -1 to subtract them
+        """
+        self._apply(self._accumulate({}, rows, sign))
+
+    def record_result(self, test_result: TestResult, question: Question, sign: int = 1):
+        """Add (or with sign=-1 remove) one completed test result"""
+        self.record_rows([(
+            test_result.test_date, question.subject, question.difficulty, question.user_id,
+            test_result.qualified, test_result.success_rate, test_result.manual_review_status
+        )], sign)
+
+    def record_review(self, test_result: TestResult, question: Question, old_status: str):
+        """Move a completed result from its previous review status to its current one"""
+        if test_result.status != 'completed':
+            return
+        deltas = self._accumulate({}, [(test_result.test_date, question.subject, question.difficulty,
+                                        question.user_id, False, 0.0, old_status)], -1)
+        self._accumulate(deltas, [(test_result.test_date, question.subject, question.difficulty,
+                                   question.user_id, False, 0.0, test_result.manual_review_status)])
+        self._apply(deltas)
+
+    def move_question(self, question_id: int, old_subject: str, old_difficulty: str,
+                      new_subject: str, new_difficulty: str):
+        """Re-file a question's completed results after its subject or difficulty changed"""
+        if (old_subject, old_difficulty) == (new_subject, new_difficulty):
+            return
+        with db.session.no_autoflush:
+            rows = self._source_rows(TestResult.question_id == question_id).all()
+        deltas = self._accumulate({}, [(row[0], old_subject, old_difficulty, *row[3:]) for row in rows], -1)
+        self._accumulate(deltas, [(row[0], new_subject, new_difficulty, *row[3:]) for row in rows])
+        self._apply(deltas)
+
+    def remove_results(self, test_result_ids):
+        """
+        Subtract completed results that are about to be deleted.
+
+        Args:
+            test_result_ids: List of IDs or a select of IDs
+        """
+        self.record_rows(self._source_rows(TestResult.id.in_(test_result_ids)), -1)
+
+    def compute(self, batch_size: int = 5000) -> dict:
+        """Compute all rollup counters from test_results and questions"""
+        deltas = {}
+        last_id = 0
+        while True:
+            rows = self._source_rows(TestResult.id > last_id) \
+                .add_columns(TestResult.id) \
+                .order_by(TestResult.id) \
+                .limit(batch_size).all()
+            if not rows:
+                break
+            self._accumulate(deltas, [row[:7] for row in rows])
+            last_id = rows[-1][7]
+        return deltas
+
+    def rebuild(self, check: bool = False) -> list:
+        """
+        Recompute the rollup table from the source rows.
+
+        Args:
+            check: Only compare the stored rollups with the recomputed ones
+
+        Returns:
+            List of (key, stored counters, expected counters) for rows that
+            differ (with check=True) or differed before the rebuild
+        """
+        expected = {key: counters for key, counters in self.compute().items() if any(counters.values())}
+        table = TestResultRollup.__table__
+        stored = {
+            (row.week_start, row.subject, row.difficulty, row.user_id): {name: getattr(row, name) for name in COUNTERS}
+            for row in db.session.execute(table.select())
+        }
+        empty = dict.fromkeys(COUNTERS, 0)
+        differences = []
+        for key in sorted(set(expected) | set(stored), key=str):
+            stored_counters = stored.get(key, empty)
+            expected_counters = expected.get(key, empty)
+            if any(abs(stored_counters[name] - expected_counters[name]) > 1e-6 for name in COUNTERS):
+                differences.append((key, stored_counters, expected_counters))
+
+        if not check:
+            db.session.execute(table.delete())
+            if expected:
+                db.session.execute(table.insert(), [
+                    {'week_start': key[0], 'subject': key[1], 'difficulty': key[2], 'user_id': key[3], **counters}
+                    for key, counters in expected.items()
+                ])
+            db.session.commit()
+        return differences
+
+    def summary(self, group_by: str, subject: str = None, difficulty: str = None, weeks: int = None) -> list:
+        """
+        Aggregate the rollups along one dimension.
+
+        Args:
+            group_by: One of 'subject', 'difficulty', 'user' or 'week'
+            subject: Only this subject
+            difficulty: Only this difficulty
+            weeks: Only the last N weeks
+
+        Returns:
+            List of dictionaries with key, label, tests, qualified,
+            qualification_rate, avg_success_rate, reviewed, approved and
+            approval_rate (rates in percent, None without data)
+        """
+        column = GROUP_COLUMNS[group_by]
+        query = db.session.query(column, *[func.sum(getattr(TestResultRollup, name)) for name in COUNTERS]) \
+            .group_by(column)
+        if subject:
+            query = query.filter(TestResultRollup.subject == subject)
+        if difficulty:
+            query = query.filter(TestResultRollup.difficulty == difficulty)
+        if weeks:
+            latest = db.session.query(func.max(TestResultRollup.week_start)).scalar()
+            if latest is not None:
+                query = query.filter(TestResultRollup.week_start > latest - timedelta(weeks=weeks))
+
+        rows = query.all()
+        labels = {}
+        if group_by == 'user':
+            labels = {user_id: real_name or username for user_id, username, real_name in
+                      db.session.query(User.id, User.username, User.real_name)
+                      .filter(User.id.in_([row[0] for row in rows]))}
+
+        summary = []
+        for key, tests, qualified, success_rate_sum, reviewed, approved in rows:
+            tests, qualified, reviewed, approved = int(tests or 0), int(qualified or 0), int(reviewed or 0), int(approved or 0)
+            if not tests:
+                continue
+            summary.append({
+                'key': key.isoformat() if group_by == 'week' else key,
+                'label': labels.get(key, f'#{key}') if group_by == 'user' else
+                         (key.isoformat() if group_by == 'week' else key),
+                'tests': tests,
+                'qualified': qualified,
+                'qualification_rate': qualified / tests * 100,
+                'avg_success_rate': (success_rate_sum or 0.0) / tests,
+                'reviewed': reviewed,
+                'approved': approved,
+                'approval_rate': approved / reviewed * 100 if reviewed else None,
+            })
+
+        if group_by == 'week':
+            summary.sort(key=lambda row: row['key'])
+        else:
+            summary.sort(key=lambda row: (-row['tests'], str(row['key'])))
+        return summary
+
+
+# Global service instance
+analytics_service = AnalyticsService()
@@ -0,0 +1,182 @@
+import json
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models import db, Question, TestResult, ApiCallLog, ApiCallLogArchive
+
+
+# Columns of an archived log row, in the order of the api_call_logs table
+ARCHIVED_FIELDS = ('id', 'test_result_id', 'attempt_number', 'ai_answer', 'is_correct',
+                   'verification_response', 'call_timestamp', 'error_message', 'model', 'latency_ms')
+
+ArchivedLog = namedtuple('ArchivedLog', ARCHIVED_FIELDS)
+
+# Row format of ExportService.iter_attempt_rows
+AttemptRow = namedtuple('AttemptRow', ['id', 'question_id', 'test_result_id', 'attempt_number', 'subject',
+                                       'model', 'ai_answer', 'is_correct', 'verification_response',
+                                       'latency_ms', 'error_message', 'call_timestamp'])
+
+
+class ArchiveService:
+    """
+    Archival tier for API call logs of old or reviewed test results.
+
+    Every test result adds TEST_ATTEMPTS rows with full answer texts to
+    api_call_logs. The archive job moves the logs of completed results into
+    one api_call_log_archive row per result, holding them as zlib-compressed
+    JSON, and deletes them from the hot table in the same transaction. Reads
+    of a result's logs fall back to the archive, returning ArchivedLog tuples
+    with the same attributes as ApiCallLog.
+    """
+
+    def archive_logs(self, older_than_days: float = None, reviewed: bool = False,
+                     batch_size: int = None, log=None) -> dict:
+        """
+        Move the logs of completed test results into the archive.
+
+        Args:
+            older_than_days: Archive results tested longer ago than this
+                (default ARCHIVE_LOGS_AFTER_DAYS)
+            reviewed: Also archive manually reviewed results, whatever their age
+            batch_size: Test results archived per commit (default ARCHIVE_BATCH_SIZE)
+            log: Optional progress callback taking one message
+
+        Returns:
+            Dictionary with the number of test results and logs archived
+        """
+        if older_than_days is None:
+            older_than_days = current_app.config['ARCHIVE_LOGS_AFTER_DAYS']
+        if batch_size is None:
+            batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+
+        condition = TestResult.test_date < datetime.utcnow() - timedelta(days=older_than_days)
+        if reviewed:
+            condition = condition | TestResult.manual_review_status.in_(['approved', 'rejected'])
+
+        candidates = db.select(TestResult.id).where(
+            TestResult.status == 'completed',
+            condition,
+            db.select(ApiCallLog.id).where(ApiCallLog.test_result_id == TestResult.id).exists()
+        ).order_by(TestResult.id)
+
+        archived = {'test_results': 0, 'logs': 0}
+        last_id = 0
+        while True:
+            result_ids = db.session.scalars(candidates.where(TestResult.id > last_id).limit(batch_size)).all()
+            if not result_ids:
+                break
+            last_id = result_ids[-1]
+            archived['logs'] += self._archive_batch(result_ids)
+            archived['test_results'] += len(result_ids)
+            if log:
+                log(f"已归档 {archived['test_results']} 个测试结果的 {archived['logs']} 条尝试记录")
+
+        return archived
+
+    def _archive_batch(self, result_ids: list) -> int:
+        columns = [getattr(ApiCallLog, field) for field in ARCHIVED_FIELDS]
+        rows = db.session.execute(
+            db.select(*columns).where(ApiCallLog.test_result_id.in_(result_ids))
+            .order_by(ApiCallLog.test_result_id, ApiCallLog.attempt_number)
+        ).all()
+
+        logs_by_result = {}
+        for row in rows:
+            logs_by_result.setdefault(row.test_result_id, []).append(ArchivedLog(*row))
+
+        # Results archived before (e.g. by an interrupted run) get their logs merged
+        existing = {archive.test_result_id: archive for archive in
+                    ApiCallLogArchive.query.filter(ApiCallLogArchive.test_result_id.in_(result_ids))}
+
+        for test_result_id, logs in logs_by_result.items():
+            archive = existing.get(test_result_id)
+            if archive is not None:
+                logs = sorted(self._decode(archive.payload) + logs, key=lambda entry: entry.attempt_number)
+            else:
+                archive = ApiCallLogArchive(test_result_id=test_result_id)
+                db.session.add(archive)
+
+            timestamps = [entry.call_timestamp for entry in logs if entry.call_timestamp]
+            archive.log_count = len(logs)
+            archive.first_call = min(timestamps, default=None)
+            archive.last_call = max(timestamps, default=None)
+            archive.payload = self._encode(logs)
+            archive.archived_at = datetime.utcnow()
+
+        ApiCallLog.query.filter(ApiCallLog.test_result_id.in_(result_ids)) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return len(rows)
+
+    def _encode(self, logs: list) -> bytes:
+        entries = [
+            {**entry._asdict(),
+             'call_timestamp': entry.call_timestamp.isoformat() if entry.call_timestamp else None}
+            for entry in logs
+        ]
+        return zlib.compress(json.dumps(entries, ensure_ascii=False).encode('utf-8'))
+
+    def _decode(self, payload: bytes) -> list:
+        entries = json.loads(zlib.decompress(payload).decode('utf-8'))
+        for entry in entries:
+            if entry['call_timestamp']:
+                entry['call_timestamp'] = datetime.fromisoformat(entry['call_timestamp'])
+        return [ArchivedLog(**{field: entry.get(field) for field in ARCHIVED_FIELDS}) for entry in entries]
+
+    def get_logs(self, test_result_id: int) -> list:
+        """
+        Get the API call logs of a test result, ordered by attempt number.
+
+        Returns:
+            ApiCallLog objects, or ArchivedLog tuples if the logs were archived
+        """
+        logs = ApiCallLog.query.filter_by(test_result_id=test_result_id) \
+            .options(db.undefer_group('texts')) \
+            .order_by(ApiCallLog.attempt_number).all()
+        if logs:
+            return logs
+
+        payload = db.session.scalar(
+            db.select(ApiCallLogArchive.payload).where(ApiCallLogArchive.test_result_id == test_result_id)
+        )
+        return self._decode(payload) if payload is not None else []
+
+    def iter_archived_attempt_rows(self, start: datetime = None, end: datetime = None,
+                                   subject: str = None, model: str = None):
+        """
+        Yield archived attempts in the row format of ExportService.iter_attempt_rows.
+
+        Args:
+            start: Only attempts at or after this time
+            end: Only attempts before this time
+            subject: Only questions of this subject
+            model: Only attempts answered by this model
+        """
+        query = db.session.query(ApiCallLogArchive.payload, TestResult.question_id, Question.subject) \
+            .join(TestResult, ApiCallLogArchive.test_result_id == TestResult.id) \
+            .join(Question, TestResult.question_id == Question.id)
+        if start is not None:
+            query = query.filter(ApiCallLogArchive.last_call >= start)
+        if end is not None:
+            query = query.filter(ApiCallLogArchive.first_call < end)
+        if subject:
+            query = query.filter(Question.subject == subject)
+
+        for payload, question_id, question_subject in query.order_by(ApiCallLogArchive.test_result_id) \
+                .yield_per(current_app.config['EXPORT_CHUNK_SIZE']):
+            for entry in self._decode(payload):
+                if start is not None and (entry.call_timestamp is None or entry.call_timestamp < start):
+                    continue
+                if end is not None and (entry.call_timestamp is None or entry.call_timestamp >= end):
+                    continue
+                if model and entry.model != model:
+                    continue
+                yield AttemptRow(entry.id, question_id, entry.test_result_id, entry.attempt_number,
+                                 question_subject, entry.model, entry.ai_answer, entry.is_correct,
+                                 entry.verification_response, entry.latency_ms, entry.error_message,
+                                 entry.call_timestamp)
+
+
+# Global service instance
+archive_service = ArchiveService()
@@ -0,0 +1,356 @@
+import os
+import gc
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+import threading
+from datetime import datetime
+from sqlalchemy import event
+from app.config import Config, build_engine_options
+
+
+# Benchmarks in run order; delete_batch is destructive and must stay last
+BENCHMARKS = [
+    'questions.index',
+    'testing.test_list',
+    'testing.review_list',
+    'testing.get_progress',
+    'export_to_excel',
+    'testing.delete_batch',
+]
+
+# Test results removed by each delete_batch run
+DELETE_BATCH_SIZE = 100
+
+BENCHMARK_USERNAME = 'benchmark_admin'
+
+
+def parse_scale(value: str) -> int:
+    """Parse a scale such as 1000, 10k or 1m into a number of questions"""
+    value = value.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+class BenchmarkService:
+    """
+    Benchmarks of the main pages, the progress API, Excel export and batch
+    delete on a throwaway SQLite database filled with synthetic data.
+
+    Each benchmark is timed over `repeat` runs (median and p95 latency), with
+    the highest SQL statement count of those runs and the peak Python memory of
+    an extra run under tracemalloc, which is kept out of the timed runs because
+    it slows them down. delete_batch removes a fresh batch of DELETE_BATCH_SIZE
+    results in every run, so a scale without enough results is refused.
+    """
+
+    def _make_app(self, work_dir: str, **overrides):
+        from app import create_app, initialize_database
+
+        database_uri = f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+        config_class = type('BenchmarkConfig', (Config,), {
+            'SQLALCHEMY_DATABASE_URI': database_uri,
+            'SQLALCHEMY_ENGINE_OPTIONS': build_engine_options(
+                database_uri, Config.DB_POOL_SIZE, Config.DB_MAX_OVERFLOW,
+                Config.DB_POOL_RECYCLE, Config.DB_POOL_TIMEOUT, Config.SQLITE_BUSY_TIMEOUT_MS
+            ),
+            'EXPORT_DIR': os.path.join(work_dir, 'exports'),
+            'METRICS_DIR': os.path.join(work_dir, 'metrics'),
+            'TRACE_DIR': os.path.join(work_dir, 'traces'),
+            'LATEX_CACHE_DIR': os.path.join(work_dir, 'latex_cache'),
+            'SQL_PROFILER_ENABLED': False,
+            **overrides,
+        })
+        app = create_app(config_class)
+        initialize_database(app, cleanup=False)
+        return app
+
+    def run(self, scales: list, repeat: int = 5, attempts: int = 8, seed: int = 42, log=print) -> dict:
+        """
+        Run every benchmark at each scale.
+
+        Args:
+            scales: Numbers of questions to generate, one database per scale
+            repeat: Timed runs per benchmark
+            attempts: Attempt logs per test result
+            seed: Random seed for the synthetic data
+            log: Progress callback taking one message
+
+        Returns:
+            Dictionary {scale: {benchmark: {median_ms, p95_ms, queries, peak_kb}}}
+
+        Raises:
+            ValueError: If a scale has too few test results for the delete_batch runs
+        """
+        results = {}
+        for scale in scales:
+            work_dir = tempfile.mkdtemp(prefix='benchmark_')
+            try:
+                results[str(scale)] = self._run_scale(work_dir, scale, repeat, attempts, seed, log)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        return results
+
+    def _run_scale(self, work_dir: str, scale: int, repeat: int, attempts: int, seed: int, log) -> dict:
+        from app.models import db, User, TestResult
+        from app.services.synthetic_data_service import synthetic_data_service, SYNTHETIC_PASSWORD
+        from app.services.export_service import export_service
+
+        app = self._make_app(work_dir)
+        with app.app_context():
+            log(f'[{scale}] generating synthetic data...')
+            started = time.perf_counter()
+            synthetic_data_service.generate(scale, attempts=attempts, seed=seed)
+
+            admin = User(username=BENCHMARK_USERNAME, real_name='Benchmark', organization='Benchmark', role='admin')
+            admin.set_password(SYNTHETIC_PASSWORD)
+            db.session.add(admin)
+            db.session.commit()
+            log(f'[{scale}] generated in {time.perf_counter() - started:.1f}s')
+
+            result_ids = [row[0] for row in db.session.query(TestResult.id).order_by(TestResult.id)]
+            engine = db.engine
+
+        query_count = [0]
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_query(*args):
+            query_count[0] += 1
+
+        client = app.test_client()
+        client.post('/auth/login', data={'username': BENCHMARK_USERNAME, 'password': SYNTHETIC_PASSWORD})
+        progress_id = result_ids[len(result_ids) // 2]
+        # Every delete_batch run (warm-up, timed runs, memory run) removes a full batch
+        delete_runs = repeat + 2
+        if len(result_ids) < delete_runs * DELETE_BATCH_SIZE:
+            raise ValueError(
+                f'scale {scale} has {len(result_ids)} test results, but {delete_runs} delete_batch runs '
+                f'need {delete_runs * DELETE_BATCH_SIZE}; use a larger scale or fewer repeats'
+            )
+        delete_batches = iter([result_ids[run * DELETE_BATCH_SIZE:(run + 1) * DELETE_BATCH_SIZE]
+                               for run in range(delete_runs)])
+
+        def export_all():
+            with app.app_context():
+                path = export_service.export_to_excel(result_ids, f'benchmark_{scale}.xlsx')
+                os.remove(path)
+
+        def delete_batch():
+            ids = next(delete_batches)
+            client.post('/testing/delete-batch', data={'test_result_ids': ids})
+
+        operations = {
+            'questions.index': lambda: client.get('/'),
+            'testing.test_list': lambda: client.get('/testing/results'),
+            'testing.review_list': lambda: client.get('/testing/review-list?status=all'),
+            'testing.get_progress': lambda: client.get(f'/testing/progress/{progress_id}?since=0'),
+            'export_to_excel': export_all,
+            'testing.delete_batch': delete_batch,
+        }
+
+        scale_results = {}
+        for name in BENCHMARKS:
+            operation = operations[name]
+            operation()  # warm-up: template compilation, caches, first connection
+
+            timings = []
+            queries = 0
+            for _ in range(repeat):
+                gc.collect()
+                query_count[0] = 0
+                started = time.perf_counter()
+                operation()
+                timings.append((time.perf_counter() - started) * 1000)
+                queries = max(queries, query_count[0])
+
+            gc.collect()
+            tracemalloc.start()
+            operation()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            timings.sort()
+            scale_results[name] = {
+                'median_ms': round(timings[len(timings) // 2], 2),
+                'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+                'queries': queries,
+                'peak_kb': round(peak / 1024),
+            }
+            log(f"[{scale}] {name}: {scale_results[name]['median_ms']:.1f}ms median, "
+                f"{queries} queries, {scale_results[name]['peak_kb']} KiB peak")
+
+        event.remove(engine, 'before_cursor_execute', count_query)
+        with app.app_context():
+            db.session.remove()
+            engine.dispose()
+        return scale_results
+
+    def run_login(self, concurrency: int = 16, logins: int = 200, users: int = 50, log=print) -> dict:
+        """
+        Measure login throughput under concurrency and its effect on other traffic.
+
+        `concurrency` threads log in as synthetic users until `logins` logins
+        are done, while another thread polls the progress API as a logged-in
+        user would. Progress latency is measured once without and once during
+        the logins, so the second figure shows whether logins starve it.
+        The login rate limit is off for the run.
+
+        Args:
+            concurrency: Threads logging in at the same time
+            logins: Total number of logins
+            users: Synthetic users to log in as
+            log: Progress callback taking one message
+
+        Returns:
+            Dictionary with logins_per_second, login latency, idle and loaded
+            progress latency (median/p95 ms each) and the hashing settings
+        """
+        from app.models import db, User, TestResult
+        from app.services.synthetic_data_service import synthetic_data_service, SYNTHETIC_PASSWORD
+
+        work_dir = tempfile.mkdtemp(prefix='benchmark_')
+        try:
+            app = self._make_app(work_dir, LOGIN_RATE_LIMIT=0, LOGIN_RATE_LIMIT_PER_IP=0)
+            hash_settings = {
+                'hash_method': app.config['PASSWORD_HASH_METHOD'],
+                'hash_workers': app.config['PASSWORD_HASH_WORKERS'],
+            }
+            with app.app_context():
+                synthetic_data_service.generate(users, users=users, attempts=2, with_tags=False)
+                usernames = [row[0] for row in db.session.query(User.username).order_by(User.id)]
+                progress_id = db.session.query(TestResult.id).order_by(TestResult.id).first()[0]
+
+            poller = app.test_client()
+            poller.post('/auth/login', data={'username': usernames[0], 'password': SYNTHETIC_PASSWORD})
+
+            def poll_progress(durations, count=None, until=None):
+                while (count is None or len(durations) < count) and (until is None or not until.is_set()):
+                    started = time.perf_counter()
+                    poller.get(f'/testing/progress/{progress_id}?since=0')
+                    durations.append((time.perf_counter() - started) * 1000)
+
+            idle_progress = []
+            poll_progress(idle_progress, count=50)
+
+            remaining = iter(range(logins))
+            remaining_lock = threading.Lock()
+            login_durations = []
+            failures = [0]
+
+            def login_worker():
+                client = app.test_client()
+                while True:
+                    with remaining_lock:
+                        number = next(remaining, None)
+                    if number is None:
+                        return
+                    started = time.perf_counter()
+                    response = client.post('/auth/login', data={
+                        'username': usernames[number % len(usernames)], 'password': SYNTHETIC_PASSWORD})
+                    login_durations.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 302 or '/auth/login' in response.location:
+                        failures[0] += 1
+                    client.get('/auth/logout')
+
+            log(f'logging in {logins} times with {concurrency} threads...')
+            done = threading.Event()
+            loaded_progress = []
+            progress_thread = threading.Thread(target=poll_progress, args=(loaded_progress,),
+                                               kwargs={'until': done})
+            progress_thread.start()
+            started = time.perf_counter()
+            workers = [threading.Thread(target=login_worker) for _ in range(concurrency)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            done.set()
+            progress_thread.join()
+
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        def summary(durations):
+            durations = sorted(durations)
+            if not durations:
+                return {'median_ms': 0, 'p95_ms': 0}
+            return {
+                'median_ms': round(durations[len(durations) // 2], 2),
+                'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2),
+            }
+
+        return {
+            **hash_settings,
+            'concurrency': concurrency,
+            'logins': logins,
+            'failures': failures[0],
+            'logins_per_second': round(logins / elapsed, 1) if elapsed else 0,
+            'login': summary(login_durations),
+            'progress_idle': summary(idle_progress),
+            'progress_during_logins': summary(loaded_progress),
+        }
+
+    def save_baseline(self, results: dict, path: str):
+        """Store benchmark results as the baseline for later comparisons"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        baseline = {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+
+    def load_baseline(self, path: str) -> dict:
+        """Load the results of a stored baseline, or None if there is none"""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('results')
+
+    def compare(self, results: dict, baseline: dict, tolerance: float = 0.2, min_delta_ms: float = 5) -> list:
+        """
+        Compare results with a baseline.
+
+        A benchmark regresses when its median latency grows by more than
+        `tolerance` (and by at least min_delta_ms, to ignore noise on fast
+        operations) or when it issues more SQL statements than before.
+
+        Returns:
+            List of dictionaries with scale, benchmark, baseline/current values,
+            latency change ratio and a regression flag
+        """
+        rows = []
+        for scale, benchmarks in results.items():
+            for name, current in benchmarks.items():
+                previous = (baseline or {}).get(scale, {}).get(name)
+                if not previous:
+                    continue
+                change = (current['median_ms'] / previous['median_ms'] - 1) if previous['median_ms'] else 0
+                slower = change > tolerance and current['median_ms'] - previous['median_ms'] >= min_delta_ms
+                more_queries = current['queries'] > previous['queries']
+                rows.append({
+                    'scale': scale,
+                    'benchmark': name,
+                    'baseline_ms': previous['median_ms'],
+                    'current_ms': current['median_ms'],
+                    'change': change,
+                    'baseline_queries': previous['queries'],
+                    'current_queries': current['queries'],
+                    'regression': slower or more_queries,
+                })
+        return rows
+
+
+# Global service instance
+benchmark_service = BenchmarkService()
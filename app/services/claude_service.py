@@ -1,7 +1,16 @@
 import time
-from openai import OpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
 from flask import current_app
+from app.services.metrics_service import metrics_service
+from app.services.tracing_service import tracing_service
+
+
+def _before_retry_sleep(retry_state):
+    """tenacity before_sleep hook: count the retry and trace its back-off"""
+    phase = retry_state.kwargs.get('phase', 'answer')
+    metrics_service.inc('llm_call_retries_total', phase=phase)
+    tracing_service.record_span('llm.retry_wait', retry_state.next_action.sleep,
+                                phase=phase, failed_attempt=retry_state.attempt_number)
 
 
 class ClaudeService:
@@ -24,19 +33,24 @@ class ClaudeService:
         if not base_url.endswith('/v1'):
             base_url = base_url.rstrip('/') + '/v1'
 
+        # openai is slow to import, so load it with the first client instead of at worker boot
+        from openai import OpenAI
+
         self.client = OpenAI(
             api_key=api_key,
             base_url=base_url
         )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    def call_claude_stateless(self, question: str) -> str:
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10),
+           before_sleep=_before_retry_sleep)
+    def call_claude_stateless(self, question: str, phase: str = 'answer') -> str:
         """
         Make a stateless API call to Claude AI.
         Each call is independent with no conversation history.
 
         Args:
             question: The question text to send to the AI
+            phase: 'answer' or 'verify', used to label metrics
 
         Returns:
             The AI's response as a string
@@ -44,14 +58,21 @@ class ClaudeService:
         if not self.client:
             self.initialize()
 
+        started = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": question}],
-                temperature=0.7
-            )
+            with tracing_service.span('llm.request', phase=phase, model=self.model):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": question}],
+                    temperature=0.7
+                )
+            metrics_service.observe('llm_call_duration_seconds', time.perf_counter() - started,
+                                    phase=phase, outcome='ok')
             return response.choices[0].message.content.strip()
         except Exception as e:
+            metrics_service.observe('llm_call_duration_seconds', time.perf_counter() - started,
+                                    phase=phase, outcome='error')
+            metrics_service.inc('llm_call_errors_total', phase=phase)
             current_app.logger.error(f"Claude API call failed: {str(e)}")
             raise
 
@@ -78,7 +99,7 @@ AI回答：{ai_answer}
 请只回答"一致"或"不一致"。"""
 
         try:
-            verification_response = self.call_claude_stateless(prompt)
+            verification_response = self.call_claude_stateless(prompt, phase='verify')
             is_correct = "一致" in verification_response and "不一致" not in verification_response
             return is_correct, verification_response
         except Exception as e:
@@ -0,0 +1,256 @@
+import random
+import struct
+import hashlib
+import zlib
+from flask import current_app
+from sqlalchemy import func
+from app.models import db, Question, TestResult, QuestionSignature, question_lsh_bands
+
+
+# MinHash signature length and its split into LSH bands. With 16 bands of 4
+# rows, pairs with a Jaccard similarity of 0.8 share a band over 99.9% of the time
+# and pairs at 0.3 only 12% of the time.
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Texts are compared as sets of overlapping character n-grams
+SHINGLE_SIZE = 3
+
+# Maximum candidates whose signatures are compared for one lookup
+MAX_CANDIDATES = 200
+
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20261019)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+                for _ in range(NUM_PERMUTATIONS)]
+SIGNATURE_FORMAT = f'<{NUM_PERMUTATIONS}I'
+
+
+class DedupService:
+    """
+    Near-duplicate detection of questions with MinHash and locality-sensitive hashing.
+
+    Every question's normalized question_text is turned into a MinHash
+    signature (question_signatures) and the signature's bands are indexed in
+    question_lsh_bands. A lookup hashes the new text, fetches the questions
+    sharing at least one band through the index and estimates the Jaccard
+    similarity from the signatures, so its cost does not grow with the corpus.
+    """
+
+    def normalize(self, text: str) -> str:
+        """Lower-case text without whitespace, so re-wrapped or re-spaced copies match"""
+        return ''.join((text or '').lower().split())
+
+    def signature(self, text: str) -> list:
+        """
+        Compute the MinHash signature of a text.
+
+        Returns:
+            List of NUM_PERMUTATIONS integers, or None if the text is too short
+        """
+        normalized = self.normalize(text)
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+        if not shingles:
+            return None
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+        return [min([(a * h + b) % MERSENNE_PRIME for h in hashes]) & 0xffffffff for a, b in PERMUTATIONS]
+
+    def band_keys(self, signature: list) -> list:
+        """Hash each band of a signature into a signed 64-bit bucket key"""
+        keys = []
+        for band in range(BANDS):
+            values = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+            digest = hashlib.blake2b(struct.pack(f'<I{ROWS_PER_BAND}I', band, *values), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+    def similarity(self, first: list, second: list) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERMUTATIONS
+
+    def index_questions(self, rows):
+        """
+        Add or refresh questions in the similarity index with bulk statements.
+        The caller is responsible for committing the session.
+
+        Args:
+            rows: Iterable of (question_id, question_text) pairs
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        self.remove_questions([question_id for question_id, _ in rows])
+
+        signatures = []
+        bands = []
+        for question_id, question_text in rows:
+            signature = self.signature(question_text)
+            if signature is None:
+                continue
+            signatures.append({'question_id': question_id, 'signature': struct.pack(SIGNATURE_FORMAT, *signature)})
+            bands.extend({'band_key': key, 'question_id': question_id} for key in set(self.band_keys(signature)))
+        if signatures:
+            db.session.execute(db.insert(QuestionSignature), signatures)
+            db.session.execute(question_lsh_bands.insert(), bands)
+
+    def remove_questions(self, question_ids: list):
+        """Drop questions from the index. The caller is responsible for committing the session."""
+        db.session.execute(question_lsh_bands.delete().where(question_lsh_bands.c.question_id.in_(question_ids)))
+        QuestionSignature.query.filter(QuestionSignature.question_id.in_(question_ids)) \
+            .delete(synchronize_session=False)
+
+    def find_similar(self, text: str, threshold: float = None, limit: int = 5, exclude_id: int = None) -> list:
+        """
+        Find indexed questions similar to a text.
+
+        Args:
+            text: Question text to check
+            threshold: Minimum estimated similarity (default DEDUP_THRESHOLD)
+            limit: Maximum number of matches
+            exclude_id: Question to leave out, e.g. the one being edited
+
+        Returns:
+            List of dictionaries with question_id, title, user_id, similarity
+            and latest_result_id (latest completed test result or None), most
+            similar first
+        """
+        if threshold is None:
+            threshold = current_app.config['DEDUP_THRESHOLD']
+        signature = self.signature(text)
+        if signature is None:
+            return []
+
+        shared_bands = func.count().label('shared_bands')
+        candidates = db.session.query(question_lsh_bands.c.question_id, shared_bands) \
+            .filter(question_lsh_bands.c.band_key.in_(self.band_keys(signature)))
+        if exclude_id is not None:
+            candidates = candidates.filter(question_lsh_bands.c.question_id != exclude_id)
+        candidate_ids = [row[0] for row in candidates.group_by(question_lsh_bands.c.question_id)
+                         .order_by(shared_bands.desc()).limit(MAX_CANDIDATES)]
+        if not candidate_ids:
+            return []
+
+        scores = {}
+        for question_id, packed in db.session.query(QuestionSignature.question_id, QuestionSignature.signature) \
+                .filter(QuestionSignature.question_id.in_(candidate_ids)):
+            score = self.similarity(signature, struct.unpack(SIGNATURE_FORMAT, packed))
+            if score >= threshold:
+                scores[question_id] = score
+        if not scores:
+            return []
+
+        best_ids = sorted(scores, key=lambda question_id: (-scores[question_id], question_id))[:limit]
+        questions = {row.id: row for row in db.session.query(Question.id, Question.title, Question.user_id)
+                     .filter(Question.id.in_(best_ids))}
+        latest_results = dict(
+            db.session.query(TestResult.question_id, func.max(TestResult.id))
+            .filter(TestResult.question_id.in_(best_ids), TestResult.status == 'completed')
+            .group_by(TestResult.question_id)
+        )
+        return [
+            {
+                'question_id': question_id,
+                'title': questions[question_id].title,
+                'user_id': questions[question_id].user_id,
+                'similarity': scores[question_id],
+                'latest_result_id': latest_results.get(question_id),
+            }
+            for question_id in best_ids if question_id in questions
+        ]
+
+    def text_fingerprint(self, text: str) -> str:
+        """Short hash of the normalized text, used to confirm a warned submission"""
+        return hashlib.sha256(self.normalize(text).encode('utf-8')).hexdigest()[:16]
+
+    def backfill(self, batch_size: int = 500) -> int:
+        """
+        Rebuild the similarity index for every question.
+
+        Args:
+            batch_size: Number of questions processed per commit
+
+        Returns:
+            Number of questions processed
+        """
+        processed = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(Question.id, Question.question_text) \
+                .filter(Question.id > last_id) \
+                .order_by(Question.id) \
+                .limit(batch_size).all()
+            if not rows:
+                break
+
+            self.index_questions(rows)
+            db.session.commit()
+
+            processed += len(rows)
+            last_id = rows[-1][0]
+
+        return processed
+
+    def find_duplicate_groups(self, threshold: float = None) -> list:
+        """
+        Group the indexed questions into clusters of near-duplicates.
+
+        Questions sharing an LSH bucket are compared pairwise (large buckets
+        against their first member only), and pairs at or above the threshold
+        are merged into groups.
+
+        Returns:
+            List of groups, each a list of question IDs with the oldest first
+        """
+        if threshold is None:
+            threshold = current_app.config['DEDUP_THRESHOLD']
+
+        shared = db.select(question_lsh_bands.c.band_key) \
+            .group_by(question_lsh_bands.c.band_key) \
+            .having(func.count() > 1)
+        buckets = {}
+        for band_key, question_id in db.session.query(question_lsh_bands.c.band_key, question_lsh_bands.c.question_id) \
+                .filter(question_lsh_bands.c.band_key.in_(shared)):
+            buckets.setdefault(band_key, []).append(question_id)
+
+        pairs = set()
+        for members in buckets.values():
+            members.sort()
+            if len(members) <= 50:
+                pairs.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+            else:
+                pairs.update((members[0], b) for b in members[1:])
+        if not pairs:
+            return []
+
+        signatures = {}
+        question_ids = sorted({question_id for pair in pairs for question_id in pair})
+        for start in range(0, len(question_ids), 500):
+            chunk = question_ids[start:start + 500]
+            for question_id, packed in db.session.query(QuestionSignature.question_id, QuestionSignature.signature) \
+                    .filter(QuestionSignature.question_id.in_(chunk)):
+                signatures[question_id] = struct.unpack(SIGNATURE_FORMAT, packed)
+
+        parent = {}
+
+        def find(question_id):
+            while parent.get(question_id, question_id) != question_id:
+                question_id = parent[question_id]
+            return question_id
+
+        for a, b in pairs:
+            if a in signatures and b in signatures and self.similarity(signatures[a], signatures[b]) >= threshold:
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups = {}
+        for question_id in parent:
+            groups.setdefault(find(question_id), set()).add(question_id)
+        for root, members in groups.items():
+            members.add(root)
+        return sorted((sorted(members) for members in groups.values()), key=lambda group: group[0])
+
+
+# Global service instance
+dedup_service = DedupService()
@@ -0,0 +1,299 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from flask import current_app
+from sqlalchemy import func
+from app.models import db, TestResult, Question
+from app.services.export_service import export_service
+from app.services.metrics_service import metrics_service
+
+
+# Cache keys are hex SHA-256 digests
+CACHE_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ExportJobService:
+    """
+    Service for running Excel exports as background jobs.
+
+    Results are cached in EXPORT_DIR under a key derived from the selection and
+    the latest modification time of the exported rows, so repeated exports of
+    unchanged data are served from disk. Job state lives on disk as well
+    (<key>.lock while running, <key>.error on failure), which keeps it visible
+    to every gunicorn worker. A running job refreshes its lock's mtime, so only
+    the lock of a job whose worker died becomes stale and can be taken over.
+    """
+
+    def _export_dir(self) -> str:
+        export_dir = current_app.config['EXPORT_DIR']
+        os.makedirs(export_dir, exist_ok=True)
+        return export_dir
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self._export_dir(), f'{key}{suffix}')
+
+    def _fingerprint_query(self):
+        return db.session.query(
+            func.count(TestResult.id),
+            func.sum(TestResult.id),
+            func.max(TestResult.updated_at),
+            func.max(Question.updated_at)
+        ).join(Question, TestResult.question_id == Question.id)
+
+    def _make_key(self, *parts) -> str:
+        return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def cache_key_for_ids(self, test_result_ids: list) -> str:
+        """Cache key for an export of the selected test results (order matters)"""
+        chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+        latest = []
+        for start in range(0, len(test_result_ids), chunk_size):
+            chunk = test_result_ids[start:start + chunk_size]
+            _, _, result_updated, question_updated = self._fingerprint_query() \
+                .filter(TestResult.id.in_(chunk)).one()
+            latest.extend([result_updated, question_updated])
+
+        latest = max((value for value in latest if value is not None), default=None)
+        return self._make_key('selected', ','.join(str(i) for i in test_result_ids), latest)
+
+    def cache_key_for_qualified(self) -> str:
+        """Cache key for an export of all qualified test results"""
+        count, id_sum, result_updated, question_updated = self._fingerprint_query() \
+            .filter(TestResult.qualified == True).one()
+        return self._make_key('qualified', count, id_sum, result_updated, question_updated)
+
+    def get_status(self, key: str) -> str:
+        """
+        Get the state of an export job.
+
+        Returns:
+            'ready', 'running', 'failed' or None if the key is unknown
+        """
+        if not CACHE_KEY_PATTERN.match(key or ''):
+            return None
+        if os.path.exists(self._path(key, '.xlsx')):
+            return 'ready'
+        if os.path.exists(self._path(key, '.lock')):
+            return 'running'
+        if os.path.exists(self._path(key, '.error')):
+            return 'failed'
+        return None
+
+    def get_error(self, key: str) -> str:
+        """Return the error message of a failed export job"""
+        try:
+            with open(self._path(key, '.error'), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_result_path(self, key: str) -> str:
+        """Return the path of a finished export and mark it as recently used"""
+        if self.get_status(key) != 'ready':
+            return None
+        path = self._path(key, '.xlsx')
+        try:
+            # Eviction is least-recently-used by mtime and spares recently touched files
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def start_export(self, key: str, test_result_ids: list = None) -> str:
+        """
+        Start a background export unless it is cached or already running.
+
+        Args:
+            key: Cache key from cache_key_for_ids or cache_key_for_qualified
+            test_result_ids: Selected IDs, or None to export all qualified results
+
+        Returns:
+            Status of the job after the call
+        """
+        status = self.get_status(key)
+        if status == 'ready':
+            return status
+
+        lock_path = self._path(key, '.lock')
+        if status == 'running' and not self._take_over_stale_lock(lock_path):
+            return status
+
+        try:
+            # Exclusive create makes the lock safe across processes
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return 'running'
+
+        self._remove(self._path(key, '.error'))
+
+        app = current_app._get_current_object()
+        ids = list(test_result_ids) if test_result_ids is not None else None
+
+        def run_export_async():
+            with app.app_context():
+                self._run_export(key, ids)
+
+        thread = threading.Thread(target=run_export_async, name=f'export-job-{key}')
+        thread.daemon = True
+        thread.start()
+
+        return 'running'
+
+    def _remove(self, path: str):
+        """Remove a file that another worker may have removed already"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _take_over_stale_lock(self, lock_path: str) -> bool:
+        """
+        Remove the lock of a job whose worker died, so this worker can start it.
+
+        The lock is first renamed to a name private to this thread, which only
+        one worker can do. If what was renamed turns out to be a fresh lock
+        (another worker took over in between), it is put back.
+
+        Returns:
+            True if the lock is gone and the job may be started
+        """
+        stale_seconds = current_app.config['EXPORT_JOB_STALE_MINUTES'] * 60
+        try:
+            if time.time() - os.path.getmtime(lock_path) < stale_seconds:
+                return False
+        except FileNotFoundError:
+            return True
+
+        claimed_path = f'{lock_path}.{os.getpid()}.{threading.get_ident()}.stale'
+        try:
+            os.rename(lock_path, claimed_path)
+        except FileNotFoundError:
+            return True
+        try:
+            if time.time() - os.path.getmtime(claimed_path) < stale_seconds:
+                try:
+                    os.link(claimed_path, lock_path)
+                except OSError:
+                    pass
+                return False
+            return True
+        finally:
+            self._remove(claimed_path)
+
+    def _keep_lock_fresh(self, lock_path: str, interval: float, stop: threading.Event):
+        """Refresh the lock's mtime until stop is set, so a long job never looks stale"""
+        while not stop.wait(interval):
+            try:
+                os.utime(lock_path)
+            except FileNotFoundError:
+                return
+
+    def _run_export(self, key: str, test_result_ids: list):
+        """Build the export file; runs inside the background thread"""
+        started = time.time()
+        lock_path = self._path(key, '.lock')
+        # Private to this job, in case a second job for the key ever runs alongside it
+        part_filename = f'{key}.{os.getpid()}.{threading.get_ident()}.part.xlsx'
+
+        heartbeat_stop = threading.Event()
+        interval = max(1, current_app.config['EXPORT_JOB_STALE_MINUTES'] * 60 / 4)
+        heartbeat = threading.Thread(target=self._keep_lock_fresh, args=(lock_path, interval, heartbeat_stop),
+                                     name=f'export-lock-{key[:12]}', daemon=True)
+        heartbeat.start()
+        try:
+            if test_result_ids is None:
+                rows = export_service.iter_qualified_rows()
+            else:
+                rows = export_service.iter_rows_for_ids(test_result_ids)
+
+            part_path, row_count = export_service.write_excel(rows, part_filename)
+            os.replace(part_path, self._path(key, '.xlsx'))
+
+            metrics_service.observe('export_duration_seconds', time.time() - started,
+                                    kind='excel', outcome='ok')
+            current_app.logger.info(
+                f"Export {key[:12]} finished: {row_count} rows in {time.time() - started:.1f}s"
+            )
+        except Exception as e:
+            metrics_service.observe('export_duration_seconds', time.time() - started,
+                                    kind='excel', outcome='error')
+            current_app.logger.error(f"Export {key[:12]} failed: {str(e)}")
+            with open(self._path(key, '.error'), 'w', encoding='utf-8') as f:
+                f.write(str(e))
+            self._remove(os.path.join(self._export_dir(), part_filename))
+        finally:
+            heartbeat_stop.set()
+            heartbeat.join()
+            db.session.remove()
+            self._remove(lock_path)
+
+        try:
+            self.evict_cache()
+        except Exception as e:
+            current_app.logger.error(f"Export cache eviction failed: {str(e)}")
+
+    def evict_cache(self) -> int:
+        """
+        Remove export files older than EXPORT_CACHE_MAX_AGE_HOURS, then the least
+        recently used ones until EXPORT_DIR fits in EXPORT_CACHE_MAX_BYTES.
+        Files used within EXPORT_DOWNLOAD_WINDOW_SECONDS may still be downloading
+        and are kept either way. Partial files of jobs whose worker died are
+        removed after EXPORT_JOB_STALE_MINUTES.
+
+        Returns:
+            Number of files removed
+        """
+        export_dir = self._export_dir()
+        max_age = current_app.config['EXPORT_CACHE_MAX_AGE_HOURS'] * 3600
+        max_bytes = current_app.config['EXPORT_CACHE_MAX_BYTES']
+        download_window = current_app.config['EXPORT_DOWNLOAD_WINDOW_SECONDS']
+        stale_seconds = current_app.config['EXPORT_JOB_STALE_MINUTES'] * 60
+        now = time.time()
+
+        files = []
+        removed = 0
+        for entry in os.scandir(export_dir):
+            if not entry.is_file() or not entry.name.endswith(('.xlsx', '.error')):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith('.part.xlsx'):
+                # Files of running jobs are never evicted; one left unchanged this
+                # long belongs to a job whose worker died
+                if now - stat.st_mtime > stale_seconds:
+                    self._remove(entry.path)
+                    removed += 1
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort()  # oldest first
+        total_bytes = sum(size for _, size, _ in files)
+
+        for mtime, size, path in files:
+            if now - mtime <= max_age and total_bytes <= max_bytes:
+                break
+            if now - mtime < download_window:
+                # Everything after this one is newer still
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Evicted by another worker
+                total_bytes -= size
+                continue
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+
+        if removed:
+            current_app.logger.info(f"Evicted {removed} export files from {export_dir}")
+        return removed
+
+
+# Global service instance
+export_job_service = ExportJobService()
@@ -1,89 +1,208 @@
 import os
-from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
+import io
+import csv
+import json
+import zlib
+import itertools
+from datetime import datetime, timedelta
 from flask import current_app
-from app.models import TestResult, Question
+from sqlalchemy import func, or_
+from app.models import db, TestResult, Question, ApiCallLog
+from app.services.archive_service import archive_service
+
+
+# Columns of the export template: (field name, header, column width, wrap text)
+EXPORT_COLUMNS = [
+    ("title", "标题", 20, False),                      # 1. Title
+    ("question_type", "题目类型", 15, False),          # 2. Question type
+    ("subject", "领域", 15, False),                    # 3. Subject
+    ("difficulty", "难度", 10, False),                 # 4. Difficulty
+    ("knowledge_points", "知识点", 30, True),          # 5. Knowledge points
+    ("question_text", "问题", 50, True),               # 6. Question text
+    ("standard_answer", "答案", 30, True),             # 7. Standard answer
+    ("solution_approach", "解题思路", 50, True),       # 8. Solution approach
+    (None, "", 5, False),                              # 9. Empty column
+    ("difficulty_status", "查难情况", 15, False),      # 10. Difficulty status (X/8)
+]
+
+# Rows buffered per chunk of a streamed text export
+STREAM_ROWS_PER_CHUNK = 200
+
+# Shared styles, registered once per workbook instead of per cell
+HEADER_STYLE = 'export_header'
+WRAP_STYLE = 'export_wrap'
 
 
 class ExportService:
     """Service for exporting test results to Excel"""
 
-    def export_to_excel(self, test_result_ids: list, output_filename: str = None) -> str:
+    def _export_query(self):
+        """Joined query selecting only the columns needed for an export row"""
+        return db.session.query(
+            TestResult.id,
+            Question.title,
+            Question.question_type,
+            Question.subject,
+            Question.difficulty,
+            Question.knowledge_points,
+            Question.question_text,
+            Question.standard_answer,
+            Question.solution_approach,
+            TestResult.difficulty_status
+        ).join(Question, TestResult.question_id == Question.id)
+
+    def _row_values(self, row) -> list:
+        """Map a row of _export_query to the 10 template columns"""
+        return [
+            row.title,
+            row.question_type,
+            row.subject,
+            row.difficulty,
+            row.knowledge_points,
+            row.question_text,
+            row.standard_answer,
+            row.solution_approach,
+            "",  # Empty column
+            row.difficulty_status
+        ]
+
+    def iter_rows_for_ids(self, test_result_ids: list):
         """
-        Export test results to Excel file matching the template format.
+        Yield export rows for the given test results in the requested order,
+        querying the database one chunk of IDs at a time.
+        """
+        chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+
+        for start in range(0, len(test_result_ids), chunk_size):
+            chunk = test_result_ids[start:start + chunk_size]
+            rows_by_id = {
+                row.id: row
+                for row in self._export_query().filter(TestResult.id.in_(chunk))
+            }
+            for test_result_id in chunk:
+                row = rows_by_id.get(test_result_id)
+                if row is None:
+                    current_app.logger.warning(f"Test result {test_result_id} not found")
+                    continue
+                yield row
+
+    def iter_qualified_rows(self):
+        """Yield export rows for all qualified test results, streamed in chunks"""
+        chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+        query = self._export_query().filter(TestResult.qualified == True).order_by(TestResult.id)
+        return query.yield_per(chunk_size)
+
+    def _changed_filter(self, query, since: datetime, until: datetime, qualified_only: bool):
+        """
+        Restrict a query to completed results whose result or question changed
+        in [since - EXPORT_INCREMENTAL_OVERLAP_SECONDS, until].
+
+        updated_at is set when a row is flushed, not when it commits, so a
+        change can become visible after a later watermark was handed out. The
+        overlap re-sends such rows; consumers apply rows keyed by test_result_id.
+        """
+        query = query.filter(TestResult.status == 'completed')
+        if qualified_only:
+            query = query.filter(TestResult.qualified == True)
+        if since is not None:
+            since = since - timedelta(seconds=current_app.config['EXPORT_INCREMENTAL_OVERLAP_SECONDS'])
+            query = query.filter(or_(TestResult.updated_at >= since, Question.updated_at >= since))
+        # Rows touched after the upper bound are picked up by the next run
+        return query.filter(TestResult.updated_at <= until, Question.updated_at <= until)
+
+    def changed_watermark(self, since: datetime = None, qualified_only: bool = False) -> datetime:
+        """
+        Compute the new watermark for an incremental export.
 
         Args:
-            test_result_ids: List of test result IDs to export
+            since: Previous watermark, or None for a full export
+            qualified_only: Only consider qualified results
+
+        Returns:
+            Latest modification time among changed rows, never earlier than
+            since; None if there are no rows at all
+        """
+        query = db.session.query(func.max(TestResult.updated_at), func.max(Question.updated_at)) \
+            .join(Question, TestResult.question_id == Question.id)
+        query = self._changed_filter(query, since, datetime.utcnow(), qualified_only)
+
+        latest = [value for value in (*query.one(), since) if value is not None]
+        return max(latest) if latest else None
+
+    def iter_changed_rows(self, since: datetime, until: datetime, qualified_only: bool = False):
+        """
+        Yield export rows for results changed since the previous watermark (with
+        the overlap window) and up to until, including the test_result_id and
+        review fields consumers need to apply the change. Deleted results and
+        questions are not reported.
+        """
+        chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+        query = self._export_query().add_columns(
+            TestResult.qualified,
+            TestResult.manual_review_status
+        )
+        query = self._changed_filter(query, since, until, qualified_only).order_by(TestResult.id)
+        return query.yield_per(chunk_size)
+
+    def has_qualified_results(self) -> bool:
+        """Check whether any qualified test result exists"""
+        return db.session.query(TestResult.id).filter_by(qualified=True).first() is not None
+
+    def write_excel(self, rows, output_filename: str = None) -> tuple:
+        """
+        Stream rows into a write-only workbook in the 10-column template format.
+
+        Args:
+            rows: Iterable of rows from _export_query
             output_filename: Optional custom filename
 
         Returns:
-            Path to the generated Excel file
+            Tuple of (output_path, row_count)
         """
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Test Results"
-
-        # Define headers (10 columns as per template)
-        headers = [
-            "标题",           # 1. Title
-            "题目类型",       # 2. Question type
-            "领域",           # 3. Subject
-            "难度",           # 4. Difficulty
-            "知识点",         # 5. Knowledge points
-            "问题",           # 6. Question text
-            "答案",           # 7. Standard answer
-            "解题思路",       # 8. Solution approach
-            "",               # 9. Empty column
-            "查难情况"        # 10. Difficulty status (X/8)
-        ]
+        # openpyxl is only imported when an Excel file is actually written
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, NamedStyle
+        from openpyxl.utils import get_column_letter
+
+        wb = Workbook(write_only=True)
+        wb.add_named_style(NamedStyle(
+            name=HEADER_STYLE,
+            font=Font(bold=True),
+            alignment=Alignment(horizontal='center', vertical='center')
+        ))
+        wb.add_named_style(NamedStyle(
+            name=WRAP_STYLE,
+            alignment=Alignment(wrap_text=True, vertical='top')
+        ))
+
+        ws = wb.create_sheet("Test Results")
 
-        # Write headers
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        # Set column widths
-        ws.column_dimensions['A'].width = 20  # 标题
-        ws.column_dimensions['B'].width = 15  # 题目类型
-        ws.column_dimensions['C'].width = 15  # 领域
-        ws.column_dimensions['D'].width = 10  # 难度
-        ws.column_dimensions['E'].width = 30  # 知识点
-        ws.column_dimensions['F'].width = 50  # 问题
-        ws.column_dimensions['G'].width = 30  # 答案
-        ws.column_dimensions['H'].width = 50  # 解题思路
-        ws.column_dimensions['I'].width = 5   # Empty
-        ws.column_dimensions['J'].width = 15  # 查难情况
-
-        # Populate data rows
-        row_num = 2
-        for test_result_id in test_result_ids:
-            test_result = TestResult.query.get(test_result_id)
-            if not test_result:
-                current_app.logger.warning(f"Test result {test_result_id} not found")
-                continue
-
-            question = test_result.question
-
-            # Write data
-            ws.cell(row=row_num, column=1, value=question.title)
-            ws.cell(row=row_num, column=2, value=question.question_type)
-            ws.cell(row=row_num, column=3, value=question.subject)
-            ws.cell(row=row_num, column=4, value=question.difficulty)
-            ws.cell(row=row_num, column=5, value=question.knowledge_points)
-            ws.cell(row=row_num, column=6, value=question.question_text)
-            ws.cell(row=row_num, column=7, value=question.standard_answer)
-            ws.cell(row=row_num, column=8, value=question.solution_approach)
-            ws.cell(row=row_num, column=9, value="")  # Empty column
-            ws.cell(row=row_num, column=10, value=test_result.difficulty_status)
-
-            # Apply text wrapping for long content
-            for col in [5, 6, 7, 8]:
-                ws.cell(row=row_num, column=col).alignment = Alignment(wrap_text=True, vertical='top')
-
-            row_num += 1
+        # Column widths must be set before any row is written
+        for col_num, (_, _, width, _) in enumerate(EXPORT_COLUMNS, 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = width
+
+        header_row = []
+        for _, header, _, _ in EXPORT_COLUMNS:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.style = HEADER_STYLE
+            header_row.append(cell)
+        ws.append(header_row)
+
+        wrap_columns = [wrap for _, _, _, wrap in EXPORT_COLUMNS]
+        row_count = 0
+        for row in rows:
+            values = []
+            for value, wrap in zip(self._row_values(row), wrap_columns):
+                if wrap:
+                    # Apply text wrapping for long content
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.style = WRAP_STYLE
+                    values.append(cell)
+                else:
+                    values.append(value)
+            ws.append(values)
+            row_count += 1
 
         # Generate filename
         if not output_filename:
@@ -98,7 +217,139 @@ class ExportService:
         output_path = os.path.join(export_dir, output_filename)
         wb.save(output_path)
 
-        current_app.logger.info(f"Exported {len(test_result_ids)} test results to {output_path}")
+        return output_path, row_count
+
+    def iter_csv(self, rows, keyed: bool = False):
+        """
+        Yield the export as UTF-8 CSV chunks with the template headers.
+
+        Args:
+            rows: Rows from _export_query, or from iter_changed_rows if keyed
+            keyed: Add test_result_id, qualified and manual_review_status
+                columns so incremental consumers can apply each row
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        headers = [header for _, header, _, _ in EXPORT_COLUMNS]
+        if keyed:
+            headers = ['test_result_id'] + headers + ['qualified', 'manual_review_status']
+        writer.writerow(headers)
+
+        for row_num, row in enumerate(rows, 1):
+            values = self._row_values(row)
+            if keyed:
+                values = [row.id] + list(values) + [row.qualified, row.manual_review_status]
+            writer.writerow(values)
+            if row_num % STREAM_ROWS_PER_CHUNK == 0:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue().encode('utf-8')
+
+    def iter_jsonl(self, rows):
+        """Yield the export as JSON Lines chunks, one object per row keyed by field name"""
+        fields = [field for field, _, _, _ in EXPORT_COLUMNS]
+
+        def records():
+            for row in rows:
+                record = {field: value for field, value in zip(fields, self._row_values(row)) if field}
+                record['test_result_id'] = row.id
+                for extra in ('qualified', 'manual_review_status'):
+                    if extra in row._fields:
+                        record[extra] = getattr(row, extra)
+                yield record
+
+        return self._iter_json_lines(records())
+
+    def _iter_json_lines(self, records):
+        """Encode dictionaries as JSON Lines, yielding one chunk per STREAM_ROWS_PER_CHUNK records"""
+        lines = []
+        for record in records:
+            lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            if len(lines) >= STREAM_ROWS_PER_CHUNK:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+                lines = []
+
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def iter_attempt_rows(self, start: datetime = None, end: datetime = None,
+                          subject: str = None, model: str = None):
+        """
+        Stream attempt-level rows from ApiCallLog for offline analysis.
+
+        Args:
+            start: Only attempts at or after this time
+            end: Only attempts before this time
+            subject: Only questions of this subject
+            model: Only attempts answered by this model
+
+        Returns:
+            Iterable of rows, fetched in chunks of EXPORT_CHUNK_SIZE; archived
+            attempts follow the ones still in api_call_logs
+        """
+        chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+        query = db.session.query(
+            ApiCallLog.id,
+            TestResult.question_id,
+            ApiCallLog.test_result_id,
+            ApiCallLog.attempt_number,
+            Question.subject,
+            ApiCallLog.model,
+            ApiCallLog.ai_answer,
+            ApiCallLog.is_correct,
+            ApiCallLog.verification_response,
+            ApiCallLog.latency_ms,
+            ApiCallLog.error_message,
+            ApiCallLog.call_timestamp
+        ).join(TestResult, ApiCallLog.test_result_id == TestResult.id) \
+            .join(Question, TestResult.question_id == Question.id)
+
+        if start is not None:
+            query = query.filter(ApiCallLog.call_timestamp >= start)
+        if end is not None:
+            query = query.filter(ApiCallLog.call_timestamp < end)
+        if subject:
+            query = query.filter(Question.subject == subject)
+        if model:
+            query = query.filter(ApiCallLog.model == model)
+
+        return itertools.chain(
+            query.order_by(ApiCallLog.id).yield_per(chunk_size),
+            archive_service.iter_archived_attempt_rows(start=start, end=end, subject=subject, model=model)
+        )
+
+    def iter_attempts_jsonl(self, rows):
+        """Yield attempt rows as JSON Lines chunks"""
+        return self._iter_json_lines(
+            {**row._asdict(), 'call_timestamp': row.call_timestamp.isoformat() if row.call_timestamp else None}
+            for row in rows
+        )
+
+    def gzip_stream(self, chunks):
+        """Compress a stream of byte chunks into a gzip stream"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def export_to_excel(self, test_result_ids: list, output_filename: str = None) -> str:
+        """
+        Export test results to Excel file matching the template format.
+
+        Args:
+            test_result_ids: List of test result IDs to export
+            output_filename: Optional custom filename
+
+        Returns:
+            Path to the generated Excel file
+        """
+        output_path, row_count = self.write_excel(self.iter_rows_for_ids(test_result_ids), output_filename)
+
+        current_app.logger.info(f"Exported {row_count} test results to {output_path}")
 
         return output_path
 
@@ -112,15 +363,15 @@ class ExportService:
         Returns:
             Path to the generated Excel file
         """
-        # Get all qualified test results
-        qualified_results = TestResult.query.filter_by(qualified=True).all()
-        test_result_ids = [result.id for result in qualified_results]
-
-        if not test_result_ids:
+        if not self.has_qualified_results():
             current_app.logger.warning("No qualified test results found")
             return None
 
-        return self.export_to_excel(test_result_ids, output_filename)
+        output_path, row_count = self.write_excel(self.iter_qualified_rows(), output_filename)
+
+        current_app.logger.info(f"Exported {row_count} qualified test results to {output_path}")
+
+        return output_path
 
 
 # Global service instance
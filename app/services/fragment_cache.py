@@ -0,0 +1,113 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, request, session
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """
+    In-process LRU cache of rendered page fragments, plus HTTP validators.
+
+    Entries are stored per (kind, object id) together with a version string
+    built from the object's modification timestamps, so a worker never serves
+    a fragment for an older version even if another worker made the change.
+    Routes that modify an object also invalidate its entry explicitly to free
+    the memory straight away. The cache is bounded by FRAGMENT_CACHE_MAX_ENTRIES
+    and FRAGMENT_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.template_version = ''
+
+    def init_app(self, app):
+        """Fingerprint the templates so validators change when a deploy changes them"""
+        digest = hashlib.sha256()
+        for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f'{name}:{stat.st_mtime_ns}:{stat.st_size}'.encode('utf-8'))
+        self.template_version = digest.hexdigest()[:16]
+
+    def get_or_render(self, kind: str, object_id: int, version: str, render) -> Markup:
+        """
+        Return the cached fragment for this object version, rendering it on a miss.
+
+        Args:
+            kind: Fragment type, e.g. 'test_result'
+            object_id: ID of the rendered object
+            version: Version string of the object; a different version is a miss
+            render: Callable returning the fragment HTML
+
+        Returns:
+            The fragment as Markup
+        """
+        key = (kind, object_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return Markup(entry[1])
+
+        html = str(render())
+        size = len(html)
+        if size > current_app.config['FRAGMENT_CACHE_MAX_BYTES']:
+            return Markup(html)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (version, html)
+            self._bytes += size
+
+            max_entries = current_app.config['FRAGMENT_CACHE_MAX_ENTRIES']
+            max_bytes = current_app.config['FRAGMENT_CACHE_MAX_BYTES']
+            while self._entries and (len(self._entries) > max_entries or self._bytes > max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+        return Markup(html)
+
+    def invalidate(self, kind: str, object_ids):
+        """Drop the cached fragments of the given objects in this process"""
+        with self._lock:
+            for object_id in object_ids:
+                entry = self._entries.pop((kind, object_id), None)
+                if entry is not None:
+                    self._bytes -= len(entry[1])
+
+    def etag(self, kind: str, object_id: int, version: str, user_id) -> str:
+        """Strong validator for a full page; pages include the user's navigation bar"""
+        raw = f'{kind}|{object_id}|{version}|{user_id}|{self.template_version}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def is_not_modified(self, etag: str, last_modified) -> bool:
+        """
+        Check the request's conditional headers against a page's validators.
+        Never true while flash messages are pending, since they are part of the page.
+        """
+        if request.method != 'GET' or session.get('_flashes'):
+            return False
+        if request.if_none_match:
+            return request.if_none_match.contains(etag)
+        if request.if_modified_since and last_modified:
+            return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        return False
+
+    def set_validators(self, response, etag: str, last_modified):
+        """Attach validators; private caches must revalidate on every use"""
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+
+# Global cache instance
+fragment_cache = FragmentCache()
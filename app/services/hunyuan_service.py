@@ -1,6 +1,5 @@
 import os
 import time
-from openai import OpenAI
 from tenacity import retry, stop_after_attempt, wait_exponential
 from flask import current_app
 
@@ -21,6 +20,8 @@ class HunyuanService:
         if not api_key:
             raise ValueError("HUNYUAN_API_KEY not configured")
 
+        from openai import OpenAI
+
         self.client = OpenAI(
             api_key=api_key,
             base_url=base_url
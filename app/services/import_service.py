@@ -0,0 +1,221 @@
+import io
+import json
+from flask import current_app
+from app.models import db, Question
+from app.services.export_service import EXPORT_COLUMNS
+from app.services.tag_service import tag_service
+from app.services.latex_service import latex_service
+from app.services.dedup_service import dedup_service
+from app.services.test_queue import test_queue
+
+
+# Required question fields and their maximum lengths (None for Text columns)
+QUESTION_FIELDS = {
+    'title': 200,
+    'question_type': 50,
+    'subject': 50,
+    'difficulty': 20,
+    'knowledge_points': None,
+    'question_text': None,
+    'standard_answer': None,
+    'solution_approach': None,
+}
+
+# Errors shown in the import report; the rest are only counted
+MAX_REPORTED_ERRORS = 200
+
+
+class ImportService:
+    """Service for bulk importing questions from the Excel template or JSON Lines"""
+
+    def iter_excel_records(self, file):
+        """
+        Yield (row_number, record) pairs from a workbook in the 10-column export template.
+        The header row is skipped if present.
+        """
+        from openpyxl import load_workbook
+
+        wb = load_workbook(file, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            headers = [header for _, header, _, _ in EXPORT_COLUMNS]
+            fields = [field for field, _, _, _ in EXPORT_COLUMNS]
+
+            for row_number, values in enumerate(ws.iter_rows(values_only=True), 1):
+                values = list(values[:len(fields)])
+                if not any(value not in (None, '') for value in values):
+                    continue
+                if row_number == 1 and [value or '' for value in values] == headers[:len(values)]:
+                    continue
+
+                yield row_number, {
+                    field: value for field, value in zip(fields, values) if field in QUESTION_FIELDS
+                }
+        finally:
+            wb.close()
+
+    def iter_jsonl_records(self, file):
+        """Yield (line_number, record) pairs from a JSON Lines file keyed by field name"""
+        stream = io.TextIOWrapper(file, encoding='utf-8-sig') if not isinstance(file, io.TextIOBase) else file
+
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {'_error': f'JSON 格式错误: {str(e)}'}
+            if not isinstance(record, dict):
+                record = {'_error': 'JSON 行必须是对象'}
+            yield line_number, record
+
+    def iter_records(self, file, filename: str):
+        """Pick the reader for a file by its extension"""
+        filename = filename.lower()
+        if filename.endswith('.xlsx'):
+            return self.iter_excel_records(file)
+        if filename.endswith(('.jsonl', '.json', '.ndjson')):
+            return self.iter_jsonl_records(file)
+        raise ValueError('仅支持 .xlsx 或 .jsonl 文件')
+
+    def validate_record(self, record: dict) -> tuple:
+        """
+        Validate and clean one imported record.
+
+        Returns:
+            Tuple of (cleaned field dict, list of error messages)
+        """
+        if '_error' in record:
+            return None, [record['_error']]
+
+        data = {}
+        errors = []
+        for field, max_length in QUESTION_FIELDS.items():
+            value = record.get(field)
+            value = '' if value is None else str(value).strip()
+            if not value:
+                errors.append(f'{field} 不能为空')
+            elif max_length and len(value) > max_length:
+                errors.append(f'{field} 超过 {max_length} 个字符')
+            data[field] = value
+
+        return data, errors
+
+    def import_records(self, records, user_id: int, batch_size: int = None, auto_test: bool = False,
+                       wait_for_queue: bool = False) -> dict:
+        """
+        Validate records and insert the valid ones in batches.
+
+        Args:
+            records: Iterable of (row_number, record) pairs
+            user_id: Author of the imported questions
+            batch_size: Questions per commit
+            auto_test: Queue every imported question for testing
+            wait_for_queue: Block while the test queue is full instead of skipping questions
+
+        Rows whose question text is at least DEDUP_THRESHOLD similar to an
+        indexed question or an earlier row of the same import are reported in
+        duplicates; with DEDUP_ACTION=block they are skipped instead of imported.
+
+        Returns:
+            Report dictionary with imported, failed, duplicate and queued counts
+            plus row errors and duplicate matches
+        """
+        if batch_size is None:
+            batch_size = current_app.config['IMPORT_BATCH_SIZE']
+        check_duplicates = current_app.config['DEDUP_ENABLED']
+        skip_duplicates = current_app.config['DEDUP_ACTION'] == 'block'
+        threshold = current_app.config['DEDUP_THRESHOLD']
+
+        report = {'imported': 0, 'failed': 0, 'duplicates': 0, 'skipped': 0, 'queued': 0, 'not_queued': 0,
+                  'errors': [], 'duplicate_rows': []}
+        batch = []
+        # LSH bands of rows that are not indexed yet: band key -> [(row number, signature)]
+        pending_bands = {}
+
+        def flush():
+            if not batch:
+                return
+            db.session.add_all(batch)
+            db.session.flush()
+            question_ids = [question.id for question in batch]
+            dedup_service.index_questions((question.id, question.question_text) for question in batch)
+            texts = [text for question in batch
+                     for text in (question.question_text, question.standard_answer, question.solution_approach)]
+            db.session.commit()
+            report['imported'] += len(batch)
+            latex_service.prerender(*texts)
+
+            if auto_test:
+                for question_id in question_ids:
+                    if test_queue.submit(question_id, block=wait_for_queue):
+                        report['queued'] += 1
+                    else:
+                        report['not_queued'] += 1
+            batch.clear()
+            pending_bands.clear()
+
+        def find_duplicate(text):
+            """Best match among indexed questions and earlier rows of this import"""
+            signature = dedup_service.signature(text)
+            if signature is None:
+                return None
+            # Pending tags of unsaved rows must not be autoflushed without their questions
+            with db.session.no_autoflush:
+                matches = dedup_service.find_similar(text, threshold, limit=1)
+            match = matches[0] if matches else None
+
+            band_keys = dedup_service.band_keys(signature)
+            compared = set()
+            for band_key in band_keys:
+                for row_number, other in pending_bands.get(band_key, ()):
+                    if row_number in compared:
+                        continue
+                    compared.add(row_number)
+                    score = dedup_service.similarity(signature, other)
+                    if score >= threshold and (match is None or score > match['similarity']):
+                        match = {'row': row_number, 'similarity': score}
+            return match, signature, band_keys
+
+        for row_number, record in records:
+            data, errors = self.validate_record(record)
+            if errors:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append({'row': row_number, 'errors': errors})
+                continue
+
+            if check_duplicates:
+                found = find_duplicate(data['question_text'])
+                if found is not None:
+                    match, signature, band_keys = found
+                    if match is not None:
+                        report['duplicates'] += 1
+                        if len(report['duplicate_rows']) < MAX_REPORTED_ERRORS:
+                            report['duplicate_rows'].append({'row': row_number, 'title': data['title'], 'match': match})
+                        if skip_duplicates:
+                            report['skipped'] += 1
+                            continue
+                    for band_key in band_keys:
+                        pending_bands.setdefault(band_key, []).append((row_number, signature))
+
+            question = Question(user_id=user_id, **data)
+            tag_service.sync_question_tags(question)
+            batch.append(question)
+
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+
+        current_app.logger.info(
+            f"Imported {report['imported']} questions ({report['failed']} rows failed, "
+            f"{report['duplicates']} near-duplicates, {report['skipped']} skipped, "
+            f"{report['queued']} queued for testing)"
+        )
+        return report
+
+
+# Global service instance
+import_service = ImportService()
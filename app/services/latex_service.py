@@ -0,0 +1,279 @@
+import os
+import re
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from html import unescape
+from html.parser import HTMLParser
+from flask import current_app
+from markupsafe import Markup, escape
+
+
+# $$...$$ and \[...\] are display math, \(...\) and $...$ inline math
+MATH_PATTERN = re.compile(
+    r'\$\$(?P<display>.+?)\$\$'
+    r'|\\\[(?P<display_bracket>.+?)\\\]'
+    r'|\\\((?P<inline_paren>.+?)\\\)'
+    r'|(?<!\\)\$(?P<inline>[^$]+?)(?<!\\)\$',
+    re.S
+)
+
+# latex2mathml keeps commands it does not know as <mi>\command</mi>
+UNKNOWN_COMMAND = re.compile(r'>\\[A-Za-z]')
+
+# Bump when the HTML produced for the same text changes
+RENDER_FORMAT = 2
+
+# Presentation MathML elements and attributes that may reach the page. latex2mathml
+# copies \text{} content verbatim and turns \href{} and \style{} into attributes,
+# so everything else is escaped (tags) or dropped (attributes).
+MATHML_ELEMENTS = frozenset([
+    'math', 'mrow', 'mi', 'mn', 'mo', 'ms', 'mtext', 'mspace', 'mfrac', 'msqrt', 'mroot', 'mstyle',
+    'merror', 'mpadded', 'mphantom', 'mfenced', 'menclose', 'msub', 'msup', 'msubsup', 'munder',
+    'mover', 'munderover', 'mmultiscripts', 'mprescripts', 'none', 'mtable', 'mtr', 'mtd', 'mlabeledtr',
+])
+MATHML_ATTRIBUTES = frozenset([
+    'xmlns', 'display', 'mathvariant', 'mathsize', 'mathcolor', 'mathbackground', 'displaystyle',
+    'scriptlevel', 'stretchy', 'fence', 'form', 'separator', 'accent', 'accentunder', 'movablelimits',
+    'largeop', 'symmetric', 'minsize', 'maxsize', 'lspace', 'rspace', 'width', 'height', 'depth',
+    'linethickness', 'notation', 'open', 'close', 'separators', 'columnalign', 'rowalign', 'columnlines',
+    'rowlines', 'columnspacing', 'rowspacing', 'frame', 'align', 'columnspan', 'rowspan',
+])
+SAFE_ATTRIBUTE_VALUE = re.compile(r'^[\w#.%:/ -]*$')
+MATHML_NAMESPACE = 'http://www.w3.org/1998/Math/MathML'
+
+
+class _MathMLSanitizer(HTMLParser):
+    """Rebuild converter output keeping only allowlisted MathML; other markup becomes text"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def _start(self, tag, attrs, close):
+        if tag not in MATHML_ELEMENTS:
+            self.parts.append(str(escape(unescape(self.get_starttag_text()))))
+            return
+        kept = ''.join(
+            f' {name}="{escape(value)}"' for name, value in attrs
+            if name in MATHML_ATTRIBUTES and value is not None and SAFE_ATTRIBUTE_VALUE.match(value)
+            and (name != 'xmlns' or value == MATHML_NAMESPACE)
+        )
+        self.parts.append(f'<{tag}{kept}{" /" if close else ""}>')
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        self.parts.append(f'</{tag}>' if tag in MATHML_ELEMENTS else str(escape(f'</{tag}>')))
+
+    def handle_data(self, data):
+        self.parts.append(str(escape(data)))
+
+    @classmethod
+    def clean(cls, mathml: str) -> str:
+        parser = cls()
+        parser.feed(mathml)
+        parser.close()
+        return ''.join(parser.parts)
+
+
+class LatexService:
+    """
+    Server-side rendering of LaTeX in question and answer text to MathML.
+
+    Formulas are converted once with latex2mathml and the resulting HTML is
+    stored under a hash of the source text in LATEX_CACHE_DIR, shared by all
+    workers, with a small in-process LRU in front of it. Text is rendered when
+    it is saved and otherwise on first view. A formula the converter cannot
+    handle is left as delimited TeX in a .tex-fallback span, the only place
+    MathJax still typesets on these pages. The converter output is passed
+    through an allowlist of MathML elements and attributes before it is
+    trusted as Markup. Reading a cached file refreshes its mtime, and
+    evict_cache removes unread files by age and total size.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_eviction = 0
+        self._converter = None
+        self.renderer_version = None
+
+    def init_app(self, app):
+        """Register the |latex template filter"""
+        app.add_template_filter(self.render, 'latex')
+
+    def _load_converter(self):
+        if self.renderer_version is None:
+            try:
+                import latex2mathml
+                from latex2mathml.converter import convert
+                self._converter = convert
+                self.renderer_version = f"latex2mathml-{getattr(latex2mathml, '__version__', '0')}-{RENDER_FORMAT}"
+            except ImportError:
+                self.renderer_version = ''
+        return self._converter
+
+    def render(self, text) -> Markup:
+        """
+        Render text with LaTeX formulas as HTML with inline MathML.
+
+        Args:
+            text: Question or answer text; None renders as an empty string
+
+        Returns:
+            The rendered HTML as Markup; plain text is only escaped
+        """
+        return self._render(text, remember=True)
+
+    def prerender(self, *texts):
+        """Render texts into the shared cache at save time, without filling the LRU"""
+        for text in texts:
+            try:
+                self._render(text, remember=False)
+            except Exception as e:
+                current_app.logger.error(f"Pre-rendering LaTeX failed: {str(e)}")
+
+    def _render(self, text, remember: bool) -> Markup:
+        if not text:
+            return Markup('')
+        if not MATH_PATTERN.search(text):
+            return escape(text)
+
+        convert = self._load_converter()
+        if convert is None:
+            return Markup('<span class="tex-fallback">%s</span>') % text
+
+        key = hashlib.sha256(f'{self.renderer_version}\0{text}'.encode('utf-8')).hexdigest()
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return Markup(html)
+
+        path = self._cache_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            try:
+                os.utime(path)
+            except OSError:
+                # Evicted by another worker meanwhile
+                pass
+        except OSError:
+            html = self._convert(text, convert)
+            self._store(path, html)
+
+        if remember:
+            with self._lock:
+                self._entries[key] = html
+                while len(self._entries) > current_app.config['LATEX_CACHE_MAX_ENTRIES']:
+                    self._entries.popitem(last=False)
+        return Markup(html)
+
+    def _convert(self, text: str, convert) -> str:
+        parts = []
+        position = 0
+        for match in MATH_PATTERN.finditer(text):
+            parts.append(str(escape(text[position:match.start()])))
+            position = match.end()
+
+            display = match.group('display') is not None or match.group('display_bracket') is not None
+            formula = next(group for group in match.groups() if group is not None)
+            try:
+                mathml = convert(formula.strip(), display='block' if display else 'inline')
+            except Exception:
+                mathml = None
+            if mathml is None or UNKNOWN_COMMAND.search(mathml):
+                parts.append(str(Markup('<span class="tex-fallback">%s</span>') % match.group(0)))
+            else:
+                parts.append(_MathMLSanitizer.clean(mathml))
+        parts.append(str(escape(text[position:])))
+        return ''.join(parts)
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(current_app.config['LATEX_CACHE_DIR'], key[:2], f'{key}.html')
+
+    def _store(self, path: str, html: str):
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            current_app.logger.warning(f"Could not store rendered LaTeX in {path}: {str(e)}")
+
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_eviction:
+                return
+            self._next_eviction = now + current_app.config['LATEX_CACHE_EVICT_SECONDS']
+        try:
+            self.evict_cache()
+        except Exception as e:
+            current_app.logger.error(f"LaTeX cache eviction failed: {str(e)}")
+
+    def evict_cache(self) -> int:
+        """
+        Remove rendered files unread for LATEX_CACHE_MAX_AGE_DAYS, then the least
+        recently read ones until LATEX_CACHE_DIR fits in LATEX_CACHE_MAX_BYTES.
+        An evicted text is simply rendered again on its next view.
+
+        Returns:
+            Number of files removed
+        """
+        cache_dir = current_app.config['LATEX_CACHE_DIR']
+        max_age = current_app.config['LATEX_CACHE_MAX_AGE_DAYS'] * 86400
+        max_bytes = current_app.config['LATEX_CACHE_MAX_BYTES']
+        now = time.time()
+
+        files = []
+        try:
+            subdirs = [entry.path for entry in os.scandir(cache_dir) if entry.is_dir()]
+        except FileNotFoundError:
+            return 0
+        for subdir in subdirs:
+            try:
+                entries = list(os.scandir(subdir))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                # Temporary files of a crashed write are removed once old
+                if entry.is_file() and entry.name.endswith(('.html', '.tmp')):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort()  # least recently read first
+        removed = 0
+        total_bytes = sum(size for _, size, _ in files)
+
+        for mtime, size, path in files:
+            if now - mtime <= max_age and total_bytes <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Evicted by another worker
+                total_bytes -= size
+                continue
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+
+        if removed:
+            current_app.logger.info(f"Evicted {removed} rendered LaTeX files from {cache_dir}")
+        return removed
+
+
+# Global service instance
+latex_service = LatexService()
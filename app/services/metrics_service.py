@@ -0,0 +1,342 @@
+import os
+import json
+import time
+import bisect
+import atexit
+import threading
+from flask import request, g
+from sqlalchemy import event
+
+
+# Metric definitions: name -> (type, help text, label names)
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'HTTP request duration by endpoint', ('endpoint', 'method', 'status')),
+    'db_queries_total': (
+        'counter', 'SQL statements executed', ()),
+    'db_query_seconds_total': (
+        'counter', 'Time spent executing SQL statements', ()),
+    'http_request_db_queries': (
+        'histogram', 'SQL statements per request by endpoint (SQL profiler)', ('endpoint',)),
+    'http_request_db_seconds': (
+        'histogram', 'SQL time per request by endpoint (SQL profiler)', ('endpoint',)),
+    'llm_call_duration_seconds': (
+        'histogram', 'LLM API call duration by phase', ('phase', 'outcome')),
+    'llm_call_errors_total': (
+        'counter', 'Failed LLM API calls by phase', ('phase',)),
+    'llm_call_retries_total': (
+        'counter', 'LLM API calls retried by tenacity, by phase', ('phase',)),
+    'tests_running': (
+        'gauge', 'Question tests currently running', ()),
+    'tests_finished_total': (
+        'counter', 'Question tests finished by outcome', ('outcome',)),
+    'test_queue_pending': (
+        'gauge', 'Questions waiting in the background test queue', ()),
+    'export_duration_seconds': (
+        'histogram', 'Export duration by kind', ('kind', 'outcome')),
+}
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Histograms that count something other than seconds
+CUSTOM_BUCKETS = {
+    'http_request_db_queries': (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+}
+
+# Snapshot files of exited processes are folded into this one
+RETIRED_FILE = 'metrics_retired.json'
+
+
+class MetricsService:
+    """
+    Low-overhead Prometheus metrics that work across gunicorn workers.
+
+    Each process keeps its metrics in memory and a daemon thread writes them
+    to METRICS_DIR/metrics_<pid>.json every METRICS_FLUSH_SECONDS. /metrics
+    merges the snapshots of all processes: counters and histograms are summed
+    (including processes that have exited, so totals never go backwards), while
+    gauges only count processes whose snapshot is still being refreshed.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics_dir = None
+        self.flush_seconds = 5
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        """Register request hooks and SQLAlchemy engine listeners"""
+        self.enabled = app.config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+
+        self.metrics_dir = app.config['METRICS_DIR']
+        self.flush_seconds = app.config['METRICS_FLUSH_SECONDS']
+        os.makedirs(self.metrics_dir, exist_ok=True)
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_request_started = time.perf_counter()
+
+        @app.after_request
+        def observe_request(response):
+            started = g.pop('metrics_request_started', None)
+            if started is not None:
+                self.observe('http_request_duration_seconds', time.perf_counter() - started,
+                             endpoint=request.endpoint or 'unmatched', method=request.method,
+                             status=str(response.status_code))
+            return response
+
+        from app.models import db
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+            conn.info['metrics_query_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def observe_query(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop('metrics_query_started', None)
+            if started is not None:
+                self.inc('db_queries_total')
+                self.inc('db_query_seconds_total', time.perf_counter() - started)
+
+    # Recording
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # After a fork the parent's values belong to the parent
+            self._values = {}
+            self._pid = pid
+            flusher = threading.Thread(target=self._flush_loop, name='metrics-flush')
+            flusher.daemon = True
+            flusher.start()
+            atexit.register(self._flush_at_exit)
+
+    def _key(self, name: str, labels: dict) -> tuple:
+        return (name, tuple(str(labels[label]) for label in METRICS[name][2]))
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter or gauge"""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, name: str, amount: float = 1, **labels):
+        """Decrease a gauge"""
+        self.inc(name, -amount, **labels)
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram"""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        key = self._key(name, labels)
+        buckets = CUSTOM_BUCKETS.get(name, BUCKETS)
+        bucket = bisect.bisect_left(buckets, value)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                histogram = self._values[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bucket] += 1
+            histogram[-1] += value
+
+    def observe_iter(self, name: str, iterable, **labels):
+        """
+        Yield from iterable and observe how long it took to exhaust, with an
+        outcome label of 'ok', 'error' or 'aborted' (consumer stopped early).
+        Used for streamed responses, whose work happens after the view returns.
+        """
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield from iterable
+            outcome = 'ok'
+        except GeneratorExit:
+            outcome = 'aborted'
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, outcome=outcome, **labels)
+
+    # Snapshots
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.metrics_dir, f'metrics_{pid}.json')
+
+    def _flush_loop(self):
+        pid = self._pid
+        while self._pid == pid:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                pass  # metrics must never take the worker down
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except OSError:
+            pass  # METRICS_DIR may already be gone, e.g. a temporary benchmark directory
+
+    def flush(self):
+        """Write this process's metrics to its snapshot file"""
+        if not self.enabled or self._pid != os.getpid():
+            return
+        with self._lock:
+            entries = [[name, list(labels), list(value) if isinstance(value, list) else value]
+                       for (name, labels), value in self._values.items()]
+
+        path = self._snapshot_path(self._pid)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(path + '.tmp', path)
+
+    def _read_snapshot(self, path: str) -> list:
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _merge(self, totals: dict, entries: list, include_gauges: bool = True):
+        for name, labels, value in entries:
+            if name not in METRICS:
+                continue
+            if METRICS[name][0] == 'gauge' and not include_gauges:
+                continue
+            key = (name, tuple(labels))
+            if isinstance(value, list):
+                current = totals.setdefault(key, [0] * len(value))
+                for i, part in enumerate(value):
+                    current[i] += part
+            else:
+                totals[key] = totals.get(key, 0) + value
+
+    def _retire_stale(self, stale_paths: list):
+        """Fold snapshots of exited processes into the retired file"""
+        lock_path = os.path.join(self.metrics_dir, RETIRED_FILE + '.lock')
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # Another worker is compacting; a lock left by a crashed one expires.
+            # The lock may vanish in between, when that worker finishes.
+            try:
+                if time.time() - os.path.getmtime(lock_path) > 60:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return
+
+        try:
+            retired_path = os.path.join(self.metrics_dir, RETIRED_FILE)
+            totals = {}
+            self._merge(totals, self._read_snapshot(retired_path))
+            for path in stale_paths:
+                self._merge(totals, self._read_snapshot(path), include_gauges=False)
+
+            with open(retired_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump([[name, list(labels), value] for (name, labels), value in totals.items()], f)
+            os.replace(retired_path + '.tmp', retired_path)
+            for path in stale_paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+    def collect(self) -> dict:
+        """Merge the snapshots of all processes into {(name, labels): value}"""
+        self.flush()
+
+        totals = {}
+        stale_paths = []
+        # A process whose snapshot is not refreshed for a few intervals has exited
+        stale_before = time.time() - self.flush_seconds * 3
+
+        for entry in os.scandir(self.metrics_dir):
+            if not (entry.name.startswith('metrics_') and entry.name.endswith('.json')):
+                continue
+            if entry.name == RETIRED_FILE:
+                self._merge(totals, self._read_snapshot(entry.path))
+                continue
+            try:
+                live = entry.stat().st_mtime >= stale_before
+            except FileNotFoundError:
+                # Retired by another worker while scanning
+                continue
+            self._merge(totals, self._read_snapshot(entry.path), include_gauges=live)
+            if not live:
+                stale_paths.append(entry.path)
+
+        if stale_paths:
+            self._retire_stale(stale_paths)
+        return totals
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        totals = self.collect()
+        lines = []
+
+        for name, (metric_type, help_text, label_names) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            series = sorted((labels, value) for (key_name, labels), value in totals.items()
+                            if key_name == name)
+
+            if metric_type != 'histogram':
+                if not series and not label_names:
+                    series = [((), 0)]
+                for labels, value in series:
+                    lines.append(f'{name}{self._format_labels(label_names, labels)} {value}')
+                continue
+
+            for labels, histogram in series:
+                cumulative = 0
+                for bound, count in zip(CUSTOM_BUCKETS.get(name, BUCKETS) + ('+Inf',), histogram[:-1]):
+                    cumulative += count
+                    bucket_labels = self._format_labels(label_names + ('le',), labels + (str(bound),))
+                    lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+                label_text = self._format_labels(label_names, labels)
+                lines.append(f'{name}_sum{label_text} {histogram[-1]}')
+                lines.append(f'{name}_count{label_text} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _format_labels(self, names: tuple, values: tuple) -> str:
+        if not names:
+            return ''
+        pairs = []
+        for name, value in zip(names, values):
+            value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{name}="{value}"')
+        return '{' + ','.join(pairs) + '}'
+
+
+# Global service instance
+metrics_service = MetricsService()
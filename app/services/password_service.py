@@ -0,0 +1,132 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordServiceBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+class PasswordService:
+    """
+    Password hashing on a small bounded thread pool, plus login rate limiting.
+
+    Hashing is deliberately CPU-heavy. Running it on PASSWORD_HASH_WORKERS
+    threads per process caps how many cores a burst of logins can take, and
+    hashlib releases the GIL while hashing, so the request threads of other
+    pages keep running. At most PASSWORD_HASH_QUEUE hashes wait for a thread;
+    beyond that PasswordServiceBusy is raised instead of queuing requests.
+
+    Hashes use PASSWORD_HASH_METHOD; a stored hash made with other parameters
+    is replaced on the next successful login.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._attempts = {}
+
+    def _ensure_started(self):
+        with self._lock:
+            # A pool created before a fork has no threads in the child
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            workers = current_app.config['PASSWORD_HASH_WORKERS']
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            self._slots = threading.BoundedSemaphore(workers + current_app.config['PASSWORD_HASH_QUEUE'])
+            self._pid = os.getpid()
+
+    def _run(self, func, *args):
+        self._ensure_started()
+        if not self._slots.acquire(timeout=current_app.config['PASSWORD_HASH_WAIT_SECONDS']):
+            raise PasswordServiceBusy()
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash_password(self, password: str) -> str:
+        """Hash a password with the configured method on the calling thread"""
+        return generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'],
+                                      salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Check whether a stored hash was made with other parameters than configured"""
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        if method not in self._methods:
+            # Expand defaults, e.g. 'scrypt' -> 'scrypt:32768:8:1'
+            self._methods[method] = generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._methods[method]
+
+    def verify(self, user, password: str) -> bool:
+        """
+        Check a user's password on the hashing pool, upgrading an outdated hash.
+
+        The new hash is set on the user object; the caller commits it.
+
+        Args:
+            user: User whose password_hash is checked
+            password: Password entered by the user
+
+        Returns:
+            True if the password matches
+
+        Raises:
+            PasswordServiceBusy: If no hashing slot became free in time
+        """
+        if not self._run(check_password_hash, user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            app = current_app._get_current_object()
+            user.password_hash = self._run(self._hash_in_app, app, password)
+        return True
+
+    def _hash_in_app(self, app, password: str) -> str:
+        with app.app_context():
+            return self.hash_password(password)
+
+    def is_rate_limited(self, username: str, address: str) -> bool:
+        """
+        Record a login attempt and check it against the rate limits.
+
+        A username may be tried LOGIN_RATE_LIMIT times and a client address
+        LOGIN_RATE_LIMIT_PER_IP times per LOGIN_RATE_WINDOW seconds in this
+        process. The address limit is higher since colleagues often share one.
+
+        Returns:
+            True if either limit is reached; the attempt is then not counted
+        """
+        limits = [(('user', username), current_app.config['LOGIN_RATE_LIMIT']),
+                  (('ip', address), current_app.config['LOGIN_RATE_LIMIT_PER_IP'])]
+        window = current_app.config['LOGIN_RATE_WINDOW']
+        now = time.monotonic()
+
+        with self._lock:
+            histories = []
+            for key, limit in limits:
+                if not limit:
+                    continue
+                history = self._attempts.setdefault(key, deque())
+                while history and history[0] <= now - window:
+                    history.popleft()
+                if len(history) >= limit:
+                    return True
+                histories.append(history)
+            for history in histories:
+                history.append(now)
+
+            if len(self._attempts) > 10000:
+                self._attempts = {key: history for key, history in self._attempts.items()
+                                  if history and history[-1] > now - window}
+        return False
+
+
+# Global service instance
+password_service = PasswordService()
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from flask import request, g, has_request_context
+from sqlalchemy import event
+from app.services.metrics_service import metrics_service
+
+
+# Longest statement and parameter text kept per slow-query log entry
+MAX_STATEMENT_LENGTH = 4000
+MAX_PARAMETERS_LENGTH = 1000
+
+
+class QueryProfiler:
+    """
+    Opt-in per-request SQL profiler (SQL_PROFILER_ENABLED).
+
+    Counts the statements and DB time of every request, reports them in the
+    X-DB-Query-Count / X-DB-Time-Ms response headers, logs requests that issue
+    more than SQL_PROFILER_WARN_QUERIES statements (a likely N+1 in a template
+    or lazy relationship) and appends statements slower than SLOW_QUERY_MS to
+    the SLOW_QUERY_LOG JSON Lines file. Per-endpoint totals go to the metrics
+    snapshots so the admin page can rank endpoints across all workers.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_seconds = None
+        self.slow_query_log = None
+        self.slow_query_log_max_bytes = None
+        self._log_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Register request hooks and SQLAlchemy engine listeners"""
+        self.enabled = app.config['SQL_PROFILER_ENABLED']
+        if not self.enabled:
+            return
+
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        self.slow_query_log = app.config['SLOW_QUERY_LOG']
+        self.slow_query_log_max_bytes = app.config['SLOW_QUERY_LOG_MAX_BYTES']
+        warn_queries = app.config['SQL_PROFILER_WARN_QUERIES']
+        os.makedirs(os.path.dirname(self.slow_query_log), exist_ok=True)
+
+        @app.before_request
+        def start_profile():
+            g.sql_profile = {'queries': 0, 'seconds': 0.0}
+
+        @app.after_request
+        def finish_profile(response):
+            profile = g.pop('sql_profile', None)
+            if profile is None:
+                return response
+
+            endpoint = request.endpoint or 'unmatched'
+            response.headers['X-DB-Query-Count'] = str(profile['queries'])
+            response.headers['X-DB-Time-Ms'] = f"{profile['seconds'] * 1000:.1f}"
+            metrics_service.observe('http_request_db_queries', profile['queries'], endpoint=endpoint)
+            metrics_service.observe('http_request_db_seconds', profile['seconds'], endpoint=endpoint)
+
+            if profile['queries'] > warn_queries:
+                app.logger.warning(
+                    f"{request.method} {request.path} ({endpoint}) ran {profile['queries']} SQL statements "
+                    f"in {profile['seconds'] * 1000:.1f}ms"
+                )
+            return response
+
+        from app.models import db
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query(conn, cursor, statement, parameters, context, executemany):
+            conn.info['profiler_query_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def finish_query(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop('profiler_query_started', None)
+            if started is None:
+                return
+            elapsed = time.perf_counter() - started
+
+            endpoint = None
+            if has_request_context():
+                endpoint = request.endpoint
+                profile = g.get('sql_profile')
+                if profile is not None:
+                    profile['queries'] += 1
+                    profile['seconds'] += elapsed
+
+            if elapsed >= self.slow_query_seconds:
+                self._log_slow_query(statement, parameters, elapsed, endpoint)
+
+    def _log_slow_query(self, statement: str, parameters, elapsed: float, endpoint: str):
+        entry = {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'endpoint': endpoint or 'background',
+            'duration_ms': round(elapsed * 1000, 1),
+            'statement': ' '.join(statement.split())[:MAX_STATEMENT_LENGTH],
+            'parameters': repr(parameters)[:MAX_PARAMETERS_LENGTH],
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+
+        try:
+            with self._log_lock:
+                # Keep one rotated generation so the log cannot grow without bound
+                if os.path.exists(self.slow_query_log) and \
+                        os.path.getsize(self.slow_query_log) > self.slow_query_log_max_bytes:
+                    os.replace(self.slow_query_log, self.slow_query_log + '.1')
+                # Appends of a single short line are atomic across worker processes
+                with open(self.slow_query_log, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError:
+            pass  # profiling must never break the query that was profiled
+
+    def recent_slow_queries(self, limit: int = 100) -> list:
+        """Return the most recent slow-query log entries, newest first"""
+        if not self.slow_query_log or not os.path.exists(self.slow_query_log):
+            return []
+
+        lines = deque(maxlen=limit)
+        with open(self.slow_query_log, encoding='utf-8') as f:
+            for line in f:
+                lines.append(line)
+
+        entries = []
+        for line in reversed(lines):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    def worst_endpoints(self, limit: int = 20) -> list:
+        """
+        Rank endpoints by average statements per request, from the metrics
+        snapshots of all workers.
+
+        Returns:
+            List of dictionaries with endpoint, requests, avg_queries,
+            avg_db_ms and total_db_seconds
+        """
+        if not metrics_service.enabled:
+            return []
+
+        totals = metrics_service.collect()
+        stats = {}
+        for (name, labels), histogram in totals.items():
+            if name not in ('http_request_db_queries', 'http_request_db_seconds'):
+                continue
+            endpoint_stats = stats.setdefault(labels[0], {'endpoint': labels[0]})
+            count = sum(histogram[:-1])
+            if name == 'http_request_db_queries':
+                endpoint_stats['requests'] = count
+                endpoint_stats['avg_queries'] = histogram[-1] / count if count else 0
+            else:
+                endpoint_stats['avg_db_ms'] = histogram[-1] * 1000 / count if count else 0
+                endpoint_stats['total_db_seconds'] = histogram[-1]
+
+        ranked = [s for s in stats.values() if 'requests' in s and 'avg_db_ms' in s]
+        ranked.sort(key=lambda s: (s['avg_queries'], s['avg_db_ms']), reverse=True)
+        return ranked[:limit]
+
+
+# Global profiler instance
+query_profiler = QueryProfiler()
@@ -0,0 +1,169 @@
+from flask import current_app
+from sqlalchemy import text, or_, and_, literal_column
+from app.models import db, Question
+
+
+# Columns covered by the full-text index, in index order
+SEARCH_COLUMNS = ['title', 'question_text', 'knowledge_points', 'standard_answer', 'solution_approach']
+
+# The SQLite trigram tokenizer can only match terms of at least 3 characters
+MIN_TRIGRAM_LENGTH = 3
+
+# Text searched on Postgres; the trigram index is built on exactly this expression
+SEARCH_DOCUMENT = " || ' ' || ".join(f"coalesce(questions.{col}, '')" for col in SEARCH_COLUMNS)
+POSTGRES_INDEX = 'ix_questions_search_trgm'
+
+
+class SearchService:
+    """Service for full-text search over questions (SQLite FTS5 or a Postgres pg_trgm index)"""
+
+    FTS_TABLE = 'questions_fts'
+
+    def _dialect(self) -> str:
+        return db.engine.dialect.name
+
+    def ensure_index(self) -> bool:
+        """
+        Create the full-text index if it does not exist yet.
+        The index is kept in sync by the database itself (triggers on SQLite,
+        a generated column on Postgres), so ORM writes need no extra work.
+
+        Returns:
+            True if the index was created by this call
+        """
+        dialect = self._dialect()
+        if dialect == 'sqlite':
+            return self._ensure_sqlite_index()
+        if dialect == 'postgresql':
+            return self._ensure_postgres_index()
+
+        current_app.logger.warning(f"Full-text search is not supported on {dialect}, using LIKE fallback")
+        return False
+
+    def _ensure_sqlite_index(self) -> bool:
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.FTS_TABLE}
+        ).first()
+        if exists:
+            return False
+
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{col}' for col in SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{col}' for col in SEARCH_COLUMNS)
+
+        # External-content table: the text lives only in `questions`
+        statements = [
+            f"CREATE VIRTUAL TABLE {self.FTS_TABLE} USING fts5("
+            f"{columns}, content='questions', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN "
+            f"INSERT INTO {self.FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN "
+            f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE ON questions BEGIN "
+            f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {self.FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        ]
+        for statement in statements:
+            db.session.execute(text(statement))
+
+        # Index any questions that existed before the table was created
+        db.session.execute(text(f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}) VALUES ('rebuild')"))
+        db.session.commit()
+        return True
+
+    def _ensure_postgres_index(self) -> bool:
+        exists = db.session.execute(
+            text("SELECT 1 FROM pg_indexes WHERE tablename = 'questions' AND indexname = :name"),
+            {'name': POSTGRES_INDEX}
+        ).first()
+        if exists:
+            return False
+
+        # Replaces the earlier tsvector column, whose 'simple' parser cannot segment Chinese
+        db.session.execute(text("DROP INDEX IF EXISTS ix_questions_search_vector"))
+        db.session.execute(text("ALTER TABLE questions DROP COLUMN IF EXISTS search_vector"))
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON questions "
+            f"USING GIN (({SEARCH_DOCUMENT}) gin_trgm_ops)"
+        ))
+        db.session.commit()
+        return True
+
+    def rebuild_index(self):
+        """Rebuild the full-text index from the questions table"""
+        if self._dialect() == 'sqlite':
+            self.ensure_index()
+            db.session.execute(text(f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}) VALUES ('rebuild')"))
+            db.session.commit()
+        else:
+            # The Postgres expression index is always up to date
+            self.ensure_index()
+
+    def search(self, query, query_text: str, ranked: bool = False):
+        """
+        Restrict a question query to questions matching a search text.
+
+        The match is a condition on the query itself, so role, subject and
+        other filters already on the query apply before any limit.
+
+        Args:
+            query: Query over Question to filter
+            query_text: Free-text query, whitespace separated terms are ANDed
+            ranked: Order by relevance, best match first
+
+        Returns:
+            The filtered query; unchanged if the text has no terms
+        """
+        terms = query_text.split()
+        if not terms:
+            return query
+
+        dialect = self._dialect()
+        if dialect == 'sqlite' and all(len(term) >= MIN_TRIGRAM_LENGTH for term in terms):
+            # Quote every term so FTS5 query syntax in user input is taken literally
+            match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+            matches = db.select(literal_column('rowid').label('rowid'), literal_column('rank').label('rank')) \
+                .select_from(text(self.FTS_TABLE)) \
+                .where(text(f"{self.FTS_TABLE} MATCH :match").bindparams(match=match)) \
+                .subquery()
+            query = query.join(matches, matches.c.rowid == Question.id)
+            return query.order_by(matches.c.rank) if ranked else query
+
+        if dialect == 'postgresql':
+            query = query.filter(self.postgres_condition(terms))
+            if ranked:
+                query = query.order_by(
+                    text(f"similarity({SEARCH_DOCUMENT}, :query) DESC").bindparams(query=' '.join(terms))
+                )
+            return query
+
+        query = query.filter(self.like_condition(terms))
+        return query.order_by(Question.created_at.desc()) if ranked else query
+
+    def postgres_condition(self, terms: list):
+        """Substring match of every term against the trigram-indexed document"""
+        return and_(*[
+            text(f"({SEARCH_DOCUMENT}) ILIKE :term_{i} ESCAPE '\\'").bindparams(
+                **{f'term_{i}': f'%{self._escape_like(term)}%'}
+            )
+            for i, term in enumerate(terms)
+        ])
+
+    def like_condition(self, terms: list):
+        """Substring scan used for terms too short for the index"""
+        conditions = []
+        for term in terms:
+            pattern = f'%{self._escape_like(term)}%'
+            conditions.append(or_(*[getattr(Question, col).like(pattern, escape='\\') for col in SEARCH_COLUMNS]))
+        return and_(*conditions)
+
+    def _escape_like(self, term: str) -> str:
+        return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# Global service instance
+search_service = SearchService()
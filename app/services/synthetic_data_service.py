@@ -0,0 +1,176 @@
+import random
+from datetime import datetime, timedelta
+from app.models import db, User, Question, TestResult, ApiCallLog
+from app.services.tag_service import tag_service
+from app.services.password_service import password_service
+from app.services.analytics_service import analytics_service
+
+
+# Password of every generated user
+SYNTHETIC_PASSWORD = 'benchmark'
+
+SUBJECTS = ['math', 'physics', 'chemistry', 'biology', 'law', 'finance', 'medicine', 'STEM']
+QUESTION_TYPES = ['计算', '证明', '选择', '填空', '简答']
+DIFFICULTIES = ['高中', '大学']
+KNOWLEDGE_POINTS = ['导数', '极限', '积分', '级数', '矩阵', '概率', '微分方程', '向量', '复数', '数列',
+                    '牛顿定律', '电磁感应', '热力学', '化学平衡', '有机反应', '遗传', '细胞', '合同法', '期权定价']
+PHRASES = ['设函数', '$f(x)=x^2+\\sin x$', '在区间', '$[0, 1]$', '上连续', '求证', '存在', '使得',
+           '由题意可知', '根据定义', '因此', '所以', '$\\lim_{n\\to\\infty} a_n$', '的值为', '考虑',
+           '$\\int_0^1 f(x)\\,dx$', '代入得', '整理后', '显然', '不妨设', '分情况讨论', '综上所述']
+
+# Text lengths in characters as (min, max), roughly matching production data
+LENGTHS = {
+    'question_text': (150, 800),
+    'standard_answer': (5, 40),
+    'solution_approach': (200, 1500),
+    'ai_answer': (200, 2000),
+}
+
+
+class SyntheticDataService:
+    """Generate realistic synthetic users, questions, test results and attempt logs"""
+
+    def __init__(self):
+        self._rng = random.Random()
+
+    def _text(self, field: str) -> str:
+        low, high = LENGTHS[field]
+        target = self._rng.randint(low, high)
+        parts = []
+        length = 0
+        while length < target:
+            phrase = self._rng.choice(PHRASES)
+            parts.append(phrase)
+            length += len(phrase)
+        return ''.join(parts)[:target]
+
+    def generate(self, questions: int, users: int = None, attempts: int = 8, seed: int = 42,
+                 batch_size: int = 1000, with_tags: bool = True) -> dict:
+        """
+        Insert synthetic data with bulk INSERTs.
+
+        Every question gets one completed test result with `attempts` attempt logs.
+
+        Args:
+            questions: Number of questions
+            users: Number of question authors (default: one per 200 questions, at least 5)
+            attempts: Attempt logs per test result
+            seed: Random seed, so runs are reproducible
+            batch_size: Questions inserted per commit
+            with_tags: Rebuild the knowledge-point tag index afterwards
+
+        Returns:
+            Dictionary with the number of users, questions, test results and logs created
+        """
+        self._rng.seed(seed)
+        users = users or max(5, questions // 200)
+        now = datetime.utcnow()
+
+        # Hashing is deliberately slow, so all synthetic users share one hash
+        password_hash = password_service.hash_password(SYNTHETIC_PASSWORD)
+        run_tag = f'{seed}_{now.strftime("%Y%m%d%H%M%S")}'
+        db.session.execute(db.insert(User), [
+            {
+                'username': f'synthetic_{run_tag}_{i}',
+                'password_hash': password_hash,
+                'real_name': f'测试用户{i}',
+                'organization': '合成数据',
+                'role': self._rng.choice(['user', 'user', 'reviewer']),
+                'created_at': now,
+            }
+            for i in range(users)
+        ])
+        user_ids = [row[0] for row in db.session.query(User.id)
+                    .filter(User.username.like(f'synthetic_{run_tag}_%'))]
+        db.session.commit()
+
+        created = {'users': users, 'questions': 0, 'test_results': 0, 'api_call_logs': 0}
+        for start in range(0, questions, batch_size):
+            count = min(batch_size, questions - start)
+            self._insert_batch(start, count, user_ids, attempts, now)
+            created['questions'] += count
+            created['test_results'] += count
+            created['api_call_logs'] += count * attempts
+
+        if with_tags:
+            tag_service.backfill(batch_size=batch_size)
+
+        return created
+
+    def _insert_batch(self, start: int, count: int, user_ids: list, attempts: int, now: datetime):
+        rng = self._rng
+        question_rows = []
+        for i in range(start, start + count):
+            created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            question_rows.append({
+                'user_id': rng.choice(user_ids),
+                'title': f'合成题目 {i + 1} {rng.choice(KNOWLEDGE_POINTS)}',
+                'question_type': rng.choice(QUESTION_TYPES),
+                'subject': rng.choice(SUBJECTS),
+                'difficulty': rng.choice(DIFFICULTIES),
+                'knowledge_points': ', '.join(rng.sample(KNOWLEDGE_POINTS, rng.randint(1, 4))),
+                'question_text': self._text('question_text'),
+                'standard_answer': self._text('standard_answer'),
+                'solution_approach': self._text('solution_approach'),
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+
+        question_ids = db.session.scalars(
+            db.insert(Question).returning(Question.id, sort_by_parameter_order=True),
+            question_rows
+        ).all()
+
+        result_rows = []
+        outcomes = []
+        for question_id, question in zip(question_ids, question_rows):
+            correct = [rng.random() < 0.5 for _ in range(attempts)]
+            correct_count = sum(correct)
+            success_rate = correct_count / attempts * 100 if attempts else 0.0
+            test_date = question['created_at'] + timedelta(minutes=rng.randint(1, 600))
+            outcomes.append((correct, test_date))
+            result_rows.append({
+                'question_id': question_id,
+                'test_date': test_date,
+                'total_attempts': attempts,
+                'correct_count': correct_count,
+                'completed_attempts': attempts,
+                'success_rate': success_rate,
+                'qualified': success_rate < 50,
+                'difficulty_status': f'{correct_count}/{attempts}',
+                'status': 'completed',
+                'updated_at': test_date,
+                'manual_review_status': rng.choice(['pending', 'pending', 'approved', 'rejected']),
+            })
+
+        result_ids = db.session.scalars(
+            db.insert(TestResult).returning(TestResult.id, sort_by_parameter_order=True),
+            result_rows
+        ).all()
+
+        log_rows = []
+        for result_id, (correct, test_date) in zip(result_ids, outcomes):
+            for attempt_number, is_correct in enumerate(correct, 1):
+                log_rows.append({
+                    'test_result_id': result_id,
+                    'attempt_number': attempt_number,
+                    'ai_answer': self._text('ai_answer'),
+                    'is_correct': is_correct,
+                    'verification_response': '一致' if is_correct else '不一致',
+                    'call_timestamp': test_date + timedelta(seconds=attempt_number * 20),
+                    'model': 'synthetic-model',
+                    'latency_ms': rng.randint(800, 20000),
+                })
+        if log_rows:
+            db.session.execute(db.insert(ApiCallLog), log_rows)
+
+        analytics_service.record_rows(
+            (result['test_date'], question['subject'], question['difficulty'], question['user_id'],
+             result['qualified'], result['success_rate'], result['manual_review_status'])
+            for question, result in zip(question_rows, result_rows)
+        )
+        db.session.commit()
+
+
+# Global service instance
+synthetic_data_service = SyntheticDataService()
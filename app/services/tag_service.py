@@ -0,0 +1,180 @@
+import re
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Question, Tag, question_tags
+
+
+# Separators accepted between knowledge points (ASCII and full-width punctuation)
+TAG_SEPARATORS = re.compile(r'[,，、;；\n]+')
+
+# Upper bound used for prefix range scans on Tag.name
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+class TagService:
+    """Service for maintaining the normalized knowledge-point tag index"""
+
+    def parse_tags(self, knowledge_points: str) -> list:
+        """
+        Split a free-text knowledge_points value into normalized tag names.
+
+        Args:
+            knowledge_points: Comma-separated knowledge points
+
+        Returns:
+            List of unique tag names in their original order
+        """
+        names = []
+        for part in TAG_SEPARATORS.split(knowledge_points or ''):
+            name = ' '.join(part.split())[:100]
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def _insert_missing(self, names: list):
+        """
+        Insert tag rows, ignoring names another transaction created concurrently.
+        The unique index on Tag.name decides; nothing is flushed from the session.
+        """
+        table = Tag.__table__
+        rows = [{'name': name} for name in names]
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            insert = None
+
+        if insert is not None:
+            db.session.execute(insert(table).on_conflict_do_nothing(index_elements=['name']), rows)
+            return
+
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert(), [row])
+            except IntegrityError:
+                # Created by a concurrent request; the savepoint rollback keeps our transaction usable
+                pass
+
+    def get_or_create_tags(self, names: list) -> list:
+        """
+        Return Tag objects for the given names, creating missing ones.
+
+        Missing names are inserted right away with conflicts ignored, so two
+        requests adding the same new knowledge point at once both succeed.
+        """
+        if not names:
+            return []
+
+        with db.session.no_autoflush:
+            existing = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names))}
+            missing = [name for name in names if name not in existing]
+            if missing:
+                self._insert_missing(missing)
+                existing.update((tag.name, tag) for tag in Tag.query.filter(Tag.name.in_(missing)))
+        return [existing[name] for name in names]
+
+    def sync_question_tags(self, question: Question):
+        """
+        Update a question's tags from its knowledge_points.
+        The caller is responsible for committing the session.
+        """
+        # The question may not be in the session yet, so avoid flushing it half-built
+        with db.session.no_autoflush:
+            question.tags = self.get_or_create_tags(self.parse_tags(question.knowledge_points))
+
+    def backfill(self, batch_size: int = 500) -> int:
+        """
+        Rebuild the question-tag association for every question.
+
+        Args:
+            batch_size: Number of questions processed per commit
+
+        Returns:
+            Number of questions processed
+        """
+        tag_ids = {name: tag_id for tag_id, name in db.session.query(Tag.id, Tag.name)}
+        processed = 0
+        last_id = 0
+
+        while True:
+            rows = db.session.query(Question.id, Question.knowledge_points) \
+                .filter(Question.id > last_id) \
+                .order_by(Question.id) \
+                .limit(batch_size).all()
+            if not rows:
+                break
+
+            parsed = [(question_id, self.parse_tags(knowledge_points)) for question_id, knowledge_points in rows]
+            missing = list(dict.fromkeys(name for _, names in parsed for name in names if name not in tag_ids))
+            if missing:
+                self._insert_missing(missing)
+                tag_ids.update((name, tag_id) for tag_id, name in
+                               db.session.query(Tag.id, Tag.name).filter(Tag.name.in_(missing)))
+
+            associations = [{'question_id': question_id, 'tag_id': tag_ids[name]}
+                            for question_id, names in parsed for name in names]
+
+            question_ids = [row[0] for row in rows]
+            db.session.execute(question_tags.delete().where(question_tags.c.question_id.in_(question_ids)))
+            if associations:
+                db.session.execute(question_tags.insert(), associations)
+            db.session.commit()
+
+            processed += len(rows)
+            last_id = question_ids[-1]
+
+        return processed
+
+    def tag_counts(self, prefix: str = None, limit: int = None, base_query=None) -> list:
+        """
+        Count questions per tag, most used first.
+
+        Args:
+            prefix: Optional tag name prefix
+            limit: Optional maximum number of tags
+            base_query: Optional Question query restricting which questions are counted
+
+        Returns:
+            List of (tag_name, question_count) tuples
+        """
+        count = func.count(question_tags.c.question_id).label('question_count')
+        query = db.session.query(Tag.name, count) \
+            .join(question_tags, question_tags.c.tag_id == Tag.id)
+
+        if base_query is not None:
+            question_ids = base_query.with_entities(Question.id).subquery()
+            query = query.filter(question_tags.c.question_id.in_(db.select(question_ids.c.id)))
+        if prefix:
+            query = self._filter_prefix(query, prefix)
+
+        query = query.group_by(Tag.id, Tag.name).order_by(count.desc(), Tag.name)
+        if limit:
+            query = query.limit(limit)
+        return [(name, question_count) for name, question_count in query.all()]
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> list:
+        """Return tag names starting with prefix, served from the unique name index"""
+        prefix = ' '.join((prefix or '').split())
+        if not prefix:
+            return []
+        query = self._filter_prefix(db.session.query(Tag.name), prefix)
+        return [row[0] for row in query.order_by(Tag.name).limit(limit).all()]
+
+    def filter_by_tag(self, query, tag_name: str):
+        """Restrict a Question query to questions carrying the given tag"""
+        return query.filter(Question.id.in_(
+            db.select(question_tags.c.question_id)
+            .join(Tag, Tag.id == question_tags.c.tag_id)
+            .where(Tag.name == tag_name)
+        ))
+
+    def _filter_prefix(self, query, prefix: str):
+        # A range condition can use the B-tree index on Tag.name, unlike LIKE
+        return query.filter(Tag.name >= prefix, Tag.name < prefix + PREFIX_UPPER_BOUND)
+
+
+# Global service instance
+tag_service = TagService()
@@ -0,0 +1,83 @@
+import queue
+import threading
+from flask import current_app
+from app.models import db
+from app.services.metrics_service import metrics_service
+
+
+class TestQueue:
+    """
+    Bounded in-process queue of questions waiting to be tested.
+
+    A fixed number of worker threads drain the queue, so bulk operations never
+    start more concurrent tests (and API calls) than TEST_QUEUE_WORKERS.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._queue is not None:
+                return
+
+            app = current_app._get_current_object()
+            self._queue = queue.Queue(maxsize=app.config['TEST_QUEUE_MAX_SIZE'])
+
+            for worker_num in range(app.config['TEST_QUEUE_WORKERS']):
+                worker = threading.Thread(target=self._worker, args=(app,),
+                                          name=f'test-queue-{worker_num}')
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker(self, app):
+        from app.services.testing_service import testing_service
+
+        while True:
+            question_id = self._queue.get()
+            metrics_service.set('test_queue_pending', self._queue.qsize())
+            try:
+                with app.app_context():
+                    try:
+                        testing_service.run_question_test(question_id)
+                    except Exception as e:
+                        app.logger.error(f"Queued test for question {question_id} failed: {str(e)}")
+                    finally:
+                        db.session.remove()
+            finally:
+                self._queue.task_done()
+
+    def submit(self, question_id: int, block: bool = False) -> bool:
+        """
+        Queue a question for testing.
+
+        Args:
+            question_id: The ID of the question to test
+            block: Wait for free space instead of failing when the queue is full
+
+        Returns:
+            True if the question was queued
+        """
+        self._ensure_started()
+        try:
+            self._queue.put(question_id, block=block)
+            metrics_service.set('test_queue_pending', self._queue.qsize())
+            return True
+        except queue.Full:
+            return False
+
+    def pending(self) -> int:
+        """Approximate number of questions waiting to be tested"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def join(self):
+        """Block until every queued test has finished"""
+        if self._queue is not None:
+            self._queue.join()
+
+
+# Global queue instance
+test_queue = TestQueue()
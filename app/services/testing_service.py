@@ -1,39 +1,159 @@
+import os
+import time
+import threading
 from datetime import datetime
 from flask import current_app
-from app.models import db, Question, TestResult, ApiCallLog
+from sqlalchemy import func
+from app.models import db, Question, TestResult, ApiCallLog, ApiCallLogArchive, question_tags
 from app.services.claude_service import claude_service
+from app.services.metrics_service import metrics_service
+from app.services.tracing_service import tracing_service
+from app.services.fragment_cache import fragment_cache
+from app.services.latex_service import latex_service
+from app.services.archive_service import archive_service
+from app.services.dedup_service import dedup_service
+from app.services.analytics_service import analytics_service
 
 
 class TestingService:
     """Service for orchestrating question testing with Claude AI"""
 
+    def __init__(self):
+        self._next_cleanup = 0
+        self._cleanup_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Reap tests orphaned by killed workers while the application serves requests"""
+        @app.before_request
+        def cleanup_stale_tests():
+            self.cleanup_stale_tests_periodically()
+
+    def cleanup_stale_tests_periodically(self) -> int:
+        """
+        Run cleanup_incomplete_tests at most every STALE_TEST_CLEANUP_SECONDS.
+
+        The first request of a worker runs it right away. A lock file keeps
+        workers from cleaning up at the same time; a lock older than the
+        interval was left by a crashed worker and is replaced.
+
+        Returns:
+            Number of test results cleaned up
+        """
+        now = time.monotonic()
+        with self._cleanup_lock:
+            if now < self._next_cleanup:
+                return 0
+            self._next_cleanup = now + current_app.config['STALE_TEST_CLEANUP_SECONDS']
+
+        lock_path = current_app.config['STALE_TEST_LOCK_FILE']
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > current_app.config['STALE_TEST_CLEANUP_SECONDS']:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return 0
+        except OSError as e:
+            current_app.logger.warning(f"Could not take the stale test cleanup lock {lock_path}: {str(e)}")
+            return 0
+
+        try:
+            return self.cleanup_incomplete_tests(max_age_minutes=current_app.config['STALE_TEST_MINUTES'])
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error cleaning up incomplete tests: {str(e)}")
+            return 0
+        finally:
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
     def cleanup_incomplete_tests(self, max_age_minutes=30):
         """
-        Clean up incomplete test results that are older than max_age_minutes.
+        Clean up incomplete test results that made no progress for max_age_minutes.
+
+        Every recorded attempt bumps updated_at, so a long but healthy test is
+        kept; only tests whose worker died stop being updated.
 
         Args:
-            max_age_minutes: Maximum age in minutes for incomplete tests
+            max_age_minutes: Minutes without progress after which a running test is stale
         """
         from datetime import timedelta
         cutoff_time = datetime.utcnow() - timedelta(minutes=max_age_minutes)
 
-        # Find incomplete tests older than cutoff time
-        incomplete_tests = TestResult.query.filter(
+        # Find running tests without progress since the cutoff time
+        incomplete_ids = [row[0] for row in db.session.query(TestResult.id).filter(
             TestResult.status == 'running',
-            TestResult.test_date < cutoff_time
-        ).all()
-
-        for test_result in incomplete_tests:
-            current_app.logger.info(f"Cleaning up incomplete test result {test_result.id}")
-            # Delete associated API logs first
-            ApiCallLog.query.filter_by(test_result_id=test_result.id).delete()
-            db.session.delete(test_result)
+            func.coalesce(TestResult.updated_at, TestResult.test_date) < cutoff_time
+        )]
 
-        if incomplete_tests:
+        if incomplete_ids:
+            current_app.logger.info(f"Cleaning up incomplete test results {incomplete_ids}")
+            self.delete_test_results(incomplete_ids)
             db.session.commit()
-            current_app.logger.info(f"Cleaned up {len(incomplete_tests)} incomplete test results")
+            current_app.logger.info(f"Cleaned up {len(incomplete_ids)} incomplete test results")
 
-        return len(incomplete_tests)
+        return len(incomplete_ids)
+
+    def delete_test_results(self, test_result_ids: list) -> int:
+        """
+        Delete test results and their API call logs (hot and archived) with set-based statements.
+        The caller is responsible for committing the session.
+
+        Args:
+            test_result_ids: IDs of the test results to delete
+
+        Returns:
+            Number of test results deleted
+        """
+        if not test_result_ids:
+            return 0
+
+        tracing_service.delete_traces(test_result_ids)
+        fragment_cache.invalidate('test_result', test_result_ids)
+        analytics_service.remove_results(test_result_ids)
+
+        # Delete children explicitly so databases created without ON DELETE CASCADE behave the same
+        ApiCallLog.query.filter(ApiCallLog.test_result_id.in_(test_result_ids)) \
+            .delete(synchronize_session=False)
+        ApiCallLogArchive.query.filter(ApiCallLogArchive.test_result_id.in_(test_result_ids)) \
+            .delete(synchronize_session=False)
+        return TestResult.query.filter(TestResult.id.in_(test_result_ids)) \
+            .delete(synchronize_session=False)
+
+    def delete_questions(self, question_ids: list) -> int:
+        """
+        Delete questions together with their test results, API call logs, tags and similarity index entries.
+        The caller is responsible for committing the session.
+
+        Args:
+            question_ids: IDs of the questions to delete
+
+        Returns:
+            Number of questions deleted
+        """
+        if not question_ids:
+            return 0
+
+        test_result_ids = db.select(TestResult.id).where(TestResult.question_id.in_(question_ids))
+        deleted_result_ids = db.session.scalars(test_result_ids).all()
+        tracing_service.delete_traces(deleted_result_ids)
+        fragment_cache.invalidate('test_result', deleted_result_ids)
+        fragment_cache.invalidate('question', question_ids)
+        analytics_service.remove_results(deleted_result_ids)
+        ApiCallLog.query.filter(ApiCallLog.test_result_id.in_(test_result_ids)) \
+            .delete(synchronize_session=False)
+        ApiCallLogArchive.query.filter(ApiCallLogArchive.test_result_id.in_(test_result_ids)) \
+            .delete(synchronize_session=False)
+        TestResult.query.filter(TestResult.question_id.in_(question_ids)) \
+            .delete(synchronize_session=False)
+        db.session.execute(question_tags.delete().where(question_tags.c.question_id.in_(question_ids)))
+        dedup_service.remove_questions(question_ids)
+        return Question.query.filter(Question.id.in_(question_ids)) \
+            .delete(synchronize_session=False)
 
     def run_question_test(self, question_id: int, test_result_id: int = None) -> TestResult:
         """
@@ -73,125 +193,186 @@ class TestingService:
         completed_attempts = 0
 
         current_app.logger.info(f"Starting test for question {question_id}: {question.title}")
+        metrics_service.inc('tests_running')
+        trace = tracing_service.start_trace('test_run', question_id=question_id,
+                                            test_result_id=test_result.id, total_attempts=total_attempts)
+        trace_error = None
+        keep_trace = True
 
         try:
             # Run 8 independent attempts
             for attempt_num in range(1, total_attempts + 1):
-                try:
-                    current_app.logger.info(f"Attempt {attempt_num}/{total_attempts}")
-
-                    # Call Claude to answer the question (stateless)
-                    ai_answer = claude_service.call_claude_stateless(question.question_text)
-                    current_app.logger.info(f"AI Answer: {ai_answer[:100]}...")
-
-                    # Add rate limiting delay
-                    claude_service.add_rate_limit_delay()
-
-                    # Verify the answer using Claude
-                    is_correct, verification_response = claude_service.verify_answer(
-                        ai_answer,
-                        question.standard_answer,
-                        question.question_text
-                    )
-                    current_app.logger.info(f"Verification: {'Correct' if is_correct else 'Incorrect'}")
-
-                    if is_correct:
-                        correct_count += 1
-
-                    # Log the API call
-                    api_log = ApiCallLog(
-                        test_result_id=test_result.id,
-                        attempt_number=attempt_num,
-                        ai_answer=ai_answer,
-                        is_correct=is_correct,
-                        verification_response=verification_response,
-                        call_timestamp=datetime.utcnow()
-                    )
-                    db.session.add(api_log)
-                    db.session.commit()
-
-                    completed_attempts += 1
-
-                    # Add rate limiting delay before next attempt
-                    if attempt_num < total_attempts:
-                        claude_service.add_rate_limit_delay()
-
-                except Exception as e:
-                    error_msg = f"Error in attempt {attempt_num}: {str(e)}"
-                    current_app.logger.error(error_msg)
-
-                    # Log the error
-                    api_log = ApiCallLog(
-                        test_result_id=test_result.id,
-                        attempt_number=attempt_num,
-                        ai_answer="",
-                        is_correct=False,
-                        verification_response="",
-                        call_timestamp=datetime.utcnow(),
-                        error_message=error_msg
-                    )
-                    db.session.add(api_log)
-                    db.session.commit()
-
-                    completed_attempts += 1
+                with tracing_service.span('attempt', attempt_number=attempt_num) as attempt_span:
+                    try:
+                        current_app.logger.info(f"Attempt {attempt_num}/{total_attempts}")
+
+                        # Call Claude to answer the question (stateless)
+                        with tracing_service.span('answer'):
+                            started = time.monotonic()
+                            ai_answer = claude_service.call_claude_stateless(question.question_text)
+                            latency_ms = int((time.monotonic() - started) * 1000)
+                        current_app.logger.info(f"AI Answer: {ai_answer[:100]}...")
+
+                        # Add rate limiting delay
+                        with tracing_service.span('rate_limit_delay'):
+                            claude_service.add_rate_limit_delay()
+
+                        # Verify the answer using Claude
+                        with tracing_service.span('verify'):
+                            is_correct, verification_response = claude_service.verify_answer(
+                                ai_answer,
+                                question.standard_answer,
+                                question.question_text
+                            )
+                        current_app.logger.info(f"Verification: {'Correct' if is_correct else 'Incorrect'}")
+
+                        if is_correct:
+                            correct_count += 1
+
+                        # Log the API call
+                        api_log = ApiCallLog(
+                            test_result_id=test_result.id,
+                            attempt_number=attempt_num,
+                            ai_answer=ai_answer,
+                            is_correct=is_correct,
+                            verification_response=verification_response,
+                            call_timestamp=datetime.utcnow(),
+                            model=claude_service.model,
+                            latency_ms=latency_ms
+                        )
+                        with tracing_service.span('db.commit'):
+                            db.session.add(api_log)
+                            self._record_attempt(test_result.id, is_correct)
+                            db.session.commit()
+                        latex_service.prerender(ai_answer)
+
+                        completed_attempts += 1
+                        if attempt_span:
+                            attempt_span.attributes['is_correct'] = is_correct
+
+                        # Add rate limiting delay before next attempt
+                        if attempt_num < total_attempts:
+                            with tracing_service.span('rate_limit_delay'):
+                                claude_service.add_rate_limit_delay()
+
+                    except Exception as e:
+                        error_msg = f"Error in attempt {attempt_num}: {str(e)}"
+                        current_app.logger.error(error_msg)
+                        if attempt_span:
+                            attempt_span.error = error_msg
+
+                        # Log the error
+                        api_log = ApiCallLog(
+                            test_result_id=test_result.id,
+                            attempt_number=attempt_num,
+                            ai_answer="",
+                            is_correct=False,
+                            verification_response="",
+                            call_timestamp=datetime.utcnow(),
+                            error_message=error_msg,
+                            model=claude_service.model
+                        )
+                        with tracing_service.span('db.commit'):
+                            db.session.add(api_log)
+                            self._record_attempt(test_result.id, False)
+                            db.session.commit()
+
+                        completed_attempts += 1
 
             # Calculate final results
             success_rate = (correct_count / total_attempts) * 100
             qualified = success_rate < current_app.config['QUALIFICATION_THRESHOLD']
             difficulty_status = f"{correct_count}/{total_attempts}"
 
-            # Update test result
+            # Update test result, replacing its analytics contribution if it is re-run
+            if test_result.status == 'completed':
+                analytics_service.record_result(test_result, question, -1)
             test_result.correct_count = correct_count
             test_result.success_rate = success_rate
             test_result.qualified = qualified
             test_result.difficulty_status = difficulty_status
             test_result.status = 'completed'  # Mark as completed
-            db.session.commit()
+            analytics_service.record_result(test_result, question)
+            with tracing_service.span('db.commit'):
+                db.session.commit()
 
             current_app.logger.info(
                 f"Test completed: {correct_count}/{total_attempts} correct "
                 f"({success_rate:.1f}%), Qualified: {qualified}"
             )
+            metrics_service.inc('tests_finished_total', outcome='completed')
 
             return test_result
 
         except Exception as e:
+            metrics_service.inc('tests_finished_total', outcome='failed')
+            trace_error = str(e)
             # If test was interrupted and not all attempts completed, delete the test result
             current_app.logger.error(f"Test interrupted: {str(e)}")
             if completed_attempts < total_attempts:
                 current_app.logger.info(f"Deleting incomplete test result (completed {completed_attempts}/{total_attempts})")
-                # Delete associated API logs first
-                ApiCallLog.query.filter_by(test_result_id=test_result.id).delete()
-                db.session.delete(test_result)
+                self.delete_test_results([test_result.id])
                 db.session.commit()
+                keep_trace = False
             raise
-
-    def get_test_progress(self, test_result_id: int) -> dict:
+        finally:
+            metrics_service.dec('tests_running')
+            tracing_service.end_trace(trace, error=trace_error, store=keep_trace)
+
+    def _record_attempt(self, test_result_id: int, is_correct: bool):
+        """Atomically bump the progress counters of a running test"""
+        TestResult.query.filter_by(id=test_result_id).update({
+            TestResult.completed_attempts: TestResult.completed_attempts + 1,
+            TestResult.correct_count: TestResult.correct_count + (1 if is_correct else 0),
+            TestResult.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+
+    def get_test_progress(self, test_result_id: int, since_attempt: int = None) -> dict:
         """
-        Get the current progress of a test.
+        Get the current progress of a test from its running counters.
 
         Args:
             test_result_id: The ID of the test result
+            since_attempt: Optional cursor; when given, include logs of attempts after it
 
         Returns:
             Dictionary with progress information
         """
-        test_result = TestResult.query.get(test_result_id)
+        test_result = db.session.get(TestResult, test_result_id)
         if not test_result:
             return None
 
-        completed_attempts = ApiCallLog.query.filter_by(
-            test_result_id=test_result_id
-        ).count()
-
-        return {
+        progress = {
             'test_result_id': test_result_id,
             'total_attempts': test_result.total_attempts,
-            'completed_attempts': completed_attempts,
+            'completed_attempts': test_result.completed_attempts,
             'correct_count': test_result.correct_count,
-            'is_complete': completed_attempts >= test_result.total_attempts
+            'is_complete': (test_result.status == 'completed'
+                            or test_result.completed_attempts >= test_result.total_attempts)
         }
 
+        if since_attempt is not None:
+            api_logs = ApiCallLog.query.filter(
+                ApiCallLog.test_result_id == test_result_id,
+                ApiCallLog.attempt_number > since_attempt
+            ).options(db.undefer(ApiCallLog.ai_answer)).order_by(ApiCallLog.attempt_number).all()
+            if not api_logs and test_result.status == 'completed':
+                api_logs = [log for log in archive_service.get_logs(test_result_id)
+                            if log.attempt_number > since_attempt]
+
+            progress['logs'] = [
+                {
+                    'attempt_number': log.attempt_number,
+                    'is_correct': log.is_correct,
+                    'ai_answer': log.ai_answer[:100] if log.ai_answer else '',
+                    'error_message': log.error_message
+                }
+                for log in api_logs
+            ]
+            progress['cursor'] = api_logs[-1].attempt_number if api_logs else since_attempt
+
+        return progress
+
 
 # Global service instance
 testing_service = TestingService()
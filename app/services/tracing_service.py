@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import secrets
+import threading
+import urllib.request
+from contextlib import contextmanager
+from flask import current_app
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None,
+                 start_ns: int = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def end(self, end_ns: int = None):
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+
+    def to_otlp(self) -> dict:
+        """Span in the OTLP/JSON encoding"""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class TracingService:
+    """
+    Span tracing of question test runs.
+
+    A test run is one trace; attempts, the answer and verify phases, LLM
+    requests, retry back-offs, rate-limit sleeps and DB commits are nested
+    spans. The active span stack is thread-local, since every test runs in its
+    own thread. Finished traces are written as OTLP/JSON to
+    TRACE_DIR/test_result_<id>.json and, when TRACE_EXPORT_URL is set, posted
+    to that OTLP/HTTP collector endpoint.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def start_trace(self, name: str, **attributes) -> Span:
+        """Start the root span of a new trace on this thread"""
+        if not current_app.config['TRACING_ENABLED']:
+            return None
+        root = Span(name, secrets.token_hex(16), attributes=attributes)
+        self._local.spans = [root]
+        self._local.stack = [root]
+        return root
+
+    def end_trace(self, root: Span, error: str = None, store: bool = True):
+        """
+        Finish the trace started by start_trace and export it.
+
+        Args:
+            root: Span returned by start_trace (None when tracing is disabled)
+            error: Error message if the traced operation failed
+            store: Keep the trace in TRACE_DIR (False if the test result was deleted)
+        """
+        if root is None:
+            return
+        root.error = error
+        root.end()
+        spans = getattr(self._local, 'spans', [])
+        self._local.spans = []
+        self._local.stack = []
+
+        try:
+            self._export(root, spans, store)
+        except Exception as e:
+            current_app.logger.error(f"Exporting trace {root.trace_id} failed: {str(e)}")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block as a child of the current span (no-op outside a trace)"""
+        stack = self._stack()
+        if not stack:
+            yield None
+            return
+
+        span = Span(name, stack[-1].trace_id, stack[-1].span_id, attributes)
+        self._local.spans.append(span)
+        stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            span.end()
+            stack.pop()
+
+    def record_span(self, name: str, duration_seconds: float, **attributes):
+        """Add an already-timed span starting now, e.g. a scheduled retry back-off"""
+        stack = self._stack()
+        if not stack:
+            return
+        span = Span(name, stack[-1].trace_id, stack[-1].span_id, attributes)
+        span.end(span.start_ns + int(duration_seconds * 1e9))
+        self._local.spans.append(span)
+
+    def _export(self, root: Span, spans: list, store: bool):
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [_otlp_attribute('service.name', 'question-testing-system')]},
+                'scopeSpans': [{
+                    'scope': {'name': 'app.services.testing_service'},
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+        body = json.dumps(payload, ensure_ascii=False)
+
+        test_result_id = root.attributes.get('test_result_id')
+        if store and test_result_id is not None:
+            path = self._trace_path(test_result_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(body)
+            os.replace(path + '.tmp', path)
+
+        export_url = current_app.config['TRACE_EXPORT_URL']
+        if export_url:
+            req = urllib.request.Request(export_url, data=body.encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(req, timeout=5).close()
+
+    def delete_traces(self, test_result_ids: list):
+        """Remove the stored traces of deleted test results"""
+        for test_result_id in test_result_ids:
+            try:
+                os.remove(self._trace_path(test_result_id))
+            except OSError:
+                pass
+
+    def trace_version(self, test_result_id: int) -> int:
+        """Modification time of the stored trace (0 if none), for cache versioning"""
+        try:
+            return os.stat(self._trace_path(test_result_id)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _trace_path(self, test_result_id: int) -> str:
+        return os.path.join(current_app.config['TRACE_DIR'], f'test_result_{int(test_result_id)}.json')
+
+    def get_waterfall(self, test_result_id: int) -> dict:
+        """
+        Load the stored trace of a test run, laid out for a waterfall view.
+
+        Returns:
+            Dictionary with trace_id, duration_ms and spans (depth-first, each
+            with name, depth, offset_ms, duration_ms, attributes and error), or
+            None if no trace was recorded
+        """
+        try:
+            with open(self._trace_path(test_result_id), encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        spans = [span for resource in payload.get('resourceSpans', [])
+                 for scope in resource.get('scopeSpans', [])
+                 for span in scope.get('spans', [])]
+        if not spans:
+            return None
+
+        children = {}
+        for span in spans:
+            children.setdefault(span.get('parentSpanId'), []).append(span)
+        for siblings in children.values():
+            siblings.sort(key=lambda span: int(span['startTimeUnixNano']))
+
+        trace_start = min(int(span['startTimeUnixNano']) for span in spans)
+        trace_end = max(int(span['endTimeUnixNano']) for span in spans)
+        rows = []
+
+        def visit(span, depth):
+            start = int(span['startTimeUnixNano'])
+            end = int(span['endTimeUnixNano'])
+            rows.append({
+                'name': span['name'],
+                'depth': depth,
+                'offset_ms': (start - trace_start) / 1e6,
+                'duration_ms': (end - start) / 1e6,
+                'attributes': {attr['key']: next(iter(attr['value'].values()))
+                               for attr in span.get('attributes', [])},
+                'error': span.get('status', {}).get('message'),
+            })
+            for child in children.get(span['spanId'], []):
+                visit(child, depth + 1)
+
+        for root in children.get(None, []):
+            visit(root, 0)
+
+        return {
+            'trace_id': spans[0]['traceId'],
+            'duration_ms': (trace_end - trace_start) / 1e6,
+            'spans': rows,
+        }
+
+
+# Global service instance
+tracing_service = TracingService()
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from flask import current_app
+from flask_login import UserMixin
+from app.models import db, User, RoleMixin
+
+
+class UserPrincipal(RoleMixin, UserMixin):
+    """Lightweight, detached stand-in for User used as current_user"""
+
+    def __init__(self, id, username, real_name, role):
+        self.id = id
+        self.username = username
+        self.real_name = real_name
+        self.role = role
+
+    def __repr__(self):
+        return f'<UserPrincipal {self.username} ({self.role})>'
+
+
+class UserCache:
+    """
+    Per-process TTL cache of user principals for the Flask-Login user loader.
+
+    Invalidation touches a stamp file shared by all workers on the host, so a
+    role change made in one worker (or by manage_admin.py) clears every
+    worker's cache on its next request. Entries also expire after
+    USER_CACHE_TTL seconds.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._stamp_mtime = None
+        self._lock = threading.Lock()
+
+    def _stamp_path(self) -> str:
+        return current_app.config['USER_CACHE_STAMP_FILE'] or \
+            os.path.join(current_app.instance_path, 'user_cache.stamp')
+
+    def _read_stamp(self):
+        try:
+            return os.stat(self._stamp_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, user_id: int) -> UserPrincipal:
+        """Return the principal for user_id, loading it with one narrow query on a miss"""
+        ttl = current_app.config['USER_CACHE_TTL']
+        now = time.monotonic()
+        stamp = self._read_stamp()
+
+        with self._lock:
+            if stamp != self._stamp_mtime:
+                # Another process invalidated the cache
+                self._entries.clear()
+                self._stamp_mtime = stamp
+
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        row = db.session.query(User.id, User.username, User.real_name, User.role) \
+            .filter(User.id == user_id).first()
+        if row is None:
+            return None
+
+        principal = UserPrincipal(row.id, row.username, row.real_name, row.role)
+        with self._lock:
+            self._entries[user_id] = (now + ttl, principal)
+        return principal
+
+    def invalidate(self, user_id: int = None):
+        """Drop a cached user (or all users) here and signal the other workers"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+        path = self._stamp_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a'):
+                os.utime(path)
+        except OSError as e:
+            current_app.logger.warning(f"Could not touch user cache stamp {path}: {str(e)}")
+
+
+# Global cache instance
+user_cache = UserCache()
@@ -3,13 +3,14 @@ Quick admin creation script
 Usage: python create_admin.py <username> <password>
 """
 import sys
-from app import create_app, db
+from app import create_app, initialize_database, db
 from app.models import User
 
 
 def create_admin(username, password):
     """Create an admin user"""
     app = create_app()
+    initialize_database(app, cleanup=False)
     with app.app_context():
         # Check if user exists
         existing_user = User.query.filter_by(username=username).first()
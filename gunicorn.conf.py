@@ -0,0 +1,73 @@
+"""
+Gunicorn settings for production.
+Run with: gunicorn -c gunicorn.conf.py run:app
+
+Most request time is spent waiting on the database or the LLM API, so each
+worker serves several requests concurrently with threads. Every setting can be
+overridden through a GUNICORN_* environment variable.
+"""
+import os
+import time
+import multiprocessing
+
+_config_loaded = time.monotonic()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threaded workers: a slow export or long poll only occupies one thread
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Import the app once in the master; workers fork with it already loaded
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Worker recycling is opt-in. Test runs, queued tests and Excel exports run in
+# daemon threads of the worker that started them, and recycling a worker kills
+# them mid-run (the progress pages poll every second, so a request limit is
+# reached quickly). Their results stay 'running' until the stale-test cleanup
+# reaps them. Only set GUNICORN_MAX_REQUESTS if memory growth requires it;
+# staggered by the jitter so workers don't all restart at once.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# With gthread the heartbeat keeps running during long requests, so this only
+# catches hung workers; graceful_timeout bounds rolling restarts
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    server.log.info(f"Master ready in {time.monotonic() - _config_loaded:.2f}s (preload_app={preload_app})")
+
+
+def post_fork(server, worker):
+    worker.boot_started = time.monotonic()
+
+    if preload_app:
+        # Connections opened in the master must not be shared with the forked workers
+        from app import db
+        flask_app = server.app.wsgi()
+        with flask_app.app_context():
+            db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} booted in {time.monotonic() - worker.boot_started:.3f}s")
+
+
+def worker_exit(server, worker):
+    import threading
+    from app.services.test_queue import test_queue
+
+    background = [thread.name for thread in threading.enumerate()
+                  if thread.name.startswith(('test-run', 'export-job')) and thread.is_alive()]
+    pending = test_queue.pending()
+    if background or pending:
+        worker.log.warning(f"Worker {worker.pid} exiting with background work unfinished: "
+                           f"{', '.join(background) or 'no test or export threads'}, {pending} queued tests")
@@ -2,13 +2,15 @@
 Admin management commands
 Run with: python manage_admin.py
 """
-from app import create_app, db
+from app import create_app, initialize_database, db
 from app.models import User
+from app.services.user_cache import user_cache
 
 
 def create_admin():
     """Create an admin user"""
     app = create_app()
+    initialize_database(app, cleanup=False)
     with app.app_context():
         print("=== 创建管理员账号 ===")
         username = input("请输入管理员用户名: ").strip()
@@ -105,6 +107,8 @@ def change_user_role():
 
         try:
             db.session.commit()
+            # Make running web workers reload this user's role
+            user_cache.invalidate(user.id)
             print(f"\n✓ 角色修改成功！")
             print(f"  用户名: {user.username}")
             print(f"  新角色: {new_role}")
@@ -97,14 +97,33 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # Batch mode rebuilds SQLite tables by copy-and-drop, which must not
+        # trigger foreign key checks or cascades. SQLite ignores this pragma
+        # inside a transaction, so it is set before the migrations begin one.
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             **conf_args
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+
+            if sqlite:
+                violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+                if violations:
+                    raise RuntimeError(f'Foreign key violations after migration: {violations[:10]}')
+        finally:
+            if sqlite:
+                connection.rollback()
+                connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+                connection.commit()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,71 @@
+"""Add full-text search index on questions
+
+Revision ID: 5c3e8a1d9b27
+Revises: 4fda409b53b8
+Create Date: 2026-10-19 09:12:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e8a1d9b27'
+down_revision = '4fda409b53b8'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ['title', 'question_text', 'knowledge_points', 'standard_answer', 'solution_approach']
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        columns = ', '.join(COLUMNS)
+        new_values = ', '.join(f'new.{col}' for col in COLUMNS)
+        old_values = ', '.join(f'old.{col}' for col in COLUMNS)
+
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5("
+            f"{columns}, content='questions', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN "
+            f"INSERT INTO questions_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN "
+            f"INSERT INTO questions_fts(questions_fts, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE ON questions BEGIN "
+            f"INSERT INTO questions_fts(questions_fts, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO questions_fts(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute("INSERT INTO questions_fts(questions_fts) VALUES ('rebuild')")
+
+    elif dialect == 'postgresql':
+        document = " || ' ' || ".join(f"coalesce({col}, '')" for col in COLUMNS)
+        op.execute(
+            f"ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_questions_search_vector ON questions USING GIN (search_vector)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS questions_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS questions_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS questions_fts_ai")
+        op.execute("DROP TABLE IF EXISTS questions_fts")
+
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_questions_search_vector")
+        op.execute("ALTER TABLE questions DROP COLUMN IF EXISTS search_vector")
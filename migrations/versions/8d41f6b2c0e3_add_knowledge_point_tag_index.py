@@ -0,0 +1,50 @@
+"""Add knowledge-point tag index
+
+Revision ID: 8d41f6b2c0e3
+Revises: 5c3e8a1d9b27
+Create Date: 2026-10-19 10:03:17.541902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f6b2c0e3'
+down_revision = '5c3e8a1d9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tags',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tags_name'), ['name'], unique=True)
+
+    op.create_table('question_tags',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ),
+        sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ),
+        sa.PrimaryKeyConstraint('question_id', 'tag_id')
+    )
+    with op.batch_alter_table('question_tags', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_tags_tag_id'), ['tag_id'], unique=False)
+
+    # Populate with: flask backfill-tags
+
+
+def downgrade():
+    with op.batch_alter_table('question_tags', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_tags_tag_id'))
+
+    op.drop_table('question_tags')
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tags_name'))
+
+    op.drop_table('tags')
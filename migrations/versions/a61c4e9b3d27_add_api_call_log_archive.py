@@ -0,0 +1,40 @@
+"""Add archive table for old API call logs
+
+Revision ID: a61c4e9b3d27
+Revises: f83c6a2e9d15
+Create Date: 2026-10-19 21:14:52.307611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61c4e9b3d27'
+down_revision = 'f83c6a2e9d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('api_call_log_archive',
+        sa.Column('test_result_id', sa.Integer(), nullable=False),
+        sa.Column('log_count', sa.Integer(), nullable=False),
+        sa.Column('first_call', sa.DateTime(), nullable=True),
+        sa.Column('last_call', sa.DateTime(), nullable=True),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['test_result_id'], ['test_results.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('test_result_id')
+    )
+    with op.batch_alter_table('api_call_log_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_api_call_log_archive_first_call'), ['first_call'], unique=False)
+        batch_op.create_index(batch_op.f('ix_api_call_log_archive_last_call'), ['last_call'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('api_call_log_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_api_call_log_archive_last_call'))
+        batch_op.drop_index(batch_op.f('ix_api_call_log_archive_first_call'))
+
+    op.drop_table('api_call_log_archive')
@@ -0,0 +1,68 @@
+"""Add ON DELETE CASCADE foreign keys and child foreign key indexes
+
+Revision ID: b7e2c94f1a06
+Revises: 8d41f6b2c0e3
+Create Date: 2026-10-19 11:20:05.774318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c94f1a06'
+down_revision = '8d41f6b2c0e3'
+branch_labels = None
+depends_on = None
+
+
+# Gives the unnamed foreign keys created by db.create_all() a predictable name
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+CASCADE_FOREIGN_KEYS = [
+    ('test_results', 'question_id', 'questions'),
+    ('api_call_logs', 'test_result_id', 'test_results'),
+    ('question_tags', 'question_id', 'questions'),
+    ('question_tags', 'tag_id', 'tags'),
+]
+
+
+def _replace_foreign_key(table, column, referred_table, ondelete):
+    inspector = sa.inspect(op.get_bind())
+    existing_name = None
+    for fk in inspector.get_foreign_keys(table):
+        if fk['constrained_columns'] == [column]:
+            existing_name = fk['name'] or f'fk_{table}_{column}_{referred_table}'
+
+    with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        if existing_name:
+            batch_op.drop_constraint(existing_name, type_='foreignkey')
+        batch_op.create_foreign_key(f'fk_{table}_{column}_{referred_table}', referred_table,
+                                    [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    # On SQLite, env.py turns foreign keys off outside the migration transaction,
+    # so the batch table rebuilds below cannot fire checks or cascades
+    for table, column, referred_table in CASCADE_FOREIGN_KEYS:
+        _replace_foreign_key(table, column, referred_table, 'CASCADE')
+
+    # Cascading deletes look up children by these columns
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_test_results_question_id'), ['question_id'], unique=False)
+
+    with op.batch_alter_table('api_call_logs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_api_call_logs_test_result_id'), ['test_result_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('api_call_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_api_call_logs_test_result_id'))
+
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_test_results_question_id'))
+
+    for table, column, referred_table in reversed(CASCADE_FOREIGN_KEYS):
+        _replace_foreign_key(table, column, referred_table, None)
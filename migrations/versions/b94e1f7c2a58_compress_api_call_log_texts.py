@@ -0,0 +1,80 @@
+"""Compress long API call log texts
+
+Revision ID: b94e1f7c2a58
+Revises: a61c4e9b3d27
+Create Date: 2026-10-19 22:03:17.640218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import base64
+import zlib
+
+
+# revision identifiers, used by Alembic.
+revision = 'b94e1f7c2a58'
+down_revision = 'a61c4e9b3d27'
+branch_labels = None
+depends_on = None
+
+
+# Storage format of app.models.CompressedText, frozen for this migration
+PREFIX = '\x01zlib:'
+MIN_BYTES = 512
+BATCH_SIZE = 1000
+COLUMNS = ['ai_answer', 'verification_response']
+
+api_call_logs = sa.table(
+    'api_call_logs',
+    sa.column('id', sa.Integer),
+    *[sa.column(name, sa.Text) for name in COLUMNS]
+)
+
+
+def _compress(value):
+    if value is None or value.startswith(PREFIX):
+        return value
+    raw = value.encode('utf-8')
+    if len(raw) < MIN_BYTES:
+        return value
+    compressed = PREFIX + base64.b64encode(zlib.compress(raw, 6)).decode('ascii')
+    return compressed if len(compressed) < len(raw) else value
+
+
+def _decompress(value):
+    if value is None or not value.startswith(PREFIX):
+        return value
+    return zlib.decompress(base64.b64decode(value[len(PREFIX):])).decode('utf-8')
+
+
+def _rewrite(convert):
+    """Rewrite both text columns of every row in id order, one batch per statement"""
+    bind = op.get_bind()
+    update = sa.update(api_call_logs).where(api_call_logs.c.id == sa.bindparam('row_id')) \
+        .values({name: sa.bindparam(f'new_{name}') for name in COLUMNS})
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(api_call_logs).where(api_call_logs.c.id > last_id)
+            .order_by(api_call_logs.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        changed = []
+        for row in rows:
+            values = {f'new_{name}': convert(getattr(row, name)) for name in COLUMNS}
+            if any(values[f'new_{name}'] != getattr(row, name) for name in COLUMNS):
+                changed.append({'row_id': row.id, **values})
+        if changed:
+            bind.execute(update, changed)
+
+
+def upgrade():
+    _rewrite(_compress)
+
+
+def downgrade():
+    _rewrite(_decompress)
@@ -0,0 +1,44 @@
+"""Add MinHash similarity index on questions
+
+Revision ID: c5d8e2a7f391
+Revises: b94e1f7c2a58
+Create Date: 2026-10-19 23:11:05.482193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8e2a7f391'
+down_revision = 'b94e1f7c2a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('question_signatures',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('question_id')
+    )
+
+    op.create_table('question_lsh_bands',
+        sa.Column('band_key', sa.BigInteger(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('band_key', 'question_id')
+    )
+    with op.batch_alter_table('question_lsh_bands', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_lsh_bands_question_id'), ['question_id'], unique=False)
+
+    # Populate with: flask dedup-questions
+
+
+def downgrade():
+    with op.batch_alter_table('question_lsh_bands', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_lsh_bands_question_id'))
+
+    op.drop_table('question_lsh_bands')
+    op.drop_table('question_signatures')
@@ -0,0 +1,35 @@
+"""Add completed_attempts counter to TestResult
+
+Revision ID: c93a5d7e2f18
+Revises: b7e2c94f1a06
+Create Date: 2026-10-19 13:05:48.902611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c93a5d7e2f18'
+down_revision = 'b7e2c94f1a06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_attempts', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill counters from the existing attempt logs
+    op.execute(
+        "UPDATE test_results SET "
+        "completed_attempts = (SELECT COUNT(*) FROM api_call_logs "
+        "WHERE api_call_logs.test_result_id = test_results.id), "
+        "correct_count = (SELECT COUNT(*) FROM api_call_logs "
+        "WHERE api_call_logs.test_result_id = test_results.id AND api_call_logs.is_correct)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.drop_column('completed_attempts')
@@ -0,0 +1,28 @@
+"""Add updated_at to TestResult
+
+Revision ID: d2f7a3c81b54
+Revises: c93a5d7e2f18
+Create Date: 2026-10-19 14:31:12.664053
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a3c81b54'
+down_revision = 'c93a5d7e2f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE test_results SET updated_at = COALESCE(manual_review_time, test_date)")
+
+
+def downgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,37 @@
+"""Add test result rollups for analytics
+
+Revision ID: d7a3f9c1e604
+Revises: c5d8e2a7f391
+Create Date: 2026-10-19 23:52:41.907316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f9c1e604'
+down_revision = 'c5d8e2a7f391'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('test_result_rollups',
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('subject', sa.String(length=50), nullable=False),
+        sa.Column('difficulty', sa.String(length=20), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('tests', sa.Integer(), nullable=False),
+        sa.Column('qualified', sa.Integer(), nullable=False),
+        sa.Column('success_rate_sum', sa.Float(), nullable=False),
+        sa.Column('reviewed', sa.Integer(), nullable=False),
+        sa.Column('approved', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('week_start', 'subject', 'difficulty', 'user_id')
+    )
+
+    # Populate with: flask rebuild-analytics
+
+
+def downgrade():
+    op.drop_table('test_result_rollups')
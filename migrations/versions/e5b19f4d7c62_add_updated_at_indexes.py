@@ -0,0 +1,32 @@
+"""Add indexes on TestResult and Question updated_at
+
+Revision ID: e5b19f4d7c62
+Revises: d2f7a3c81b54
+Create Date: 2026-10-19 15:48:27.310945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b19f4d7c62'
+down_revision = 'd2f7a3c81b54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_test_results_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_questions_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('questions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_questions_updated_at'))
+
+    with op.batch_alter_table('test_results', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_test_results_updated_at'))
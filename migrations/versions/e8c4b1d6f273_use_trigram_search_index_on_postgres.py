@@ -0,0 +1,44 @@
+"""Use a pg_trgm index for question search on Postgres
+
+Revision ID: e8c4b1d6f273
+Revises: d7a3f9c1e604
+Create Date: 2026-10-20 10:24:17.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c4b1d6f273'
+down_revision = 'd7a3f9c1e604'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ['title', 'question_text', 'knowledge_points', 'standard_answer', 'solution_approach']
+
+
+def upgrade():
+    # The 'simple' tsvector parser does not segment Chinese; SQLite keeps its trigram FTS5 table
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    document = " || ' ' || ".join(f"coalesce(questions.{col}, '')" for col in COLUMNS)
+    op.execute("DROP INDEX IF EXISTS ix_questions_search_vector")
+    op.execute("ALTER TABLE questions DROP COLUMN IF EXISTS search_vector")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"CREATE INDEX IF NOT EXISTS ix_questions_search_trgm ON questions USING GIN (({document}) gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    document = " || ' ' || ".join(f"coalesce({col}, '')" for col in COLUMNS)
+    op.execute("DROP INDEX IF EXISTS ix_questions_search_trgm")
+    op.execute(
+        f"ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('simple', {document})) STORED"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_questions_search_vector ON questions USING GIN (search_vector)")
@@ -0,0 +1,30 @@
+"""Add model and latency to ApiCallLog
+
+Revision ID: f83c6a2e9d15
+Revises: e5b19f4d7c62
+Create Date: 2026-10-19 17:02:39.118470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f83c6a2e9d15'
+down_revision = 'e5b19f4d7c62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('api_call_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('model', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('latency_ms', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_api_call_logs_call_timestamp'), ['call_timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('api_call_logs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_api_call_logs_call_timestamp'))
+        batch_op.drop_column('latency_ms')
+        batch_op.drop_column('model')
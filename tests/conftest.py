@@ -0,0 +1,28 @@
+import os
+import tempfile
+import pytest
+
+# The config reads DATABASE_URL at import time
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+
+from app import create_app, initialize_database
+from app.config import Config
+from app.models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        EXPORT_DIR = str(tmp_path / 'exports')
+        METRICS_DIR = str(tmp_path / 'metrics')
+        TRACE_DIR = str(tmp_path / 'traces')
+        LATEX_CACHE_DIR = str(tmp_path / 'latex')
+
+    app = create_app(TestConfig)
+    initialize_database(app, cleanup=False)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
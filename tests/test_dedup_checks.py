@@ -0,0 +1,91 @@
+from app.models import db, User, Question
+from app.services.dedup_service import dedup_service
+from app.services.import_service import import_service
+
+TEXT = '求函数 f(x)=x^3-3x+1 在区间 [-2, 2] 上的最大值与最小值，并说明取得最值的点'
+OTHER_TEXT = '计算二重积分，其中积分区域由抛物线与直线围成，写出完整的计算过程'
+
+
+def _user(username='author'):
+    user = User(username=username, real_name=username, organization='org', role='user')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _record(title, question_text):
+    return {'title': title, 'question_type': '计算', 'subject': '数学', 'difficulty': '大学',
+            'knowledge_points': '导数', 'question_text': question_text, 'standard_answer': '3, -1',
+            'solution_approach': '求导找驻点'}
+
+
+def _question(user, title, question_text):
+    question = Question(user_id=user.id, **_record(title, question_text))
+    db.session.add(question)
+    db.session.flush()
+    dedup_service.index_questions([(question.id, question_text)])
+    db.session.commit()
+    return question
+
+
+def test_import_reports_duplicates_of_indexed_and_earlier_rows(app):
+    user = _user()
+    existing = _question(user, '已有题目', TEXT)
+
+    report = import_service.import_records([
+        (1, _record('重复已有', TEXT + '。')),
+        (2, _record('新题目', OTHER_TEXT)),
+        (3, _record('文件内重复', OTHER_TEXT)),
+    ], user.id)
+
+    assert report['imported'] == 3
+    assert report['duplicates'] == 2
+    assert report['skipped'] == 0
+    matches = {row['row']: row['match'] for row in report['duplicate_rows']}
+    assert matches[1]['question_id'] == existing.id
+    assert matches[3]['row'] == 2
+
+
+def test_import_skips_duplicates_when_blocking(app):
+    app.config['DEDUP_ACTION'] = 'block'
+    user = _user()
+    _question(user, '已有题目', TEXT)
+
+    report = import_service.import_records([
+        (1, _record('重复已有', TEXT)),
+        (2, _record('新题目', OTHER_TEXT)),
+        (3, _record('文件内重复', OTHER_TEXT)),
+    ], user.id)
+
+    assert report['imported'] == 1
+    assert report['skipped'] == 2
+    assert [question.title for question in Question.query.order_by(Question.id)] == ['已有题目', '新题目']
+
+
+def test_edit_warns_before_saving_a_duplicate_text(app):
+    user = _user()
+    _question(user, '已有题目', TEXT)
+    edited = _question(user, '待修改', OTHER_TEXT)
+    edited_id = edited.id
+    form = {**_record('待修改', TEXT), 'question_text': TEXT}
+
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'author', 'password': 'secret'})
+
+    response = client.post(f'/edit/{edited_id}', data=form)
+    assert response.status_code == 200
+    assert '发现相似问题' in response.get_data(as_text=True)
+    db.session.expire_all()
+    assert db.session.get(Question, edited_id).question_text == OTHER_TEXT
+
+    form['confirm_duplicate'] = dedup_service.text_fingerprint(TEXT)
+    response = client.post(f'/edit/{edited_id}', data=form)
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Question, edited_id).question_text == TEXT
+
+    # Saving again without a text change does not warn about the now-similar question
+    form.pop('confirm_duplicate')
+    form['title'] = '已修改'
+    assert client.post(f'/edit/{edited_id}', data=form).status_code == 302
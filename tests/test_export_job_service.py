@@ -0,0 +1,54 @@
+import os
+import time
+import threading
+from app.services.export_job_service import export_job_service
+
+KEY = 'a' * 64
+
+
+def test_running_export_keeps_its_lock_fresh(app, monkeypatch):
+    app.config['EXPORT_JOB_STALE_MINUTES'] = 1 / 60  # heartbeat every second
+    lock_path = export_job_service._path(KEY, '.lock')
+    open(lock_path, 'w').close()
+    old = time.time() - 3600
+    os.utime(lock_path, (old, old))
+
+    release = threading.Event()
+
+    def slow_write_excel(rows, output_filename=None):
+        release.wait(5)
+        raise RuntimeError('stopped')
+
+    monkeypatch.setattr('app.services.export_job_service.export_service.write_excel', slow_write_excel)
+    monkeypatch.setattr('app.services.export_job_service.export_service.iter_rows_for_ids', lambda ids: iter(()))
+
+    def run_export():
+        with app.app_context():
+            export_job_service._run_export(KEY, [1])
+
+    job = threading.Thread(target=run_export)
+    job.start()
+    try:
+        deadline = time.time() + 5
+        while time.time() - os.path.getmtime(lock_path) > 60 and time.time() < deadline:
+            time.sleep(0.1)
+        assert time.time() - os.path.getmtime(lock_path) < 60
+        assert not export_job_service._take_over_stale_lock(lock_path)
+    finally:
+        release.set()
+        job.join()
+    assert not os.path.exists(lock_path)
+
+
+def test_evict_cache_removes_abandoned_partial_files(app):
+    app.config['EXPORT_JOB_STALE_MINUTES'] = 30
+    abandoned = export_job_service._path(KEY, '.123.456.part.xlsx')
+    running = export_job_service._path('b' * 64, '.123.789.part.xlsx')
+    for path in (abandoned, running):
+        open(path, 'w').close()
+    old = time.time() - 3600
+    os.utime(abandoned, (old, old))
+
+    assert export_job_service.evict_cache() == 1
+    assert not os.path.exists(abandoned)
+    assert os.path.exists(running)
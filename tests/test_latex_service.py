@@ -0,0 +1,57 @@
+import os
+import time
+import pytest
+from app.services.latex_service import latex_service
+
+
+@pytest.mark.parametrize('text', [
+    r'$\text{<script>alert(1)</script>}$',
+    r'$\text{<img/src=x/onerror=alert(1)>}$',
+    r'$\mbox{<img src=x onerror=alert(1)>}$',
+    r'$\href{javascript:alert(1)}{x}$',
+    r'$\style{background:url(javascript:alert(1))}{x}$',
+    r'$\class{x" onclick="alert(1)}{x}$',
+])
+def test_render_does_not_emit_active_markup(app, text):
+    html = str(latex_service.render(text))
+
+    assert '<script' not in html
+    assert '<img' not in html
+    assert ' href=' not in html
+    assert ' style=' not in html
+    assert ' class=' not in html
+    assert ' onclick=' not in html
+    assert ' onerror=' not in html
+
+
+def test_render_escapes_text_content(app):
+    html = str(latex_service.render(r'$\text{<b>bold</b>}$'))
+
+    assert '<mtext>&lt;b&gt;bold&lt;/b&gt;</mtext>' in html
+
+
+def test_render_keeps_mathml(app):
+    html = str(latex_service.render(r'若 $a<b$，则 $\frac{1}{2}$ <b>'))
+
+    assert '<mo>&lt;</mo>' in html
+    assert '<mfrac>' in html
+    assert html.endswith(' &lt;b&gt;')
+
+
+def test_evict_cache_removes_unread_and_oversized_files(app):
+    texts = [f'$x^{i}$' for i in range(3)]
+    latex_service.prerender(*texts)
+    paths = sorted(
+        os.path.join(root, name) for root, _, names in os.walk(app.config['LATEX_CACHE_DIR']) for name in names
+    )
+    assert len(paths) == 3
+
+    old = time.time() - 40 * 86400
+    os.utime(paths[0], (old, old))
+    assert latex_service.evict_cache() == 1
+    assert not os.path.exists(paths[0])
+
+    app.config['LATEX_CACHE_MAX_BYTES'] = os.path.getsize(paths[1])
+    os.utime(paths[1], (old + 86400 * 20, old + 86400 * 20))
+    assert latex_service.evict_cache() == 1
+    assert not os.path.exists(paths[1]) and os.path.exists(paths[2])
@@ -0,0 +1,59 @@
+from sqlalchemy.dialects import postgresql
+from app.models import db, User, Question
+from app.services.search_service import search_service
+
+
+def _user(username, role='user'):
+    user = User(username=username, real_name=username, organization='org', role=role, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _question(user, title, question_text):
+    question = Question(user_id=user.id, title=title, question_type='计算', subject='数学', difficulty='大学',
+                        knowledge_points='微积分', question_text=question_text, standard_answer='1',
+                        solution_approach='求导')
+    db.session.add(question)
+    return question
+
+
+def _search(query_text, user=None):
+    query = Question.query
+    if user is not None:
+        query = query.filter_by(user_id=user.id)
+    return [question.title for question in search_service.search(query, query_text).all()]
+
+
+def test_chinese_substring_search(app):
+    author = _user('author')
+    _question(author, '函数求导', '求函数 f(x)=x^2 在点 x=1 处的导数值')
+    _question(author, '定积分', '计算定积分的值')
+    db.session.commit()
+
+    assert _search('导数') == ['函数求导']
+    assert _search('处的导数值') == ['函数求导']
+    assert _search('积分 计算') == ['定积分']
+    assert _search('不存在的内容') == []
+
+
+def test_user_filter_applies_before_any_limit(app):
+    others = _user('others')
+    owner = _user('owner')
+    for i in range(600):
+        _question(others, f'他人题目{i}', '求极限的计算过程')
+    _question(owner, '我的题目', '求极限的计算过程')
+    db.session.commit()
+
+    assert _search('极限的计算', user=owner) == ['我的题目']
+    assert len(_search('极限的计算')) == 601
+
+
+def test_postgres_condition_uses_indexed_document():
+    condition = search_service.postgres_condition(['导数', '100%'])
+    sql = str(condition.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+    assert "coalesce(questions.title, '')" in sql
+    assert sql.count('ILIKE') == 2
+    assert '%导数%' in sql
+    assert '%100\\%%' in sql
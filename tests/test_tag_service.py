@@ -0,0 +1,23 @@
+from app.models import db, Tag
+from app.services.tag_service import tag_service
+
+
+def test_get_or_create_tags_ignores_tags_created_concurrently(app, monkeypatch):
+    db.session.add(Tag(name='导数'))
+    db.session.commit()
+
+    # Simulate another request inserting the same new tag between our select and insert
+    insert_missing = tag_service._insert_missing
+
+    def racing_insert(names):
+        with db.engine.begin() as connection:
+            connection.execute(Tag.__table__.insert(), [{'name': '极限'}])
+        insert_missing(names)
+
+    monkeypatch.setattr(tag_service, '_insert_missing', racing_insert)
+    tags = tag_service.get_or_create_tags(['导数', '极限', '积分'])
+    db.session.commit()
+
+    assert [tag.name for tag in tags] == ['导数', '极限', '积分']
+    assert all(tag.id and tag.created_at for tag in tags)
+    assert Tag.query.count() == 3
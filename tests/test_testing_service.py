@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from app.models import db, User, Question, TestResult as Result
+from app.services.testing_service import testing_service
+
+
+def _running_test(started, updated):
+    user = User.query.first()
+    if user is None:
+        user = User(username='author', real_name='author', organization='org', role='user', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+    question = Question(user_id=user.id, title='题目', question_type='计算', subject='数学', difficulty='大学',
+                        knowledge_points='导数', question_text='求导', standard_answer='1', solution_approach='求导')
+    db.session.add(question)
+    db.session.flush()
+    test_result = Result(question_id=question.id, correct_count=0, success_rate=0.0, qualified=False,
+                         difficulty_status='0/8', status='running', test_date=started, updated_at=updated)
+    db.session.add(test_result)
+    db.session.commit()
+    return test_result.id
+
+
+def test_cleanup_keeps_long_running_tests_that_make_progress(app):
+    now = datetime.utcnow()
+    progressing_id = _running_test(now - timedelta(hours=2), now - timedelta(minutes=1))
+    stalled_id = _running_test(now - timedelta(hours=2), now - timedelta(minutes=45))
+
+    assert testing_service.cleanup_incomplete_tests(max_age_minutes=30) == 1
+    assert db.session.get(Result, progressing_id) is not None
+    assert db.session.get(Result, stalled_id) is None
+
+
+def test_recorded_attempt_refreshes_updated_at(app):
+    stale = datetime.utcnow() - timedelta(hours=1)
+    test_result_id = _running_test(stale, stale)
+
+    testing_service._record_attempt(test_result_id, True)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(Result, test_result_id).updated_at > stale
+    assert testing_service.cleanup_incomplete_tests(max_age_minutes=30) == 0